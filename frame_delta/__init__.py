@@ -0,0 +1,6 @@
+"""
+Reusable training, inference and data utilities for the framing classifiers.
+
+The notebooks in notebooks/ remain the place where experiments are run; the
+modules here hold the pieces that several notebooks and scripts share.
+"""
@@ -0,0 +1,3 @@
+from frame_delta.cli import main
+
+main()
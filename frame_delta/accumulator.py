@@ -0,0 +1,210 @@
+"""
+Constant-memory evaluation for multi-label frame models.
+
+The notebook eval loops append every batch's probabilities and labels to
+lists and np.vstack them before calling f1_score, so memory grows with the
+eval set and nothing is known until the end. MetricAccumulator instead keeps
+sufficient statistics that are updated in place per batch:
+
+    - TP/FP/FN per class at every THRESHOLD_GRID point (exact for the
+      notebook grid search, prediction = prob > threshold)
+    - optionally a histogram of probabilities per class, split by label,
+      which gives TP/FP/FN at any k/bins threshold
+
+F1 at 0.5, the best per-class thresholds and micro/macro F1 are available at
+any point, e.g. as a tqdm postfix:
+
+    acc = MetricAccumulator()
+    for batch in loader:
+        probs = torch.sigmoid(model(**inputs).logits)
+        acc.update(probs, batch['labels'])
+        pbar.set_postfix(acc.postfix())
+    thresholds, scores = acc.best_thresholds()
+"""
+
+import numpy as np
+
+from frame_delta.labels import NUM_LABELS, OFFICIAL_LABELS
+from frame_delta.thresholds import THRESHOLD_GRID, f1_from_counts
+
+
+def _to_numpy(x):
+    if hasattr(x, 'detach'):
+        x = x.detach().float().cpu().numpy()
+    return np.asarray(x)
+
+
+class MetricAccumulator:
+    def __init__(self, num_labels=NUM_LABELS, grid=THRESHOLD_GRID, bins=0, default_threshold=0.5):
+        """
+        grid: thresholds tracked exactly (the notebooks' 0.10..0.90 grid);
+              default_threshold is always added.
+        bins: if > 0, also keep a (2, num_labels, bins) probability histogram.
+        """
+        self.grid = np.unique(np.append(np.asarray(grid, dtype=np.float64), default_threshold))
+        self.default_threshold = default_threshold
+        self.bins = bins
+        self.reset(num_labels)
+
+    def reset(self, num_labels=None):
+        num_labels = num_labels or self.tp.shape[1]
+        self.tp = np.zeros((len(self.grid), num_labels), dtype=np.int64)
+        self.pred_pos = np.zeros((len(self.grid), num_labels), dtype=np.int64)
+        self.positives = np.zeros(num_labels, dtype=np.int64)
+        self.n = 0
+        self.loss_sum = 0.0
+        self.loss_count = 0
+        self.hist = np.zeros((2, num_labels, self.bins), dtype=np.int64) if self.bins else None
+
+    def update(self, probs, labels, loss=None):
+        """Add one batch of (B, C) probabilities and 0/1 labels (numpy or torch)."""
+        probs = _to_numpy(probs).astype(np.float32, copy=False)
+        labels = _to_numpy(labels).astype(bool, copy=False)
+
+        preds = probs[None, :, :] > self.grid[:, None, None]        # (G, B, C)
+        self.tp += (preds & labels[None]).sum(axis=1)
+        self.pred_pos += preds.sum(axis=1)
+        self.positives += labels.sum(axis=0)
+        self.n += len(probs)
+
+        if self.hist is not None:
+            # bin k holds k/bins < p <= (k+1)/bins, so "p > k/bins" is exactly bins k..end
+            idx = np.clip(np.ceil(probs * self.bins).astype(np.int64) - 1, 0, self.bins - 1)
+            cls = np.broadcast_to(np.arange(probs.shape[1]), probs.shape)
+            np.add.at(self.hist, (labels.astype(np.int64), cls, idx), 1)
+
+        if loss is not None:
+            self.loss_sum += float(loss) * len(probs)
+            self.loss_count += len(probs)
+
+    def merge(self, other):
+        """Add another accumulator's counts (e.g. from another process)."""
+        self.tp += other.tp
+        self.pred_pos += other.pred_pos
+        self.positives += other.positives
+        self.n += other.n
+        self.loss_sum += other.loss_sum
+        self.loss_count += other.loss_count
+        if self.hist is not None:
+            self.hist += other.hist
+        return self
+
+    def state_vector(self):
+        """All counts as one float64 vector, e.g. for torch.distributed.all_reduce."""
+        parts = [self.tp.ravel(), self.pred_pos.ravel(), self.positives,
+                 [self.n, self.loss_sum, self.loss_count]]
+        if self.hist is not None:
+            parts.append(self.hist.ravel())
+        return np.concatenate([np.asarray(p, dtype=np.float64).ravel() for p in parts])
+
+    def load_state_vector(self, vector):
+        vector = np.asarray(vector, dtype=np.float64)
+        sizes = [self.tp.size, self.pred_pos.size, self.positives.size, 3]
+        tp, pred_pos, positives, scalars, hist = np.split(vector, np.cumsum(sizes))
+        self.tp = tp.reshape(self.tp.shape).round().astype(np.int64)
+        self.pred_pos = pred_pos.reshape(self.pred_pos.shape).round().astype(np.int64)
+        self.positives = positives.round().astype(np.int64)
+        self.n, self.loss_count = int(round(scalars[0])), int(round(scalars[2]))
+        self.loss_sum = float(scalars[1])
+        if self.hist is not None:
+            self.hist = hist.reshape(self.hist.shape).round().astype(np.int64)
+
+    def counts(self, threshold=None):
+        """(tp, fp, fn) per class at a grid threshold, or a k/bins one from the histogram."""
+        threshold = self.default_threshold if threshold is None else threshold
+        match = np.flatnonzero(np.isclose(self.grid, threshold))
+        if len(match):
+            tp = self.tp[match[0]]
+            return tp, self.pred_pos[match[0]] - tp, self.positives - tp
+        if self.hist is None:
+            raise ValueError(f"threshold {threshold} is not on the grid and no histogram is kept")
+        k = int(round(threshold * self.bins))
+        tp = self.hist[1, :, k:].sum(axis=1)
+        fp = self.hist[0, :, k:].sum(axis=1)
+        return tp, fp, self.positives - tp
+
+    def f1(self, threshold=None):
+        """Per-class F1 at one threshold."""
+        return f1_from_counts(*self.counts(threshold))
+
+    def f1_at(self, thresholds):
+        """Per-class F1 with per-class grid thresholds (e.g. from best_thresholds)."""
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        rows = np.abs(self.grid[:, None] - thresholds[None, :]).argmin(axis=0)
+        cols = np.arange(len(thresholds))
+        tp = self.tp[rows, cols]
+        return f1_from_counts(tp, self.pred_pos[rows, cols] - tp, self.positives - tp)
+
+    def micro_f1(self, threshold=None):
+        tp, fp, fn = self.counts(threshold)
+        return float(f1_from_counts(tp.sum(), fp.sum(), fn.sum()))
+
+    def macro_f1(self, threshold=None):
+        return float(self.f1(threshold).mean())
+
+    def best_thresholds(self, grid=THRESHOLD_GRID):
+        """
+        Same result as thresholds.optimize_thresholds on the full matrices:
+        lowest grid threshold with the best F1, 0.5 where F1 stays 0.
+        """
+        rows = [int(np.abs(self.grid - t).argmin()) for t in grid]
+        tp = self.tp[rows]
+        scores = f1_from_counts(tp, self.pred_pos[rows] - tp, self.positives - tp)
+        best = scores.argmax(axis=0)
+        best_scores = scores.max(axis=0)
+        thresholds = np.where(best_scores > 0, np.asarray(grid)[best], 0.5)
+        return thresholds, best_scores
+
+    @property
+    def loss(self):
+        return self.loss_sum / self.loss_count if self.loss_count else float('nan')
+
+    def postfix(self):
+        """Short dict for tqdm: running loss, micro/macro F1 at the default threshold."""
+        out = {'micro_f1': f"{self.micro_f1():.4f}", 'macro_f1': f"{self.macro_f1():.4f}"}
+        if self.loss_count:
+            out = {'loss': f"{self.loss:.4f}", **out}
+        return out
+
+    def report(self, thresholds=None, labels=OFFICIAL_LABELS):
+        """Per-class precision/recall/F1/support rows like classification_report."""
+        import pandas as pd
+
+        if thresholds is None:
+            tp, fp, fn = self.counts()
+        else:
+            thresholds = np.asarray(thresholds, dtype=np.float64)
+            rows = np.abs(self.grid[:, None] - thresholds[None, :]).argmin(axis=0)
+            cols = np.arange(len(thresholds))
+            tp = self.tp[rows, cols]
+            fp, fn = self.pred_pos[rows, cols] - tp, self.positives - tp
+        precision = np.divide(tp, tp + fp, out=np.zeros(len(tp)), where=(tp + fp) > 0)
+        recall = np.divide(tp, tp + fn, out=np.zeros(len(tp)), where=(tp + fn) > 0)
+        return pd.DataFrame({
+            'precision': precision, 'recall': recall,
+            'f1-score': f1_from_counts(tp, fp, fn), 'support': self.positives,
+        }, index=list(labels))
+
+
+def evaluate(model, loader, device, accumulator=None, criterion=None, progress=True):
+    """
+    Run a model over a loader into an accumulator. Batches are dicts with
+    labels and the model's tensor inputs; other values (the notebook
+    collates' metadata, article_text and title lists) are ignored.
+    """
+    import torch
+    from tqdm.auto import tqdm
+
+    accumulator = accumulator or MetricAccumulator()
+    model.eval()
+    batches = tqdm(loader, desc="Evaluating") if progress else loader
+    with torch.inference_mode():
+        for batch in batches:
+            labels = batch['labels']
+            inputs = {k: v.to(device) for k, v in batch.items() if k != 'labels' and torch.is_tensor(v)}
+            logits = model(**inputs).logits
+            loss = criterion(logits, labels.to(device).float()).item() if criterion is not None else None
+            accumulator.update(torch.sigmoid(logits), labels, loss=loss)
+            if progress:
+                batches.set_postfix(accumulator.postfix())
+    return accumulator
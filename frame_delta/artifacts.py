@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Versioned model artifact bundles with memory-mapped safetensors weights.
+
+A notebook checkpoint is a state_dict .bin that torch.load unpickles into
+RAM, plus the pickled MultiLabelBinarizer, a thresholds JSON and the
+base model / max_len / strategy / topic prefix that every consumer
+hard-codes. A bundle keeps all of it in one directory:
+
+    manifest.json       format version, labels, thresholds (by label),
+                        tokenizer id, max_len, strategy, topic_format
+    config.json         model config (AutoConfig)
+    model.safetensors   weights (and non-persistent buffers), deduplicated
+
+load_model builds the model on the meta device and assigns the tensors of
+safetensors' mmap straight into it, so nothing is copied or initialised:
+weights are paged in from the file on first use, and worker processes that
+load the same bundle share those pages through the page cache.
+
+Usage:
+    python -m frame_delta.artifacts --export --base-model allenai/longformer-base-4096 \\
+        --weights notebooks/saved_models/.../model_ep3.bin \\
+        --thresholds notebooks/saved_models/.../class_thresholds_optimized.json \\
+        --max-len 2048 --strategy truncate --out bundles/longformer_run4
+    python -m frame_delta.artifacts --inspect bundles/longformer_run4
+    python -m frame_delta.artifacts --benchmark --workers 4      # .bin vs bundle cold start and RSS
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from frame_delta.inputs import LONGFORMER_TOPIC_FORMAT, TOPIC_FORMATS
+
+BUNDLE_VERSION = 1
+MANIFEST = 'manifest.json'
+WEIGHTS = 'model.safetensors'
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _bundle_tensors(model):
+    """
+    state_dict plus non-persistent buffers, with tensors that share storage
+    (tied weights) stored once -> (tensors, aliases, non_persistent names).
+    """
+    state = dict(model.state_dict())
+    non_persistent = [name for name, _ in model.named_buffers() if name not in state]
+    state.update({name: buf for name, buf in model.named_buffers() if name in non_persistent})
+
+    tensors, aliases, seen = {}, {}, {}
+    for name, tensor in state.items():
+        key = (tensor.untyped_storage().data_ptr(), tensor.storage_offset(), tuple(tensor.shape), tensor.stride())
+        if key in seen:
+            aliases[name] = seen[key]
+        else:
+            seen[key] = name
+            tensors[name] = tensor.detach().cpu().contiguous()
+    return tensors, aliases, non_persistent
+
+
+def export_bundle(out_dir, model, labels, thresholds, tokenizer, max_len=512, strategy='head_tail',
+                  topic_format=LONGFORMER_TOPIC_FORMAT, name=None):
+    """
+    Write a bundle for a sequence-classification model.
+
+    labels: column order of the model's outputs (replaces the pickled MultiLabelBinarizer)
+    thresholds: one per label, stored as {label: threshold}
+    tokenizer: hub id or local path for AutoTokenizer, or 'tiny-random'
+    """
+    from safetensors.torch import save_file
+
+    os.makedirs(out_dir, exist_ok=True)
+    labels = list(labels)
+    thresholds = np.asarray(thresholds, dtype=float)
+    if len(thresholds) != len(labels):
+        raise ValueError(f"{len(thresholds)} thresholds for {len(labels)} labels")
+
+    tensors, aliases, non_persistent = _bundle_tensors(model)
+    weights_path = os.path.join(out_dir, WEIGHTS)
+    save_file(tensors, weights_path, metadata={'format': 'pt'})
+    model.config.save_pretrained(out_dir)
+
+    manifest = {
+        'format_version': BUNDLE_VERSION,
+        'name': name or os.path.basename(os.path.normpath(out_dir)),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'model_type': model.config.model_type,
+        'labels': labels,
+        'thresholds': dict(zip(labels, thresholds.tolist())),
+        'tokenizer': tokenizer,
+        'max_len': max_len,
+        'strategy': strategy,
+        'topic_format': topic_format,
+        'weights': WEIGHTS,
+        'weights_sha256': _file_sha256(weights_path),
+        'aliases': aliases,
+        'non_persistent_buffers': non_persistent,
+    }
+    tmp_path = os.path.join(out_dir, MANIFEST + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(out_dir, MANIFEST))
+    return manifest
+
+
+def read_manifest(bundle_dir):
+    with open(os.path.join(bundle_dir, MANIFEST), 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('format_version', 0) > BUNDLE_VERSION:
+        raise ValueError(f"{bundle_dir} is bundle format {manifest['format_version']}, "
+                         f"this code reads up to {BUNDLE_VERSION}")
+    return manifest
+
+
+def load_model(bundle_dir, manifest=None, device='cpu', verify=False):
+    """
+    The bundle's model with weights memory-mapped from model.safetensors.
+
+    verify: check weights_sha256 first (reads the whole file).
+    """
+    import torch
+    from safetensors.torch import load_file
+    from transformers import AutoConfig, AutoModelForSequenceClassification
+
+    manifest = manifest or read_manifest(bundle_dir)
+    weights_path = os.path.join(bundle_dir, manifest['weights'])
+    if verify and _file_sha256(weights_path) != manifest['weights_sha256']:
+        raise ValueError(f"{weights_path} does not match the manifest checksum")
+
+    config = AutoConfig.from_pretrained(bundle_dir)
+    with torch.device('meta'):
+        model = AutoModelForSequenceClassification.from_config(config)
+
+    state = load_file(weights_path, device='cpu')
+    for alias, source in manifest['aliases'].items():
+        state[alias] = state[source]
+    buffers = {name: state.pop(name) for name in manifest['non_persistent_buffers']}
+    model.load_state_dict(state, assign=True)
+    for name, tensor in buffers.items():
+        module_name, _, attr = name.rpartition('.')
+        model.get_submodule(module_name).register_buffer(attr, tensor, persistent=False)
+
+    if device != 'cpu':
+        model.to(device)
+    return model.eval()
+
+
+def load_tokenizer(manifest, vocab_size=None):
+    if manifest['tokenizer'] == 'tiny-random':
+        from frame_delta.tiny import tiny_tokenizer
+        return tiny_tokenizer(vocab_size or 1000)
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(manifest['tokenizer'])
+
+
+def load_predictor(bundle_dir, device='cpu', verify=False):
+    """A serving.FramePredictor configured entirely from the bundle."""
+    from frame_delta.serving import FramePredictor
+
+    manifest = read_manifest(bundle_dir)
+    model = load_model(bundle_dir, manifest, device=device, verify=verify)
+    labels = manifest['labels']
+    return FramePredictor(
+        model, load_tokenizer(manifest, model.config.vocab_size),
+        [manifest['thresholds'][label] for label in labels], labels,
+        max_len=manifest['max_len'], strategy=manifest['strategy'],
+        topic_format=manifest['topic_format'], device=device,
+    )
+
+
+def export_checkpoint(out_dir, base_model, weights_path, thresholds_path, label_encoder_path=None,
+                      max_len=512, strategy='head_tail', topic_format=LONGFORMER_TOPIC_FORMAT):
+    """Convert a notebook checkpoint (base model + state_dict .bin + encoder + thresholds) into a bundle."""
+    import torch
+    from transformers import AutoModelForSequenceClassification
+
+    from frame_delta.labels import LABEL_ENCODER_PATH, load_label_encoder
+    from frame_delta.thresholds import load_thresholds
+
+    labels = list(load_label_encoder(label_encoder_path or LABEL_ENCODER_PATH).classes_)
+    model = AutoModelForSequenceClassification.from_pretrained(
+        base_model, num_labels=len(labels), problem_type="multi_label_classification"
+    )
+    model.load_state_dict(torch.load(weights_path, map_location='cpu'))
+    return export_bundle(out_dir, model, labels, load_thresholds(thresholds_path, labels), base_model,
+                         max_len=max_len, strategy=strategy, topic_format=topic_format)
+
+
+def _memory_mb():
+    """RSS, PSS and private memory of this process in MB (Linux smaps_rollup)."""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:', 'Private_Clean:', 'Private_Dirty:'):
+                values[parts[0][:-1]] = int(parts[1]) / 1024
+    return {'rss': values['Rss'], 'pss': values['Pss'],
+            'private': values['Private_Clean'] + values['Private_Dirty']}
+
+
+def _worker(kind, path, hold_path=None):
+    """Load one model the old or the new way, run one batch, print seconds and memory as JSON."""
+    start = time.perf_counter()
+    import torch
+    from transformers import AutoConfig, AutoModelForSequenceClassification
+
+    from frame_delta.serving import FramePredictor
+    from frame_delta.tiny import tiny_tokenizer
+    imported = time.perf_counter()
+
+    if kind == 'bundle':
+        predictor = load_predictor(path)
+    else:
+        from frame_delta.labels import load_label_encoder
+        from frame_delta.thresholds import load_thresholds
+
+        labels = list(load_label_encoder(os.path.join(path, 'mlb_15_classes.pkl')).classes_)
+        model = AutoModelForSequenceClassification.from_config(AutoConfig.from_pretrained(path))
+        model.load_state_dict(torch.load(os.path.join(path, 'model_ep3.bin'), map_location='cpu'))
+        thresholds = load_thresholds(os.path.join(path, 'class_thresholds_optimized.json'), labels)
+        predictor = FramePredictor(model, tiny_tokenizer(model.config.vocab_size), thresholds, labels)
+    loaded = time.perf_counter()
+    predictor.predict([{'title': 'Senate vote', 'text': 'court ruling on border policy ' * 50}])
+    ready = time.perf_counter()
+    if hold_path:
+        # wait until every worker is loaded so PSS splits the shared pages between them
+        open(hold_path + f'.{os.getpid()}', 'w').close()
+        while not os.path.exists(hold_path):
+            time.sleep(0.05)
+    print(json.dumps({'import_s': imported - start, 'load_s': loaded - imported,
+                      'ready_s': ready - start, **_memory_mb()}))
+
+
+def benchmark(layers=6, hidden=768, workers=4, out_dir=None):
+    """
+    Cold start (imports + load + first batch) and per-worker memory of a
+    roberta-base sized random model loaded from a notebook-style .bin vs a
+    bundle. Memory is read while all workers are alive, so PSS and total PSS
+    count pages shared between them once.
+    """
+    import subprocess
+    import sys
+    import tempfile
+
+    import joblib
+    import torch
+    from sklearn.preprocessing import MultiLabelBinarizer
+
+    from frame_delta.labels import OFFICIAL_LABELS
+    from frame_delta.thresholds import save_thresholds
+    from frame_delta.tiny import tiny_config
+
+    out_dir = out_dir or tempfile.mkdtemp(prefix='frame_bundle_')
+    legacy_dir, bundle_dir = os.path.join(out_dir, 'legacy'), os.path.join(out_dir, 'bundle')
+    os.makedirs(legacy_dir, exist_ok=True)
+
+    from transformers import AutoModelForSequenceClassification
+
+    config = tiny_config(vocab_size=50265)
+    config.update({'hidden_size': hidden, 'num_hidden_layers': layers, 'num_attention_heads': hidden // 64,
+                   'intermediate_size': 4 * hidden})
+    torch.manual_seed(0)
+    model = AutoModelForSequenceClassification.from_config(config)
+    thresholds = np.full(len(OFFICIAL_LABELS), 0.4)
+
+    config.save_pretrained(legacy_dir)
+    torch.save(model.state_dict(), os.path.join(legacy_dir, 'model_ep3.bin'))
+    joblib.dump(MultiLabelBinarizer(classes=OFFICIAL_LABELS).fit([OFFICIAL_LABELS]), os.path.join(legacy_dir, 'mlb_15_classes.pkl'))
+    save_thresholds(thresholds, os.path.join(legacy_dir, 'class_thresholds_optimized.json'))
+    export_bundle(bundle_dir, model, OFFICIAL_LABELS, thresholds, 'tiny-random')
+    size_mb = os.path.getsize(os.path.join(bundle_dir, WEIGHTS)) / 2**20
+    del model
+
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')]))}
+
+    def launch(kind, path, hold_path=None):
+        code = f"from frame_delta.artifacts import _worker; _worker({kind!r}, {path!r}, {hold_path!r})"
+        return subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE, env=env, text=True)
+
+    print(f"{layers}-layer, {hidden}-hidden model, {size_mb:.0f} MB of weights, {workers} workers")
+    print(f"{'format':<8} {'cold start s':>13} {'imports s':>10} {'load s':>7} {'RSS MB':>8} {'PSS MB':>8} "
+          f"{'private MB':>11} {'total PSS MB':>13}")
+    for kind, path in (('bin', legacy_dir), ('bundle', bundle_dir)):
+        single = json.loads(launch(kind, path).communicate()[0].strip().splitlines()[-1])
+
+        hold_path = os.path.join(out_dir, f'hold_{kind}')
+        procs = [launch(kind, path, hold_path) for _ in range(workers)]
+        while len([n for n in os.listdir(out_dir) if n.startswith(f'hold_{kind}.')]) < workers:
+            if any(p.poll() not in (None, 0) for p in procs):
+                raise RuntimeError(f"a {kind} worker failed")
+            time.sleep(0.05)
+        open(hold_path, 'w').close()
+        stats = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs]
+        print(f"{kind:<8} {single['ready_s']:>13.2f} {single['import_s']:>10.2f} {single['load_s']:>7.2f} "
+              f"{np.mean([s['rss'] for s in stats]):>8.0f} {np.mean([s['pss'] for s in stats]):>8.0f} "
+              f"{np.mean([s['private'] for s in stats]):>11.0f} {sum(s['pss'] for s in stats):>13.0f}")
+    return out_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--export', action='store_true', help='convert a notebook checkpoint into a bundle')
+    parser.add_argument('--inspect', metavar='BUNDLE', help='print a bundle manifest and verify its weights')
+    parser.add_argument('--benchmark', action='store_true', help='compare .bin and bundle cold start / RSS')
+    parser.add_argument('--base-model', default='allenai/longformer-base-4096')
+    parser.add_argument('--weights', help='state_dict .bin saved by the training notebook')
+    parser.add_argument('--thresholds', help='class_thresholds_optimized.json')
+    parser.add_argument('--label-encoder', help='mlb_15_classes.pkl (default: notebooks/encoders)')
+    parser.add_argument('--max-len', type=int, default=2048)
+    parser.add_argument('--strategy', choices=['head_tail', 'truncate'], default='truncate')
+    parser.add_argument('--topic-format', choices=list(TOPIC_FORMATS), default='longformer')
+    parser.add_argument('--out', help='bundle directory to write')
+    parser.add_argument('--layers', type=int, default=6)
+    parser.add_argument('--hidden', type=int, default=768)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.layers, args.hidden, args.workers, args.out)
+    elif args.inspect:
+        manifest = read_manifest(args.inspect)
+        print(json.dumps({k: v for k, v in manifest.items() if k not in ('aliases', 'non_persistent_buffers')},
+                         indent=2))
+        ok = _file_sha256(os.path.join(args.inspect, manifest['weights'])) == manifest['weights_sha256']
+        print(f"\nweights checksum: {'ok' if ok else 'MISMATCH'}")
+    elif args.export:
+        if not (args.weights and args.thresholds and args.out):
+            parser.error('--export needs --weights, --thresholds and --out')
+        manifest = export_checkpoint(args.out, args.base_model, args.weights, args.thresholds,
+                                     args.label_encoder, args.max_len, args.strategy,
+                                     TOPIC_FORMATS[args.topic_format])
+        print(f"Wrote {args.out} ({manifest['name']}, {len(manifest['labels'])} labels)")
+    else:
+        parser.error('choose --export, --inspect or --benchmark')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+"""
+Strip bylines, captions, link lists, promos and Nexis boilerplate from article text.
+
+newsarticles.maintext (news-please) and the MFC DOCX bodies
+(assemble_dataset.extract_text_from_docx) still carry lines that say nothing
+about framing but cost tokens in the 2048-token Longformer input. Cleaning
+is line based, in three steps:
+
+    1. pattern sets, precompiled once: bylines, photo captions, "Related:" /
+       "Read more:" link lists (the header and the title lines under it),
+       newsletter and subscription promos. For Nexis/DOCX text only
+       (nexis=True): header fields in the leading block, and a footer
+       marker (Graphic, Classification, Load-Date, End of Document) that
+       drops everything after it
+    2. per source domain, lines that repeat across many of the domain's
+       articles (site navigation, sign-offs, recurring promos). These are
+       learned in one pass over the corpus (DomainBoilerplate) and saved to
+       a JSON file, so later runs reuse the same lines
+    3. inline: URLs and [image] / [embed] placeholders
+
+Cleaned text is cached per url next to the original, tagged with the cleaner
+version (CLEAN_VERSION plus a digest of the learned domain lines):
+
+    newsarticle_clean_text  (url, clean_version, cleantext, lines_removed, chars_removed)
+
+Only urls that are missing or have another clean_version are processed, so
+changing the patterns (bump CLEAN_VERSION) or refitting the domain lines
+recomputes everything, and rerunning only picks up new articles. Inference
+and training queries read the cleaned text with a join:
+
+    SELECT a.*, COALESCE(c.cleantext, b.maintext) AS maintext FROM mm_framing_full a
+    JOIN newsarticles b ON a.url = b.url
+    LEFT JOIN newsarticle_clean_text c ON a.url = c.url
+
+The MFC DOCX bodies are cleaned in media_frames_corpus/assemble_dataset.py
+(--clean), which keeps text_clean next to text in the corpus files.
+
+Usage:
+    python -m frame_delta.boilerplate --tiny                     # synthetic: removed lines, tokens, inference time
+    python -m frame_delta.boilerplate --fit                      # learn domain lines, then backfill the cache
+    python -m frame_delta.boilerplate --report --sample 2000 --bundle bundles/longformer_run4
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlparse
+
+import numpy as np
+
+CLEAN_VERSION = 3
+CLEAN_TABLE = "newsarticle_clean_text"
+DOMAIN_LINES_PATH = "boilerplate_domain_lines.json"
+SOURCE_QUERY = "SELECT url, maintext FROM newsarticles WHERE maintext IS NOT NULL"
+
+# a line matching any pattern of a set is dropped. Patterns are anchored at
+# the line start and (?=.{0,N}$) keeps the looser ones to short lines; byline
+# and caption patterns also skip lines ending like a sentence (NOT_SENTENCE),
+# so body sentences that mention a photo agency, a video or signing up stay
+NOT_SENTENCE = r"(?!.*[.!?][\"”’']?\s*$)"
+LINE_PATTERNS = {
+    'byline': [
+        r"(?=.{0,100}$)By\s+[A-Z][\w.'’-]*(?:\s+(?:[A-Z][\w.'’-]*|and|&|de|la|van|von|der)){0,6}"
+        r"(?:\s*,\s*[A-Z][\w .'’&-]{0,60})?(?<![.!?])\s*$",
+        NOT_SENTENCE + r"(?i:(?=.{0,150}$)(?:(?:byline|authors?)\s*:|(?:written|reporting|"
+        r"additional reporting|editing|compiled) by\b).*)",
+        r"(?i:\((?:additional )?(?:reporting|writing|editing) by [^)]{0,200}\)\s*)$",
+        NOT_SENTENCE + r"(?i:(?=.{0,150}$)(?:contact|email|reach) (?:the )?(?:author|reporter|writer|"
+        r"him|her|them)\b.*)",
+        NOT_SENTENCE + r"(?i:(?=.{0,150}$)follow (?:him|her|them|[A-Z][\w.'’-]*(?: [A-Z][\w.'’-]*)?) "
+        r"on (?:twitter|x)\b.*)",
+        r"@\w{1,30}\s*$",
+        r"[\w.+-]+@[\w-]+\.[\w.]+\s*$",
+    ],
+    'caption': [
+        NOT_SENTENCE + r"(?i:(?=.{0,250}$)(?:photo|photograph|image|picture|video|caption|credit|graphic|"
+        r"illustration)s?(?: credit)?\s*[:|].*)",
+        r"(?i:(?=.{0,250}$).*\((?:photo|image|credit|file photo)\b[^)]*\)\s*)$",
+        NOT_SENTENCE + r"(?i:(?=.{0,120}$)(?:[\w .'’-]{1,60}/)?(?:getty images|ap photo|afp via getty|"
+        r"reuters|shutterstock|istock|photo illustration|file photo)\b.*)",
+        r"(?i:\(?(?:file )?photo\)?|advertisement|skip advertisement|story continues below(?: advertisement)?)\s*$",
+    ],
+    'related': [
+        r"(?i:(?=.{0,150}$)(?:related(?: coverage| stories| articles| content| links)?|read more|"
+        r"read also|see also|also read|more from [^:]{1,40}|more on this story|recommended(?: stories)?|"
+        r"you (?:may|might) also like|trending(?: now)?|most popular|what to read next)\s*:.*)",
+    ],
+    'promo': [
+        r"(?i:(?=.{0,200}$)(?:sign up (?:for|to|here|now)|subscribe (?:to|now|today|here)|"
+        r"newsletter sign-?up|get (?:our|the) [\w\s]{0,30}newsletter|click here|"
+        r"download (?:our|the) [\w\s]{0,20}app|follow us on|like us on facebook|"
+        r"support (?:our|local) journalism|already a subscriber|"
+        r"all rights reserved|this material may not be published|copyright (?:©\s*)?\d{4})\b.*|©.*)",
+    ],
+}
+# Nexis header fields: dropped only while they lead the text, i.e. in the
+# metadata block a DOCX body can start with, never once the body has begun
+NEXIS_HEADER = [
+    r"(?i:(?:length|section|byline|dateline|correction-date|correction|notes|url|language|"
+    r"publication-type|document-type|subject|organization|geographic|person|industry|company|"
+    r"ticker|journal-code|load-date)\s*:.*)",
+    r"\d[\d,]{0,8} words\s*$",
+]
+# in Nexis text, everything from the first line matching this is footer
+NEXIS_FOOTER = r"(?:Graphic|Classification|End of Document|Load-Date:.*)\s*$"
+# "Related:" on its own line: the short link titles under it go too
+RELATED_HEADER = r"(?i:(?:related(?: \w+)?|read more|see also|also read|more from [^:]{1,40}|recommended)\s*:?)\s*$"
+RELATED_ITEM_WORDS = 20
+RELATED_MAX_ITEMS = 10
+INLINE_PATTERNS = [
+    r"https?://\S+",
+    r"\bwww\.\S+",
+    r"(?i:\[(?:image|photo|video|embed|graphic)[^\]]*\])",
+]
+
+SENTENCE_END_RE = re.compile(r'[.!?"”\'’)]\s*$')
+SPACES_RE = re.compile(r'[ \t]+')
+DIGITS_RE = re.compile(r'\d+')
+
+
+def compile_patterns(patterns=LINE_PATTERNS):
+    """One anchored alternation per pattern set, matched with fullmatch after strip()."""
+    return {name: re.compile('|'.join(f'(?:{p})' for p in group)) for name, group in patterns.items()}
+
+
+COMPILED_PATTERNS = compile_patterns()
+NEXIS_HEADER_RE = compile_patterns({'nexis': NEXIS_HEADER})['nexis']
+NEXIS_FOOTER_RE = re.compile(NEXIS_FOOTER)
+RELATED_HEADER_RE = re.compile(RELATED_HEADER)
+INLINE_RE = re.compile('|'.join(f'(?:{p})' for p in INLINE_PATTERNS))
+
+
+def domain_of(url):
+    """www.nytimes.com:443/... -> nytimes.com"""
+    host = urlparse(url or '').netloc.lower().rsplit('@', 1)[-1].split(':', 1)[0]
+    return host[4:] if host.startswith('www.') else host
+
+
+def line_key(line):
+    """8-byte hash of a line with case, whitespace and digits normalised (years, counts vary)."""
+    normalized = DIGITS_RE.sub('0', SPACES_RE.sub(' ', line.strip().lower()))
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
+
+
+class DomainBoilerplate:
+    def __init__(self, min_share=0.05, min_articles=5, max_words=25):
+        """
+        A line is boilerplate for a domain when it appears in at least
+        min_articles and min_share of that domain's distinct articles. Only
+        lines of up to max_words words are counted, which keeps memory to
+        short lines and body paragraphs out of reach.
+        """
+        self.min_share = min_share
+        self.min_articles = min_articles
+        self.max_words = max_words
+        self.articles = Counter()
+        self.counts = defaultdict(Counter)
+        self.lines = {}
+        self._seen = set()
+
+    def add(self, domain, text):
+        # the same story under several urls of one domain would look like boilerplate
+        digest = hashlib.blake2b(f'{domain}\n{text}'.encode(), digest_size=8).digest()
+        if digest in self._seen:
+            return
+        self._seen.add(digest)
+        self.articles[domain] += 1
+        self.counts[domain].update({
+            line_key(line) for line in (text or '').splitlines()
+            if line.strip() and len(line.split()) <= self.max_words
+        })
+
+    def finalize(self):
+        self.lines = {}
+        for domain, counts in self.counts.items():
+            needed = max(self.min_articles, self.min_share * self.articles[domain])
+            repeated = {key for key, count in counts.items() if count >= needed}
+            if repeated:
+                self.lines[domain] = repeated
+        self.counts.clear()
+        self._seen.clear()
+        return self
+
+    def is_boilerplate(self, domain, line):
+        lines = self.lines.get(domain)
+        return bool(lines) and line_key(line) in lines
+
+    @property
+    def digest(self):
+        h = hashlib.sha1()
+        for domain in sorted(self.lines):
+            h.update(domain.encode())
+            h.update(''.join(sorted(self.lines[domain])).encode())
+        return h.hexdigest()[:8]
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'min_share': self.min_share, 'min_articles': self.min_articles,
+                       'max_words': self.max_words, 'articles': dict(self.articles),
+                       'lines': {d: sorted(keys) for d, keys in self.lines.items()}}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        model = cls(data['min_share'], data['min_articles'], data['max_words'])
+        model.articles = Counter(data['articles'])
+        model.lines = {d: set(keys) for d, keys in data['lines'].items()}
+        return model
+
+
+class BoilerplateCleaner:
+    def __init__(self, domains=None, patterns=COMPILED_PATTERNS, nexis=False):
+        """
+        domains: a fitted DomainBoilerplate, or None for the pattern sets only.
+        nexis: Nexis/DOCX text; drop the header fields at the start and
+        everything from a footer marker on.
+        """
+        self.domains = domains
+        self.patterns = patterns
+        self.nexis = nexis
+
+    @property
+    def version(self):
+        """Tag stored with cached text: pattern version plus the domain lines digest."""
+        return f"{CLEAN_VERSION}.{self.domains.digest if self.domains else 'patterns'}"
+
+    def clean(self, text, domain=None, stats=None):
+        """
+        Cleaned text; stats (a Counter), if given, gets the number of lines
+        removed per reason and the characters removed.
+        """
+        text = text or ''
+        kept = []
+        related_items = None
+        in_header = self.nexis
+        lines = text.splitlines()
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if not stripped:
+                kept.append('')
+                continue
+            reason = None
+            if in_header:
+                if NEXIS_HEADER_RE.fullmatch(stripped):
+                    if stats is not None:
+                        stats['nexis'] += 1
+                    continue
+                in_header = False
+            if self.nexis and NEXIS_FOOTER_RE.fullmatch(stripped):
+                if stats is not None:
+                    stats['nexis_footer'] += sum(1 for rest in lines[i:] if rest.strip())
+                break
+            if related_items is not None:
+                if (related_items < RELATED_MAX_ITEMS and len(stripped.split()) <= RELATED_ITEM_WORDS
+                        and not SENTENCE_END_RE.search(stripped)):
+                    related_items += 1
+                    reason = 'related'
+                else:
+                    related_items = None
+            if reason is None and RELATED_HEADER_RE.fullmatch(stripped):
+                related_items = 0
+                reason = 'related'
+            if reason is None:
+                reason = next((name for name, pattern in self.patterns.items() if pattern.fullmatch(stripped)), None)
+            if reason is None and domain and self.domains is not None and self.domains.is_boilerplate(domain, stripped):
+                reason = 'domain'
+            if reason is not None:
+                if stats is not None:
+                    stats[reason] += 1
+                continue
+            kept.append(SPACES_RE.sub(' ', INLINE_RE.sub('', line)).strip())
+
+        cleaned = re.sub(r'\n{3,}', '\n\n', '\n'.join(kept)).strip()
+        if stats is not None:
+            stats['chars'] += len(text) - len(cleaned)
+        return cleaned
+
+
+def fit_domains(conn, batch_size=5000, **kwargs):
+    """One streaming pass over newsarticles.maintext -> fitted DomainBoilerplate."""
+    from frame_delta.db import stream_rows
+
+    model = DomainBoilerplate(**kwargs)
+    seen = 0
+    for rows in stream_rows(conn, SOURCE_QUERY, batch_size=batch_size, name='boilerplate_fit_stream'):
+        for url, text in rows:
+            model.add(domain_of(url), text)
+        seen += len(rows)
+        print(f"  {seen} articles counted")
+    model.finalize()
+    print(f"  {sum(map(len, model.lines.values()))} boilerplate lines in {len(model.lines)} "
+          f"of {len(model.articles)} domains")
+    return model
+
+
+def create_table(cur):
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CLEAN_TABLE} (
+            url text PRIMARY KEY,
+            clean_version text NOT NULL,
+            cleantext text NOT NULL,
+            lines_removed integer NOT NULL,
+            chars_removed integer NOT NULL
+        );
+    """)
+
+
+def write_batch(conn, rows):
+    """Upsert (url, clean_version, cleantext, lines_removed, chars_removed) rows and commit."""
+    from frame_delta.db import copy_rows
+
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS clean_batch (LIKE {CLEAN_TABLE}) ON COMMIT DELETE ROWS")
+        copy_rows(cur, "clean_batch", ("url", "clean_version", "cleantext", "lines_removed", "chars_removed"), rows)
+        cur.execute(f"""
+            INSERT INTO {CLEAN_TABLE} SELECT * FROM clean_batch
+            ON CONFLICT (url) DO UPDATE SET clean_version = EXCLUDED.clean_version,
+                cleantext = EXCLUDED.cleantext, lines_removed = EXCLUDED.lines_removed,
+                chars_removed = EXCLUDED.chars_removed
+        """)
+    conn.commit()
+
+
+def backfill(conn, cleaner, batch_size=2000):
+    """Clean every newsarticles row whose cached text is missing or from another cleaner version."""
+    from frame_delta.db import connect, stream_rows
+
+    with conn.cursor() as cur:
+        create_table(cur)
+    conn.commit()
+
+    query = f"""
+        SELECT n.url, n.maintext FROM newsarticles n
+        LEFT JOIN {CLEAN_TABLE} c ON c.url = n.url
+        WHERE n.maintext IS NOT NULL AND (c.url IS NULL OR c.clean_version <> %s)
+    """
+    # reads stream on their own connection so per-batch commits don't close the named cursor
+    read_conn = connect()
+    version = cleaner.version
+    totals = Counter()
+    processed = 0
+    start = time.perf_counter()
+    for rows in stream_rows(read_conn, query, [version], batch_size=batch_size, name='boilerplate_stream'):
+        out = []
+        for url, text in rows:
+            stats = Counter()
+            cleaned = cleaner.clean(text, domain_of(url), stats)
+            chars = stats.pop('chars')
+            out.append((url, version, cleaned, sum(stats.values()), chars))
+            totals.update(stats)
+        write_batch(conn, out)
+        processed += len(rows)
+        print(f"  {processed} articles ({processed / (time.perf_counter() - start):.0f}/s)")
+    read_conn.close()
+    return processed, totals
+
+
+def token_report(tokenizer, originals, cleaned, max_len=2048, batch_size=256):
+    """Mean tokens per article before/after, in full and within the max_len model input."""
+    def count(texts):
+        return np.concatenate([
+            [len(ids) for ids in tokenizer(texts[i:i + batch_size], return_attention_mask=False)['input_ids']]
+            for i in range(0, len(texts), batch_size)
+        ])
+
+    before, after = count(list(originals)), count(list(cleaned))
+    return {
+        'articles': len(before),
+        'tokens_before': float(before.mean()),
+        'tokens_after': float(after.mean()),
+        'tokens_saved': float((before - after).mean()),
+        'input_tokens_saved': float((np.minimum(before, max_len) - np.minimum(after, max_len)).mean()),
+        'articles_changed': float((before != after).mean()),
+    }
+
+
+def time_inference(predictor, texts, batch_size=16, repeats=3):
+    """Best-of-repeats seconds for predictor.predict_proba over texts, in batches."""
+    articles = [{'text': text} for text in texts]
+    predictor.predict_proba(articles[:batch_size])     # warm up
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for i in range(0, len(articles), batch_size):
+            predictor.predict_proba(articles[i:i + batch_size])
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def print_report(tokens, seconds=None):
+    print(f"{tokens['articles']} articles, {tokens['articles_changed']:.0%} changed")
+    print(f"tokens per article: {tokens['tokens_before']:.1f} -> {tokens['tokens_after']:.1f} "
+          f"(saved {tokens['tokens_saved']:.1f}, {tokens['input_tokens_saved']:.1f} within the model input)")
+    if seconds:
+        before, after = seconds
+        print(f"inference: {before:.2f}s -> {after:.2f}s ({1 - after / before:.1%} less)")
+
+
+# body sentences that mention the promo and Nexis phrases; cleaning must keep them
+BODY_TRAPS = [
+    'Undocumented immigrants who sign up for the program could remain in {}, officials said.',
+    'Few Republicans subscribe to the view that {} can be sealed.',
+    'Section: the bill would also fund 5,000 new agents for {}.',
+    'The publisher said all rights reserved by {} were waived.',
+    'By Monday, Congress must act on {}.',
+    'Getty Images and Shutterstock licensed pictures of {} to the campaign.',
+    'AP Photo editors and a file photo of {} were cited in the lawsuit.',
+    'Video: the raid on {} was recorded by a neighbor, prosecutors said in court.',
+    'Credit: the state will extend the tax credit for {} to 2 million families.',
+    'Reach them at the {} office, he said.',
+]
+
+
+def synthetic_corpus(n, seed=0, n_domains=4):
+    """
+    Articles as dicts: url, text, noise (boilerplate line count), body (lines
+    that must survive) and nexis (DOCX-like: Nexis header block and footer)
+    with bylines, captions, link lists, promos and nav lines.
+    """
+    rng = np.random.default_rng(seed)
+    words = np.array(['immigration', 'court', 'economy', 'vote', 'police', 'health', 'school',
+                      'border', 'tax', 'senate', 'market', 'crime', 'policy', 'family'])
+    nav = {d: [f'Home | News | Politics | Site {d}', f'Share this article on Site {d}',
+               f'Site {d} Morning Edition: the day in five minutes'] for d in range(n_domains)}
+    corpus = []
+    for i in range(n):
+        d = int(rng.integers(n_domains))
+        nexis = i % 3 == 0
+        body = [' '.join(rng.choice(words, rng.integers(25, 60))).capitalize() + '.'
+                for _ in range(rng.integers(3, 9))]
+        trap = BODY_TRAPS[i % len(BODY_TRAPS)].format(' '.join(rng.choice(words, 3)))
+        body.insert(int(rng.integers(1, len(body))), trap)
+        kept = list(body)
+        if not nexis:
+            # a lone footer word in news text is not a Nexis footer: the body after it stays
+            body.insert(0, 'Graphic')
+        noise = [f'By Jane Doe{i % 7} and John Roe, Associated Press', nav[d][0]]
+        if nexis:
+            noise = [f'{800 + i % 50} words', 'Byline: Jane Doe', 'Section: A; Pg. 12'] + noise
+        mid = len(body) // 2
+        body[mid:mid] = [f'Protesters gather outside the court on Monday. (Photo: Jane Doe{i % 5}/AP)',
+                         'Sign up for our Morning Briefing newsletter to get the news in your inbox.']
+        body += ['Related:', f'{words[i % 14].capitalize()} bill stalls in the Senate',
+                 'What the ruling means for families'] + nav[d][1:]
+        body += [f'Copyright {2000 + i % 20} The Associated Press. All rights reserved.']
+        n_noise = len(noise) + 2 + 3 + 2 + 1 + (not nexis)
+        if nexis:
+            body += ['Graphic', 'PHOTO: A rally in Washington.', 'Classification', 'Language: ENGLISH',
+                     f'Load-Date: January {1 + i % 28}, 2010', 'End of Document']
+            n_noise += 6
+        corpus.append({'url': f'https://www.site{d}.com/{i}', 'text': '\n'.join(noise + body),
+                       'noise': n_noise, 'body': kept, 'nexis': nexis})
+    return corpus
+
+
+def _tiny_run(n=600):
+    from frame_delta.serving import FramePredictor
+    from frame_delta.tiny import tiny_tokenizer
+
+    corpus = synthetic_corpus(n)
+    domains = DomainBoilerplate(min_share=0.05, min_articles=5)
+    for article in corpus:
+        domains.add(domain_of(article['url']), article['text'])
+    domains.finalize()
+    cleaners = {False: BoilerplateCleaner(domains), True: BoilerplateCleaner(domains, nexis=True)}
+
+    stats = Counter()
+    start = time.perf_counter()
+    cleaned = [cleaners[a['nexis']].clean(a['text'], domain_of(a['url']), stats) for a in corpus]
+    elapsed = time.perf_counter() - start
+    chars = stats.pop('chars')
+    removed, expected = sum(stats.values()), sum(a['noise'] for a in corpus)
+    print(f"cleaner {cleaners[False].version}: {n / elapsed:.0f} articles/s, "
+          f"{chars / n:.0f} chars removed per article")
+    print(f"lines removed: {removed} of {expected} boilerplate lines "
+          f"({', '.join(f'{k} {v}' for k, v in stats.most_common())})")
+    lost = [line for a, clean in zip(corpus, cleaned) for line in a['body'] if line not in clean.splitlines()]
+    print(f"body lines kept: {not lost} ({len(lost)} dropped"
+          f"{', e.g. ' + repr(lost[0]) if lost else ''})\n")
+
+    originals = [a['text'] for a in corpus]
+    predictor = FramePredictor.tiny(max_len=512, strategy='truncate')
+    seconds = time_inference(predictor, originals), time_inference(predictor, cleaned)
+    print_report(token_report(tiny_tokenizer(), originals, cleaned, max_len=512), seconds)
+
+
+def _report(conn, sample, tokenizer_name, max_len, bundle=None):
+    """Token savings (and inference time with a bundle) on a random sample of cached rows."""
+    from frame_delta.text_stats import _load_tokenizer
+
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT n.maintext, c.cleantext FROM newsarticles n JOIN {CLEAN_TABLE} c ON c.url = n.url
+            ORDER BY random() LIMIT %s
+        """, [sample])
+        rows = cur.fetchall()
+    originals = [original for original, _ in rows]
+    cleaned = [clean for _, clean in rows]
+    seconds = None
+    if bundle:
+        from frame_delta.artifacts import load_predictor
+
+        predictor = load_predictor(bundle)
+        seconds = time_inference(predictor, originals), time_inference(predictor, cleaned)
+    print_report(token_report(_load_tokenizer(tokenizer_name), originals, cleaned, max_len=max_len), seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tiny', action='store_true', help='synthetic run without a database')
+    parser.add_argument('--fit', action='store_true', help='relearn the domain boilerplate lines first')
+    parser.add_argument('--domain-lines', default=DOMAIN_LINES_PATH, help='fitted domain lines (JSON)')
+    parser.add_argument('--min-share', type=float, default=0.05)
+    parser.add_argument('--min-articles', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--report', action='store_true', help='token savings on cached rows instead of a backfill')
+    parser.add_argument('--sample', type=int, default=2000)
+    parser.add_argument('--tokenizer', default='allenai/longformer-base-4096')
+    parser.add_argument('--max-len', type=int, default=2048)
+    parser.add_argument('--bundle', help='artifacts bundle to time inference on original vs cleaned text')
+    args = parser.parse_args()
+
+    if args.tiny:
+        _tiny_run()
+        return
+
+    import os
+
+    from frame_delta.db import connect
+
+    conn = connect()
+    if args.report:
+        _report(conn, args.sample, args.tokenizer, args.max_len, args.bundle)
+        conn.close()
+        return
+
+    if args.fit or not os.path.exists(args.domain_lines):
+        print("Counting repeated lines per domain...")
+        domains = fit_domains(conn, min_share=args.min_share, min_articles=args.min_articles)
+        domains.save(args.domain_lines)
+        print(f"  saved {args.domain_lines}")
+    else:
+        domains = DomainBoilerplate.load(args.domain_lines)
+    cleaner = BoilerplateCleaner(domains)
+
+    print(f"Cleaning into {CLEAN_TABLE} (version {cleaner.version})...")
+    processed, totals = backfill(conn, cleaner, batch_size=args.batch_size)
+    conn.close()
+    print(f"Done: {processed} articles; lines removed: "
+          f"{', '.join(f'{k} {v}' for k, v in totals.most_common()) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Sliding-window chunked encoding for long articles.
+
+A cheaper long-document path between head+tail truncation (which drops the
+middle of the article) and Longformer at 2048 tokens. Each article is split
+into overlapping 512-token windows, the windows of every article in a batch
+are encoded together as one flat (num_windows, 512) tensor, and the
+per-window outputs are pooled back to one row per article with max or mean.
+
+Usage (training and inference use the same pieces):
+
+    encodings = tokenizer(df['article_text'].tolist())  # no truncation
+    dataset = ChunkedArticleDataset(encodings['input_ids'], labels_matrix, tokenizer)
+    loader = DataLoader(dataset, batch_size=16, collate_fn=dataset.collate_fn)
+    model = ChunkedFrameClassifier("FacebookAI/roberta-base", pool="max")
+
+    outputs = model(batch['input_ids'], batch['attention_mask'], batch['doc_index'])
+    loss = criterion(outputs.logits, batch['labels'])
+"""
+
+import numpy as np
+import torch
+from torch import nn
+from torch.utils.data import Dataset
+from transformers import AutoModel
+from transformers.modeling_outputs import SequenceClassifierOutput
+
+from frame_delta.labels import NUM_LABELS
+
+WINDOW_LEN = 512
+STRIDE = 256
+MAX_WINDOWS = 8
+
+
+def split_into_windows(ids, cls_id, sep_id, window_len=WINDOW_LEN, stride=STRIDE,
+                       max_windows=MAX_WINDOWS):
+    """
+    Split one article's token ids into overlapping windows.
+
+    `ids` may or may not include the [CLS]/[SEP] pair added by the tokenizer;
+    each window gets its own. Windows start every `stride` content tokens and
+    the last window is aligned to the end of the article so the tail is never
+    dropped. With `max_windows` set, windows are sampled evenly across the
+    article instead of keeping only the first ones.
+    """
+    if len(ids) >= 2 and ids[0] == cls_id and ids[-1] == sep_id:
+        ids = ids[1:-1]
+
+    content_len = window_len - 2
+    if len(ids) <= content_len:
+        starts = [0]
+    else:
+        last_start = len(ids) - content_len
+        starts = list(range(0, last_start, stride))
+        starts.append(last_start)
+
+    if max_windows and len(starts) > max_windows:
+        keep = np.linspace(0, len(starts) - 1, max_windows).round().astype(int)
+        starts = [starts[i] for i in keep]
+
+    return [[cls_id] + list(ids[s:s + content_len]) + [sep_id] for s in starts]
+
+
+class ChunkedArticleDataset(Dataset):
+    def __init__(self, input_ids, labels_matrix, tokenizer, window_len=WINDOW_LEN,
+                 stride=STRIDE, max_windows=MAX_WINDOWS):
+        """
+        input_ids: per-article token ids from the tokenizer, untruncated
+        labels_matrix: (N, 15) multi-hot matrix from the mlb_15_classes encoder, or None at inference
+        """
+        self.input_ids = input_ids
+        self.labels = labels_matrix
+        self.window_len = window_len
+        self.stride = stride
+        self.max_windows = max_windows
+        self.cls_id = tokenizer.cls_token_id
+        self.sep_id = tokenizer.sep_token_id
+        self.pad_id = tokenizer.pad_token_id
+
+    def __len__(self):
+        return len(self.input_ids)
+
+    def __getitem__(self, idx):
+        windows = split_into_windows(
+            self.input_ids[idx], self.cls_id, self.sep_id,
+            window_len=self.window_len, stride=self.stride, max_windows=self.max_windows
+        )
+        item = {'windows': windows}
+        if self.labels is not None:
+            item['labels'] = torch.tensor(self.labels[idx], dtype=torch.float)
+        return item
+
+    def collate_fn(self, batch):
+        """Flatten the windows of every article into one padded batch."""
+        return collate_windows(batch, self.pad_id)
+
+
+def collate_windows(batch, pad_id):
+    """
+    Build a flat window batch.
+
+    Returns input_ids/attention_mask of shape (num_windows, max_window_len) and
+    doc_index (num_windows,) giving the position of each window's article in
+    the batch. Padding is only up to the longest window in the batch.
+    """
+    windows = []
+    doc_index = []
+    for article_idx, item in enumerate(batch):
+        windows.extend(item['windows'])
+        doc_index.extend([article_idx] * len(item['windows']))
+
+    max_len = max(len(w) for w in windows)
+    input_ids = torch.full((len(windows), max_len), pad_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(windows), max_len), dtype=torch.long)
+    for i, window in enumerate(windows):
+        input_ids[i, :len(window)] = torch.tensor(window, dtype=torch.long)
+        attention_mask[i, :len(window)] = 1
+
+    batch_out = {
+        'input_ids': input_ids,
+        'attention_mask': attention_mask,
+        'doc_index': torch.tensor(doc_index, dtype=torch.long),
+    }
+    if 'labels' in batch[0]:
+        batch_out['labels'] = torch.stack([item['labels'] for item in batch])
+    return batch_out
+
+
+def pool_windows(window_values, doc_index, num_docs, pool='max'):
+    """Reduce (num_windows, D) values to (num_docs, D) with max or mean per article."""
+    reduce = {'max': 'amax', 'mean': 'mean'}[pool]
+    index = doc_index.unsqueeze(1).expand_as(window_values)
+    out = torch.zeros(num_docs, window_values.shape[1], dtype=window_values.dtype,
+                      device=window_values.device)
+    return out.scatter_reduce(0, index, window_values, reduce=reduce, include_self=False)
+
+
+class ChunkedFrameClassifier(nn.Module):
+    def __init__(self, model_name, num_labels=NUM_LABELS, pool='max', pool_on='logits',
+                 window_batch_size=None, encoder=None):
+        """
+        pool: 'max' or 'mean' across an article's windows
+        pool_on: 'logits' classifies every window then pools the logits,
+                 'embeddings' pools the windows' <s> embeddings then classifies once
+        window_batch_size: encode at most this many windows per forward call
+                 of the encoder, to bound memory on batches with long articles
+        """
+        super().__init__()
+        if pool not in ('max', 'mean'):
+            raise ValueError(f"pool must be 'max' or 'mean', got {pool!r}")
+        if pool_on not in ('logits', 'embeddings'):
+            raise ValueError(f"pool_on must be 'logits' or 'embeddings', got {pool_on!r}")
+
+        self.encoder = encoder if encoder is not None else AutoModel.from_pretrained(model_name)
+        hidden_size = self.encoder.config.hidden_size
+        dropout = getattr(self.encoder.config, 'hidden_dropout_prob', 0.1)
+        self.classifier = nn.Sequential(
+            nn.Dropout(dropout),
+            nn.Linear(hidden_size, hidden_size),
+            nn.Tanh(),
+            nn.Dropout(dropout),
+            nn.Linear(hidden_size, num_labels),
+        )
+        self.pool = pool
+        self.pool_on = pool_on
+        self.window_batch_size = window_batch_size
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """Build with a randomly initialised encoder (for tests and benchmarks)."""
+        return cls(None, encoder=AutoModel.from_config(config), **kwargs)
+
+    def encode_windows(self, input_ids, attention_mask):
+        """<s>/[CLS] embedding of every window, (num_windows, hidden_size)."""
+        step = self.window_batch_size or input_ids.shape[0]
+        embeddings = []
+        for start in range(0, input_ids.shape[0], step):
+            outputs = self.encoder(
+                input_ids=input_ids[start:start + step],
+                attention_mask=attention_mask[start:start + step],
+            )
+            embeddings.append(outputs.last_hidden_state[:, 0])
+        return torch.cat(embeddings)
+
+    def forward(self, input_ids, attention_mask, doc_index, labels=None):
+        num_docs = int(doc_index.max().item()) + 1
+        window_embeddings = self.encode_windows(input_ids, attention_mask)
+
+        if self.pool_on == 'logits':
+            window_logits = self.classifier(window_embeddings)
+            logits = pool_windows(window_logits, doc_index, num_docs, self.pool)
+        else:
+            article_embeddings = pool_windows(window_embeddings, doc_index, num_docs, self.pool)
+            logits = self.classifier(article_embeddings)
+
+        loss = None
+        if labels is not None:
+            loss = nn.functional.binary_cross_entropy_with_logits(logits, labels)
+        return SequenceClassifierOutput(loss=loss, logits=logits)
+
+
+def predict_chunked(model, loader, device='cuda'):
+    """Collect article-level sigmoid probabilities (and labels, if present) over a loader."""
+    model.eval()
+    all_probs = []
+    all_labels = []
+    with torch.no_grad():
+        for batch in loader:
+            outputs = model(
+                input_ids=batch['input_ids'].to(device),
+                attention_mask=batch['attention_mask'].to(device),
+                doc_index=batch['doc_index'].to(device),
+            )
+            all_probs.append(torch.sigmoid(outputs.logits).float().cpu().numpy())
+            if 'labels' in batch:
+                all_labels.append(batch['labels'].numpy())
+
+    probs = np.vstack(all_probs)
+    labels = np.vstack(all_labels) if all_labels else None
+    return probs, labels
+
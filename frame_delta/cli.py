@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+frame-delta: one entry point for the loaders, corpus tools, scorers and classifiers.
+
+Nothing heavy is imported until a subcommand runs: the dispatcher itself only
+needs argparse and runpy, each subcommand runs its script or module as
+__main__ with the remaining arguments, and those scripts import pandas,
+psycopg2, sklearn or torch inside the functions that use them. Help and
+format checks therefore start in well under a second.
+
+Commands:
+    load-frac      load the FrAC gold standard into frac_gold_standard
+    load-semeval   load SemEval 2023 subtask 2 articles and subtask 3 paragraphs (changed files only)
+    fix-frames     rewrite mm_framing_full.text_generic_frame as a clean text[]
+    assemble       assemble the MFC corpus from downloaded DOCX files
+    gen-queries    write Nexis Uni search query batches for the MFC articles
+    score          SemEval scorer (--subtask 1, 2 or 3; default 2)
+    classify       frame classifier (--backend linear, pipeline or serve; default linear)
+    benchmark      startup time and imported modules per subcommand
+
+Usage:
+    python -m frame_delta --help
+    python -m frame_delta score -g gold.txt -p predictions.txt
+    python -m frame_delta score --subtask 3 --help
+    python -m frame_delta classify --backend linear --tiny
+    python -m frame_delta assemble --multi-issue --workers 4
+    python -m frame_delta benchmark --repeats 5
+"""
+
+import argparse
+import os
+import runpy
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROG = "frame-delta"
+
+SCORERS = {
+    "1": "sem_eval_23/scorers/scorer-subtask-1.py",
+    "2": "sem_eval_23/scorers/scorer-subtask-2.py",
+    "3": "sem_eval_23/scorers/scorer-subtask-3.py",
+}
+CLASSIFIERS = {
+    "linear": "frame_delta.linear",
+    "pipeline": "frame_delta.pipeline",
+    "serve": "frame_delta.serving",
+}
+
+# name -> (script, help); these scripts take no arguments of their own
+SCRIPTS = {
+    "load-frac": ("scripts/load_frac_to_postgres.py",
+                  "load FrAC/gold_standard_single_label_all.csv into frac_gold_standard"),
+    "fix-frames": ("scripts/fix_db_frames.py",
+                   "rewrite mm_framing_full.text_generic_frame as a cleaned frames_array text[]"),
+    "gen-queries": ("media_frames_corpus/generate_search_queries.py",
+                    "write Nexis Uni search query batches for immigration.json NYT articles"),
+}
+# these parse their own arguments, so everything after the command is passed on
+PASSTHROUGH = {
+    "load-semeval": ("scripts/load_semeval_to_postgres.py",
+                     "load SemEval 2023 subtask 2 articles and subtask 3 paragraphs, all languages"),
+    "assemble": ("media_frames_corpus/assemble_dataset.py",
+                 "assemble the MFC dataset from downloaded DOCX files"),
+    "score": (None, "SemEval 2023 task 3 scorer (--subtask 1, 2 or 3)"),
+    "classify": (None, "frame classifier (--backend linear, pipeline or serve)"),
+}
+COMMANDS = list(SCRIPTS) + list(PASSTHROUGH) + ["benchmark"]
+
+# top-level packages the benchmark reports when they show up in -X importtime
+HEAVY_MODULES = ("torch", "transformers", "sklearn", "pandas", "scipy", "psycopg2", "docx")
+
+
+def run_script(path, argv):
+    """Run a repo script as __main__ the way `python path ...` would (its dir first on sys.path)."""
+    path = os.path.join(REPO_ROOT, path)
+    sys.argv = [path] + list(argv)
+    sys.path.insert(0, os.path.dirname(path))
+    runpy.run_path(path, run_name="__main__")
+
+
+def run_module(module, argv):
+    """Run a frame_delta module as __main__ the way `python -m module ...` would."""
+    sys.argv = [module] + list(argv)
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+
+
+def _variant(argv, flag, choices, default, prog):
+    """Split one --flag VALUE selector off argv; the rest goes to the selected target."""
+    parser = argparse.ArgumentParser(prog=prog, add_help=False)
+    parser.add_argument(flag, choices=list(choices), default=default)
+    args, rest = parser.parse_known_args(argv)
+    return getattr(args, flag.lstrip("-")), rest
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog=PROG, description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    for name, (_, help_text) in {**SCRIPTS, **PASSTHROUGH}.items():
+        commands.add_parser(name, help=help_text, add_help=False)
+    commands.add_parser("benchmark", help="startup time and imported modules per subcommand")
+    return parser
+
+
+def benchmark(commands=None, repeats=5, python=sys.executable):
+    """
+    Time `frame-delta <command> --help` in fresh interpreters.
+
+    Each command is run `repeats` times under -X importtime; the table has the
+    median wall time, the number of modules imported and which of
+    HEAVY_MODULES were loaded. The bare interpreter and an eager import of
+    the heavy modules are timed the same way for reference.
+    """
+    import statistics
+    import subprocess
+    import time
+
+    commands = commands or [c for c in COMMANDS if c != "benchmark"]
+    eager = "; ".join(f"import {m}" for m in ("torch", "transformers", "sklearn.metrics", "pandas"))
+    runs = [("python (no imports)", ["-c", "pass"]), ("eager imports", ["-c", eager])]
+    runs += [(f"{c} --help", ["-m", "frame_delta", c, "--help"]) for c in commands]
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")]))}
+
+    print(f"{'command':<24} {'median ms':>10} {'modules':>8}  heavy imports")
+    for label, args in runs:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            proc = subprocess.run([python, "-X", "importtime", *args], cwd=REPO_ROOT, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            times.append(time.perf_counter() - start)
+        modules = [line.rsplit("|", 1)[-1].strip() for line in proc.stderr.splitlines()
+                   if line.startswith("import time:") and not line.endswith("package")]
+        heavy = sorted({m.split(".")[0] for m in modules if m.split(".")[0] in HEAVY_MODULES})
+        status = "" if proc.returncode == 0 else f"  (exit {proc.returncode})"
+        print(f"{label:<24} {statistics.median(times) * 1000:>10.0f} {len(modules):>8}  "
+              f"{', '.join(heavy) or '-'}{status}")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in COMMANDS:
+        parser = build_parser()
+        parser.parse_args(argv)                     # --help or the invalid-choice error
+        parser.print_help()
+        sys.exit(2)
+    command, rest = argv[0], argv[1:]
+    prog = f"{PROG} {command}"
+
+    if command in SCRIPTS:
+        path, help_text = SCRIPTS[command]
+        # these scripts run on import, so --help and stray arguments stop here
+        argparse.ArgumentParser(prog=prog, description=help_text).parse_args(rest)
+        run_script(path, [])
+    elif command in ("assemble", "load-semeval"):
+        run_script(PASSTHROUGH[command][0], rest)
+    elif command == "score":
+        subtask, rest = _variant(rest, "--subtask", SCORERS, "2", prog)
+        run_script(SCORERS[subtask], rest)
+    elif command == "classify":
+        backend, rest = _variant(rest, "--backend", CLASSIFIERS, "linear", prog)
+        run_module(CLASSIFIERS[backend], rest)
+    elif command == "benchmark":
+        parser = argparse.ArgumentParser(prog=prog, description=benchmark.__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+        parser.add_argument("commands", nargs="*",
+                            help="subcommands to time (default: all)")
+        parser.add_argument("--repeats", type=int, default=5)
+        args = parser.parse_args(rest)
+        unknown = set(args.commands) - set(COMMANDS)
+        if unknown:
+            parser.error(f"unknown commands: {', '.join(sorted(unknown))}")
+        benchmark(args.commands, repeats=args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Cross-dataset evaluation of a 15-label frame model on FrAC and SemEval.
+
+frac_gold_standard (one FrAC label per sentence, 9-label collapsed scheme)
+and semeval_subtask2 (14 MFC labels per article) are streamed from Postgres
+and run through the model in batches:
+
+    FrAC      short sentences, so batches are large (--frac-batch rows)
+    SemEval   long articles, sorted by length within each streamed chunk and
+              cut into buckets of at most --max-tokens padded tokens
+
+The 15-label probabilities are mapped to each scheme with 0/1 matrices built
+once from the tables the loaders use, in frame_delta.labels:
+FRAC_LABEL_MAPPING (mfc -> frac, so Legality + Crime and Political + Policy
+merge, Capacity and External regulation drop out) and SEMEVAL_FRAME_NORMALIZE
+(the 14 shared labels, Other drops out). A merged
+label's probability is the max of its sources; FrAC takes the argmax (single
+label), SemEval applies the model's thresholds to the source columns.
+
+Macro F1 is over labels with support in the dataset; FrAC micro F1 equals
+accuracy.
+
+Usage:
+    python -m frame_delta.cross_eval --tiny                   # synthetic rows, tiny model
+    python -m frame_delta.cross_eval --base-model FacebookAI/roberta-base \\
+        --weights .../best_model_state.bin --thresholds .../class_thresholds.json --max-len 512
+    python -m frame_delta.cross_eval --linear saved_models/linear_frames --datasets semeval --out cross_eval.json
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from frame_delta.labels import FRAC_LABEL_MAPPING, NUM_LABELS, OFFICIAL_LABELS, SEMEVAL_FRAME_NORMALIZE
+from frame_delta.thresholds import f1_from_counts
+
+FRAC_QUERY = """
+    SELECT sentence, label_frac FROM frac_gold_standard
+    WHERE label_frac <> 'Unknown'
+    ORDER BY id
+"""
+SEMEVAL_QUERY = """
+    SELECT title, text, frames_mfc FROM semeval_subtask2
+    WHERE array_length(frames_mfc, 1) > 0 AND split = ANY(%s) {language_filter}
+    ORDER BY article_id
+"""
+
+CHARS_PER_TOKEN = 4          # length estimate used for bucketing before tokenization
+FRAC_BATCH = 256
+SEMEVAL_BATCH = 16
+MAX_TOKENS = 16384           # padded tokens per SemEval bucket
+STREAM_BATCH = 2000
+
+
+def scheme_matrix(pairs, targets):
+    """(15, len(targets)) 0/1 matrix with M[i, j] = 1 when OFFICIAL_LABELS[i] maps to targets[j]."""
+    matrix = np.zeros((NUM_LABELS, len(targets)), dtype=np.float32)
+    source, target = {l: i for i, l in enumerate(OFFICIAL_LABELS)}, {l: j for j, l in enumerate(targets)}
+    for mfc, label in pairs:
+        if mfc in source and label in target:
+            matrix[source[mfc], target[label]] = 1
+    return matrix
+
+
+def frac_scheme(label_mapping=None):
+    """FrAC label names (LABEL_MAPPING order) and their mapping matrix."""
+    label_mapping = label_mapping or FRAC_LABEL_MAPPING
+    pairs = [(m['mfc'], m['frac']) for m in label_mapping.values()]
+    targets = list(dict.fromkeys(frac for _, frac in pairs))
+    return targets, scheme_matrix(pairs, targets)
+
+
+def semeval_scheme(frame_normalize=None):
+    """SemEval labels (MFC spelling, as stored in frames_mfc) and their mapping matrix."""
+    frame_normalize = frame_normalize or SEMEVAL_FRAME_NORMALIZE
+    targets = list(dict.fromkeys(frame_normalize.values()))
+    return targets, scheme_matrix([(t, t) for t in targets], targets)
+
+
+def map_probs(probs, matrix):
+    """(N, 15) probabilities -> (N, K): max over the source columns of each target, 0 if none."""
+    return (probs[:, :, None] * matrix[None]).max(axis=1)
+
+
+def map_preds(preds, matrix):
+    """(N, 15) 0/1 predictions -> (N, K): a target is on when any of its sources is."""
+    return (preds.astype(np.float32) @ matrix) > 0
+
+
+def length_batches(lengths, max_tokens, max_batch):
+    """
+    Index lists in ascending length order, each with at most max_batch rows
+    and max_batch * longest <= max_tokens (always at least one row).
+    Without max_tokens: consecutive chunks of max_batch in the given order.
+    """
+    if not max_tokens:
+        return [list(range(i, min(i + max_batch, len(lengths)))) for i in range(0, len(lengths), max_batch)]
+    batches, current = [], []
+    for i in np.argsort(lengths, kind='stable'):
+        if current and (len(current) == max_batch or (len(current) + 1) * lengths[i] > max_tokens):
+            batches.append(current)
+            current = []
+        current.append(int(i))
+    if current:
+        batches.append(current)
+    return batches
+
+
+class SchemeCounts:
+    """Running TP/FP/FN per target label of one scheme."""
+
+    def __init__(self, labels):
+        self.labels = list(labels)
+        self.tp = np.zeros(len(labels), dtype=np.int64)
+        self.fp = np.zeros(len(labels), dtype=np.int64)
+        self.fn = np.zeros(len(labels), dtype=np.int64)
+        self.n = 0
+
+    def update(self, preds, gold):
+        preds, gold = np.asarray(preds, dtype=bool), np.asarray(gold, dtype=bool)
+        self.tp += (preds & gold).sum(axis=0)
+        self.fp += (preds & ~gold).sum(axis=0)
+        self.fn += (~preds & gold).sum(axis=0)
+        self.n += len(preds)
+
+    def result(self):
+        support = self.tp + self.fn
+        f1 = f1_from_counts(self.tp, self.fp, self.fn)
+        return {
+            'n': self.n,
+            'micro_f1': float(f1_from_counts(self.tp.sum(), self.fp.sum(), self.fn.sum())),
+            'macro_f1': float(f1[support > 0].mean()) if (support > 0).any() else 0.0,
+            'per_label': {label: {'f1': float(f), 'support': int(s)}
+                          for label, f, s in zip(self.labels, f1, support)},
+        }
+
+
+def _predict_chunk(predict_proba, articles, max_tokens, max_batch, max_len):
+    """Probabilities for one streamed chunk in its original order, plus the number of batches."""
+    lengths = np.array([min(max_len, len(a.get('text') or '') // CHARS_PER_TOKEN + 2) for a in articles])
+    probs = np.zeros((len(articles), NUM_LABELS), dtype=np.float32)
+    batches = length_batches(lengths, max_tokens, max_batch)
+    for batch in batches:
+        probs[batch] = predict_proba([articles[i] for i in batch])
+    return probs, len(batches)
+
+
+def evaluate_stream(predict_proba, chunks, scheme, single_label, thresholds=None,
+                    max_tokens=None, max_batch=SEMEVAL_BATCH, max_len=512):
+    """
+    Score streamed chunks of (articles, gold label lists) on one target scheme.
+
+    single_label: predict the argmax mapped label (FrAC); otherwise threshold
+    the 15 source columns and map the predictions (SemEval).
+    """
+    labels, matrix = scheme
+    index = {label: j for j, label in enumerate(labels)}
+    counts = SchemeCounts(labels)
+    thresholds = np.broadcast_to(np.asarray(0.5 if thresholds is None else thresholds, dtype=np.float32),
+                                 (NUM_LABELS,))
+    n_batches, predict_seconds = 0, 0.0
+
+    start = time.perf_counter()
+    for articles, gold_lists in chunks:
+        t0 = time.perf_counter()
+        probs, chunk_batches = _predict_chunk(predict_proba, articles, max_tokens, max_batch, max_len)
+        predict_seconds += time.perf_counter() - t0
+        n_batches += chunk_batches
+
+        gold = np.zeros((len(articles), len(labels)), dtype=bool)
+        for row, names in enumerate(gold_lists):
+            gold[row, [index[name] for name in names if name in index]] = True
+        if single_label:
+            preds = np.zeros_like(gold)
+            preds[np.arange(len(probs)), map_probs(probs, matrix).argmax(axis=1)] = True
+        else:
+            preds = map_preds(probs > thresholds[None, :], matrix)
+        counts.update(preds, gold)
+
+    result = counts.result()
+    seconds = time.perf_counter() - start
+    result.update({
+        'seconds': seconds,
+        'predict_seconds': predict_seconds,
+        'docs_per_s': counts.n / predict_seconds if predict_seconds else 0.0,
+        'batches': n_batches,
+        'mean_batch_size': counts.n / n_batches if n_batches else 0.0,
+    })
+    return result
+
+
+def frac_chunks(conn, batch_size=STREAM_BATCH):
+    from frame_delta.db import stream_rows
+
+    for rows in stream_rows(conn, FRAC_QUERY, batch_size=batch_size, name='cross_eval_frac'):
+        yield [{'text': sentence} for sentence, _ in rows], [[label] for _, label in rows]
+
+
+def semeval_chunks(conn, splits=('train', 'dev'), languages=None, batch_size=STREAM_BATCH):
+    from frame_delta.db import stream_rows
+
+    params = [list(splits)]
+    language_filter = ''
+    if languages:
+        language_filter = 'AND language = ANY(%s)'
+        params.append(list(languages))
+    query = SEMEVAL_QUERY.format(language_filter=language_filter)
+    for rows in stream_rows(conn, query, params, batch_size=batch_size, name='cross_eval_semeval'):
+        yield [{'title': title, 'text': text} for title, text, _ in rows], [frames for _, _, frames in rows]
+
+
+def run(predict_proba, thresholds, conn, datasets=('frac', 'semeval'), splits=('train', 'dev'),
+        languages=None, frac_batch=FRAC_BATCH, semeval_batch=SEMEVAL_BATCH, max_tokens=MAX_TOKENS, max_len=512):
+    """{dataset: result} for the requested tables."""
+    results = {}
+    if 'frac' in datasets:
+        results['frac'] = evaluate_stream(predict_proba, frac_chunks(conn), frac_scheme(), single_label=True,
+                                          max_tokens=None, max_batch=frac_batch, max_len=max_len)
+    if 'semeval' in datasets:
+        results['semeval'] = evaluate_stream(predict_proba, semeval_chunks(conn, splits, languages),
+                                             semeval_scheme(), single_label=False, thresholds=thresholds,
+                                             max_tokens=max_tokens, max_batch=semeval_batch, max_len=max_len)
+    return results
+
+
+def print_results(results):
+    print(f"\n{'dataset':<22} {'n':>6} {'micro F1':>9} {'macro F1':>9} {'docs/s':>8} {'batches':>8} {'avg bs':>7}")
+    for name, r in results.items():
+        print(f"{name:<22} {r['n']:>6} {r['micro_f1']:>9.4f} {r['macro_f1']:>9.4f} {r['docs_per_s']:>8.1f} "
+              f"{r['batches']:>8} {r['mean_batch_size']:>7.1f}")
+    for name, r in results.items():
+        print(f"\n{name} per label:")
+        for label, row in r['per_label'].items():
+            if row['support']:
+                print(f"  {label:<48} F1 {row['f1']:.4f}  support {row['support']}")
+
+
+def _linear_predictor(model_dir):
+    from frame_delta.linear import LinearFrameClassifier
+    from frame_delta.thresholds import load_thresholds
+
+    model = LinearFrameClassifier.load(os.path.join(model_dir, 'linear_frames.joblib'))
+    thresholds = load_thresholds(os.path.join(model_dir, 'class_thresholds_optimized.json'))
+
+    def predict_proba(articles):
+        return model.predict_proba([f"{a.get('title') or ''}\n{a.get('text') or ''}" for a in articles])
+
+    return predict_proba, thresholds
+
+
+def _synthetic_chunks(dataset, n, seed=0, chunk=500):
+    """FrAC-like sentences or SemEval-like articles (20-2000 words) with random gold labels."""
+    rng = np.random.default_rng(seed)
+    words = np.array(['immigration', 'court', 'economy', 'vote', 'police', 'health', 'school',
+                      'border', 'tax', 'senate', 'market', 'crime', 'policy', 'family'])
+    labels = frac_scheme()[0] if dataset == 'frac' else semeval_scheme()[0]
+    for start in range(0, n, chunk):
+        size = min(chunk, n - start)
+        if dataset == 'frac':
+            articles = [{'text': ' '.join(rng.choice(words, rng.integers(8, 40)))} for _ in range(size)]
+            gold = [[labels[rng.integers(len(labels))]] for _ in range(size)]
+        else:
+            articles = [{'title': ' '.join(rng.choice(words, 8)),
+                         'text': ' '.join(rng.choice(words, min(int(rng.lognormal(4.8, 0.8)) + 20, 2000)))}
+                        for _ in range(size)]
+            gold = [list(rng.choice(labels, rng.integers(1, 4), replace=False)) for _ in range(size)]
+        yield articles, gold
+
+
+def _tiny_run(args):
+    import torch
+
+    from frame_delta.serving import FramePredictor
+
+    torch.set_num_threads(os.cpu_count() or 1)
+    predictor = FramePredictor.tiny(max_len=512, strategy='head_tail')
+    results = {
+        'frac': evaluate_stream(predictor.predict_proba, _synthetic_chunks('frac', 4000), frac_scheme(),
+                                single_label=True, max_batch=args.frac_batch, max_len=512),
+        'semeval': evaluate_stream(predictor.predict_proba, _synthetic_chunks('semeval', 600), semeval_scheme(),
+                                   single_label=False, thresholds=predictor.thresholds,
+                                   max_tokens=args.max_tokens, max_batch=args.semeval_batch, max_len=512),
+        'semeval (unbucketed)': evaluate_stream(predictor.predict_proba, _synthetic_chunks('semeval', 600),
+                                                semeval_scheme(), single_label=False,
+                                                thresholds=predictor.thresholds, max_tokens=None,
+                                                max_batch=args.semeval_batch, max_len=512),
+    }
+    print_results(results)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tiny', action='store_true', help='synthetic rows and a tiny random-init model')
+    parser.add_argument('--base-model', default='FacebookAI/roberta-base')
+    parser.add_argument('--weights', help='state_dict .bin saved by the training notebook')
+    parser.add_argument('--thresholds', help='class_thresholds JSON of the checkpoint')
+    parser.add_argument('--bundle', help='frame_delta.artifacts bundle instead of --weights/--thresholds')
+    parser.add_argument('--linear', help='out-dir of frame_delta.linear instead of a transformer')
+    parser.add_argument('--max-len', type=int, default=512)
+    parser.add_argument('--strategy', choices=['head_tail', 'truncate'], default='head_tail')
+    parser.add_argument('--datasets', nargs='+', choices=['frac', 'semeval'], default=['frac', 'semeval'])
+    parser.add_argument('--splits', nargs='+', default=['train', 'dev'], help='SemEval splits with labels')
+    parser.add_argument('--languages', nargs='+', help='SemEval languages (default: all loaded)')
+    parser.add_argument('--frac-batch', type=int, default=FRAC_BATCH)
+    parser.add_argument('--semeval-batch', type=int, default=SEMEVAL_BATCH)
+    parser.add_argument('--max-tokens', type=int, default=MAX_TOKENS, help='padded tokens per SemEval bucket')
+    parser.add_argument('--device', default=None)
+    parser.add_argument('--out', help='write the results as JSON')
+    args = parser.parse_args()
+
+    if args.tiny:
+        results = _tiny_run(args)
+    else:
+        if args.linear:
+            predict_proba, thresholds = _linear_predictor(args.linear)
+        elif args.bundle:
+            import torch
+
+            from frame_delta.artifacts import load_predictor
+
+            device = args.device or ('cuda' if torch.cuda.is_available() else 'cpu')
+            predictor = load_predictor(args.bundle, device=device)
+            predict_proba, thresholds = predictor.predict_proba, predictor.thresholds
+            args.max_len = predictor.max_len
+        else:
+            if not args.weights or not args.thresholds:
+                parser.error('--weights and --thresholds (or --bundle / --linear) are required unless --tiny is set')
+            import torch
+
+            from frame_delta.serving import FramePredictor
+
+            predictor = FramePredictor.from_checkpoint(
+                args.base_model, args.weights, args.thresholds,
+                device=args.device or ('cuda' if torch.cuda.is_available() else 'cpu'),
+                max_len=args.max_len, strategy=args.strategy,
+            )
+            predict_proba, thresholds = predictor.predict_proba, predictor.thresholds
+
+        from frame_delta.db import connect
+
+        conn = connect()
+        try:
+            results = run(predict_proba, thresholds, conn, args.datasets, args.splits, args.languages,
+                          args.frac_batch, args.semeval_batch, args.max_tokens, args.max_len)
+        finally:
+            conn.close()
+        print_results(results)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Postgres helpers for the jobs that run over newsarticles / mm_framing_full.
+
+Connection settings come from the same .env variables the notebooks and
+scripts use (DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT).
+"""
+
+import io
+import os
+
+
+def connect():
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return psycopg2.connect(
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"),
+        port=os.getenv("DB_PORT")
+    )
+
+
+def stream_rows(conn, query, params=None, batch_size=2000, name="frame_delta_stream"):
+    """
+    Yield lists of rows from a server-side (named) cursor, so only one batch
+    is held client-side at a time.
+    """
+    with conn.cursor(name=name) as cur:
+        cur.itersize = batch_size
+        cur.execute(query, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+
+
+def _array_literal(values):
+    """Postgres array text form, e.g. ['a', 'b c'] -> {"a","b c"}."""
+    items = ("NULL" if v is None else '"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"'
+             for v in values)
+    return "{" + ",".join(items) + "}"
+
+
+def _copy_value(value):
+    if value is None:
+        return r"\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (list, tuple)):
+        value = _array_literal(value)
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def copy_rows(cur, table, columns, rows, chunk_size=100000):
+    """COPY rows (tuples) into table, chunk_size rows per round trip; lists go to array columns."""
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    buffer = io.StringIO()
+    count = 0
+    for row in rows:
+        buffer.write("\t".join(_copy_value(v) for v in row) + "\n")
+        count += 1
+        if count % chunk_size == 0:
+            buffer.seek(0)
+            cur.copy_expert(sql, buffer)
+            buffer = io.StringIO()
+    if buffer.tell():
+        buffer.seek(0)
+        cur.copy_expert(sql, buffer)
+    return count
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate clustering of newsarticles.maintext with MinHash LSH.
+
+The same wire story is published under many urls, so the mm_framing_full x
+newsarticles join counts it many times and the stratified train/test split
+can put copies on both sides. This job assigns every url a cluster_id:
+
+    1. stream (url, maintext) from a server-side cursor in batches
+    2. per batch, in a process pool: word 5-shingles -> 128 MinHash values
+       (multiply-shift hashing, uint32), stored in an on-disk memmap
+    3. LSH with 16 bands x 8 rows: each url sharing a band bucket is paired
+       with the bucket's first url; pairs whose estimated Jaccard is below
+       --threshold are dropped
+    4. connected components of the remaining pairs are the clusters
+
+Client memory is one text batch plus 4 bytes x 128 per article for the
+signatures (memmapped) and the band keys.
+
+Results go to newsarticle_clusters (url, cluster_id, cluster_size,
+is_representative). cluster_id is the row number of the cluster's first url
+in url order, and that url is the representative, e.g.
+
+    -- one article per cluster for sampling / splitting
+    SELECT a.*, b.maintext FROM mm_framing_full a
+    JOIN newsarticles b ON a.url = b.url
+    JOIN newsarticle_clusters c ON a.url = c.url
+    WHERE c.is_representative
+
+    -- split by cluster: hash the cluster, not the url
+    ... WHERE c.cluster_id % 5 = 0   -- test fold
+
+Usage:
+    python -m frame_delta.dedup --tiny                 # synthetic smoke test, no DB
+    python -m frame_delta.dedup --workers 8 --batch-size 5000
+"""
+
+import argparse
+import os
+import re
+import tempfile
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+THRESHOLD = 0.8
+SEED = 42
+
+CLUSTER_TABLE = "newsarticle_clusters"
+SOURCE_QUERY = "SELECT url, maintext FROM newsarticles WHERE maintext IS NOT NULL ORDER BY url"
+COUNT_QUERY = "SELECT COUNT(*) FROM newsarticles WHERE maintext IS NOT NULL"
+
+WORD_RE = re.compile(r'\w+')
+
+
+def _permutations(num_perm=NUM_PERM, seed=SEED):
+    """Odd 64-bit multipliers and offsets for multiply-shift hashing."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+PERM_A, PERM_B = _permutations()
+
+
+def shingle_hashes(text, k=SHINGLE_SIZE):
+    """uint64 hashes of the distinct lowercase word k-shingles of text."""
+    words = WORD_RE.findall((text or '').lower())
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    word_hashes = np.fromiter((zlib.crc32(w.encode()) for w in words), dtype=np.uint64, count=len(words))
+    if len(words) < k:
+        k = len(words)
+    # polynomial combination of k consecutive word hashes (wraps mod 2^64)
+    shingles = np.zeros(len(words) - k + 1, dtype=np.uint64)
+    for offset in range(k):
+        shingles = shingles * np.uint64(1000003) + word_hashes[offset:offset + len(shingles)]
+    return np.unique(shingles)
+
+
+def minhash(hashes, a=PERM_A, b=PERM_B):
+    """(num_perm,) uint32 MinHash signature; all-max for an empty text."""
+    if not len(hashes):
+        return np.full(len(a), np.iinfo(np.uint32).max, dtype=np.uint32)
+    with np.errstate(over='ignore'):
+        values = (a[:, None] * hashes[None, :] + b[:, None]) >> np.uint64(32)
+    return values.min(axis=1).astype(np.uint32)
+
+
+def signature_batch(texts):
+    """(len(texts), NUM_PERM) signatures; runs in the worker processes."""
+    return np.stack([minhash(shingle_hashes(t)) for t in texts]) if texts else \
+        np.zeros((0, NUM_PERM), dtype=np.uint32)
+
+
+def band_keys(signatures, bands=BANDS, chunk_size=100000):
+    """(n, bands) uint64 bucket key of each band of rows, chunk_size signatures at a time."""
+    rows = signatures.shape[1] // bands
+    mult = np.random.default_rng(SEED + 1).integers(1, 2 ** 63, size=rows, dtype=np.uint64)
+    offsets = np.arange(bands, dtype=np.uint64)
+    keys = np.empty((len(signatures), bands), dtype=np.uint64)
+    for start in range(0, len(signatures), chunk_size):
+        chunk = np.asarray(signatures[start:start + chunk_size, :bands * rows])
+        banded = chunk.reshape(len(chunk), bands, rows).astype(np.uint64)
+        with np.errstate(over='ignore'):
+            keys[start:start + len(chunk)] = (banded * mult).sum(axis=2) + offsets
+    return keys
+
+
+def candidate_pairs(keys):
+    """
+    Pairs (first row of the bucket, row) for every other row sharing a bucket
+    in any band, so a row failing the similarity check drops out on its own
+    instead of cutting the bucket in two.
+    """
+    left, right = [], []
+    for band in range(keys.shape[1]):
+        order = np.argsort(keys[:, band], kind='stable')
+        sorted_keys = keys[order, band]
+        new_bucket = np.ones(len(order), dtype=bool)
+        new_bucket[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        first = np.maximum.accumulate(np.where(new_bucket, np.arange(len(order)), 0))
+        left.append(order[first[~new_bucket]])
+        right.append(order[~new_bucket])
+    if not left:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(left), np.concatenate(right)
+
+
+def estimated_jaccard(signatures, left, right, chunk_size=100000):
+    out = np.empty(len(left), dtype=np.float32)
+    for start in range(0, len(left), chunk_size):
+        stop = start + chunk_size
+        out[start:stop] = (signatures[left[start:stop]] == signatures[right[start:stop]]).mean(axis=1)
+    return out
+
+
+def connected_components(n, left, right):
+    """Label of each node = smallest node index in its component."""
+    labels = np.arange(n, dtype=np.int64)
+    while True:
+        low = np.minimum(labels[left], labels[right])
+        previous = labels.copy()
+        np.minimum.at(labels, left, low)
+        np.minimum.at(labels, right, low)
+        labels = labels[labels]  # pointer jumping
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def cluster(signatures, threshold=THRESHOLD, bands=BANDS, empty=None):
+    """
+    Cluster ids for the rows of a signature matrix. Rows flagged in `empty`
+    (no words) are kept as singletons rather than all matching each other.
+    """
+    keys = band_keys(np.asarray(signatures), bands)
+    left, right = candidate_pairs(keys)
+    if empty is not None and len(left):
+        keep = ~(empty[left] | empty[right])
+        left, right = left[keep], right[keep]
+    similar = estimated_jaccard(signatures, left, right) >= threshold
+    return connected_components(len(signatures), left[similar], right[similar])
+
+
+def cluster_summary(labels):
+    sizes = np.bincount(labels, minlength=len(labels))[labels]
+    return sizes, labels == np.arange(len(labels))
+
+
+def compute_signatures(batches, total, out_path, workers=None, max_pending=None):
+    """
+    Fill a (total, NUM_PERM) uint32 memmap from batches of (url, text) rows.
+    Returns (urls, signatures, empty flags).
+    """
+    signatures = np.lib.format.open_memmap(out_path, mode='w+', dtype=np.uint32, shape=(total, NUM_PERM))
+    urls, empty = [], []
+    max_pending = max_pending or 2 * (workers or os.cpu_count() or 1)
+    pending = deque()
+    position = 0
+    start = time.perf_counter()
+
+    def drain(future, offset):
+        batch = future.result()
+        signatures[offset:offset + len(batch)] = batch
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for rows in batches:
+            texts = [text for _, text in rows]
+            urls.extend(url for url, _ in rows)
+            empty.extend(not WORD_RE.search(text or '') for text in texts)
+            if position + len(rows) > total:
+                raise ValueError("more rows streamed than counted; rerun the job")
+            pending.append((executor.submit(signature_batch, texts), position))
+            position += len(rows)
+            while len(pending) >= max_pending:
+                drain(*pending.popleft())
+            print(f"  {position}/{total} articles hashed ({position / (time.perf_counter() - start):.0f}/s)")
+        while pending:
+            drain(*pending.popleft())
+
+    signatures.flush()
+    return urls, signatures[:position], np.array(empty, dtype=bool)
+
+
+def write_clusters(conn, urls, labels):
+    from frame_delta.db import copy_rows
+
+    sizes, representative = cluster_summary(labels)
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {CLUSTER_TABLE} (
+                url text PRIMARY KEY,
+                cluster_id bigint NOT NULL,
+                cluster_size integer NOT NULL,
+                is_representative boolean NOT NULL
+            )
+        """)
+        cur.execute(f"TRUNCATE {CLUSTER_TABLE}")
+        copy_rows(cur, CLUSTER_TABLE, ("url", "cluster_id", "cluster_size", "is_representative"),
+                  zip(urls, labels.tolist(), sizes.tolist(), representative.tolist()))
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {CLUSTER_TABLE}_cluster_idx ON {CLUSTER_TABLE} (cluster_id)")
+    conn.commit()
+
+
+def _tiny_run(n=2000, seed=0):
+    """Synthetic corpus with planted near-duplicates; checks they cluster together."""
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"w{i}" for i in range(5000)])
+    originals = [' '.join(rng.choice(vocab, rng.integers(150, 400))) for _ in range(n)]
+    texts, source = [], []
+    for i, text in enumerate(originals):
+        texts.append(text)
+        source.append(i)
+        if i % 10 == 0:  # a lightly edited wire copy
+            words = text.split()
+            words[rng.integers(len(words))] = 'edited'
+            texts.append('Reuters - ' + ' '.join(words) + ' (c) 2020')
+            source.append(i)
+    texts.append('')
+    source.append(-1)
+    texts.append('')
+    source.append(-2)
+
+    rows = [(f"https://example.com/{i}", t) for i, t in enumerate(texts)]
+    batches = (rows[i:i + 500] for i in range(0, len(rows), 500))
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        _, signatures, empty = compute_signatures(batches, len(rows), os.path.join(tmp, 'sig.npy'), workers=2)
+        labels = cluster(np.asarray(signatures), empty=empty)
+        elapsed = time.perf_counter() - start
+
+    source = np.array(source)
+    truth = np.unique(source, return_inverse=True)[1]
+    found_pairs = sum(len(set(labels[truth == t])) == 1 for t in np.unique(truth) if (truth == t).sum() > 1)
+    planted = sum((truth == t).sum() > 1 for t in np.unique(truth))
+    false_merges = sum(len(set(truth[labels == c])) > 1 for c in np.unique(labels))
+    print(f"{len(rows)} articles in {elapsed:.1f}s: {len(np.unique(labels))} clusters, "
+          f"{found_pairs}/{planted} planted duplicates found, {false_merges} false merges")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tiny', action='store_true', help='synthetic smoke test without a database')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='minimum estimated Jaccard')
+    parser.add_argument('--signatures', default=None,
+                        help='memmap path for the signatures (default: a temporary file)')
+    args = parser.parse_args()
+
+    if args.tiny:
+        _tiny_run()
+        return
+
+    from frame_delta.db import connect, stream_rows
+
+    conn = connect()
+    with conn.cursor() as cur:
+        cur.execute(COUNT_QUERY)
+        total = cur.fetchone()[0]
+    print(f"Hashing {total} articles...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.signatures or os.path.join(tmp, 'signatures.npy')
+        urls, signatures, empty = compute_signatures(
+            stream_rows(conn, SOURCE_QUERY, batch_size=args.batch_size, name='dedup_stream'),
+            total, path, workers=args.workers
+        )
+        print("Clustering...")
+        labels = cluster(signatures, threshold=args.threshold, empty=empty)
+
+    sizes, representative = cluster_summary(labels)
+    print(f"  {len(urls)} urls -> {representative.sum()} clusters "
+          f"({(sizes > 1).sum()} urls in {(representative & (sizes > 1)).sum()} duplicate clusters)")
+
+    print(f"Writing {CLUSTER_TABLE}...")
+    write_clusters(conn, urls, labels)
+    conn.close()
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Knowledge distillation of the Longformer frame model into a small student.
+
+Run 4 (Longformer + topic, 2048 tokens) is the production recommendation but
+too slow for the full newsarticles backfill. Distillation works in three steps:
+
+1. cache_teacher_probs: one batched pass of the teacher over the corpus,
+   saving its sigmoid probabilities as teacher_probs.npy (row-aligned with
+   the DataFrame the loader was built from).
+2. train_student: a small encoder (DistilRoBERTa, MiniLM, ...) on
+   "TOPIC:{topic}\\n{title}\\n{body}" cut to head+tail, trained on a mix of
+   soft teacher targets and the hard labels.
+3. evaluate_student: re-run per-class threshold optimization on the student's
+   validation probabilities, then report test F1 per class next to the
+   teacher's and the articles/sec of both models.
+
+Usage (after building loaders as in the notebooks):
+
+    teacher_probs = cache_teacher_probs(teacher, full_loader, run_dir)
+    train_ds = DistillationDataset(input_ids, attention_mask, labels_matrix, teacher_probs, train_idx)
+    student = AutoModelForSequenceClassification.from_pretrained(
+        "distilroberta-base", num_labels=15, problem_type="multi_label_classification")
+    train_student(student, train_loader, val_loader, optimizer, epochs=3)
+    report = evaluate_student(student, val_loader, test_loader, teacher_test_probs,
+                              teacher_thresholds, teacher_loader=teacher_test_loader)
+    save_student(student, tokenizer, report, out_dir)
+
+or end to end from token stores (row-aligned, splits.npz in --store) and a
+notebook teacher checkpoint:
+
+    python -m frame_delta.distillation --store token_store/roberta_head_tail \
+        --teacher-store token_store/longformer_2048 --labels labels_matrix.npy \
+        --teacher-base-model allenai/longformer-base-4096 \
+        --teacher-weights notebooks/saved_models/.../model_ep3.bin \
+        --teacher-thresholds notebooks/saved_models/.../class_thresholds_optimized.json \
+        --student distilroberta-base --out-dir saved_models/distilled_student
+
+    python -m frame_delta.distillation --tiny    # the same path on tiny stores and models, CPU
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+from frame_delta.labels import OFFICIAL_LABELS
+from frame_delta.thresholds import apply_thresholds, f1_from_counts, optimize_thresholds, save_thresholds
+
+MODEL_INPUT_KEYS = ('input_ids', 'attention_mask', 'global_attention_mask')
+
+
+def _model_inputs(batch, device):
+    return {k: batch[k].to(device) for k in MODEL_INPUT_KEYS if k in batch}
+
+
+def collect_probs(model, loader, device='cuda'):
+    """Sigmoid probabilities for every row of a loader, in loader order."""
+    model.eval()
+    probs = []
+    with torch.no_grad():
+        for batch in loader:
+            with torch.autocast(device_type=torch.device(device).type, enabled=device != 'cpu'):
+                logits = model(**_model_inputs(batch, device)).logits
+            probs.append(torch.sigmoid(logits.float()).cpu().numpy())
+    return np.vstack(probs)
+
+
+def model_fingerprint(model):
+    """sha1 of a model's state_dict (names and raw tensor bytes)."""
+    digest = hashlib.sha1()
+    for name, tensor in sorted(model.state_dict().items()):
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().reshape(-1).contiguous().view(torch.uint8).numpy())
+    return digest.hexdigest()
+
+
+def cache_teacher_probs(teacher, loader, out_dir, device='cuda', name='teacher_probs.npy', key=None):
+    """
+    Run the teacher over a (non-shuffled) loader once and save its probabilities.
+
+    The cache is keyed on the teacher weights, the row count and anything in
+    `key` (e.g. the teacher token store's meta.json), saved next to it as
+    <name>.json; a cache built from other weights or inputs is recomputed.
+    """
+    path = os.path.join(out_dir, name)
+    key_path = path + '.json'
+    key = dict(key or {}, teacher=model_fingerprint(teacher), rows=len(loader.dataset))
+    if os.path.exists(path) and os.path.exists(key_path):
+        with open(key_path, 'r') as f:
+            cached_key = json.load(f)
+        if cached_key == key:
+            print(f"Loaded cached teacher probabilities from {path}")
+            return np.load(path)
+        print(f"Cached teacher probabilities in {path} are for another teacher or store")
+
+    print(f"Running teacher over {len(loader.dataset)} articles...")
+    probs = collect_probs(teacher, loader, device).astype(np.float16)
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(path, probs)
+    with open(key_path, 'w') as f:
+        json.dump(key, f, indent=4)
+    print(f"Saved teacher probabilities to {path}")
+    return probs
+
+
+class StoreRows(Dataset):
+    def __init__(self, input_ids, attention_mask, indices=None, global_attention=False):
+        """Model inputs from token store arrays; global_attention adds the Longformer [CLS] mask."""
+        self.input_ids = input_ids
+        self.attention_mask = attention_mask
+        self.indices = np.arange(len(input_ids)) if indices is None else np.asarray(indices)
+        self.global_attention = global_attention
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, idx):
+        row = self.indices[idx]
+        item = {
+            'input_ids': torch.as_tensor(np.asarray(self.input_ids[row]), dtype=torch.long),
+            'attention_mask': torch.as_tensor(np.asarray(self.attention_mask[row]), dtype=torch.long),
+        }
+        if self.global_attention:
+            item['global_attention_mask'] = torch.zeros_like(item['input_ids'])
+            item['global_attention_mask'][0] = 1
+        return item
+
+
+class DistillationDataset(Dataset):
+    def __init__(self, input_ids, attention_mask, labels_matrix, teacher_probs, indices=None):
+        """
+        input_ids / attention_mask: (N, 512) head+tail arrays for the student
+        labels_matrix: (N, 15) hard labels; teacher_probs: (N, 15) soft targets
+        indices: optional subset (train/val/test split indices)
+        """
+        self.input_ids = input_ids
+        self.attention_mask = attention_mask
+        self.labels = labels_matrix
+        self.teacher_probs = teacher_probs
+        self.indices = np.arange(len(labels_matrix)) if indices is None else np.asarray(indices)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, idx):
+        row = self.indices[idx]
+        return {
+            'input_ids': torch.as_tensor(np.asarray(self.input_ids[row]), dtype=torch.long),
+            'attention_mask': torch.as_tensor(np.asarray(self.attention_mask[row]), dtype=torch.long),
+            'labels': torch.as_tensor(self.labels[row], dtype=torch.float),
+            'teacher_probs': torch.as_tensor(np.asarray(self.teacher_probs[row]), dtype=torch.float),
+        }
+
+
+def distillation_loss(student_logits, teacher_probs, labels, alpha=0.7, temperature=2.0,
+                      pos_weight=None):
+    """
+    alpha * soft BCE against temperature-softened teacher probabilities
+    + (1 - alpha) * (optionally pos-weighted) BCE against the hard labels.
+
+    The soft term is scaled by T^2 so its gradients keep the same magnitude
+    as temperature changes.
+    """
+    bce = torch.nn.functional.binary_cross_entropy_with_logits
+    teacher_logits = torch.logit(teacher_probs.clamp(1e-6, 1 - 1e-6))
+    soft_targets = torch.sigmoid(teacher_logits / temperature)
+    soft_loss = bce(student_logits / temperature, soft_targets) * temperature ** 2
+    hard_loss = bce(student_logits, labels, pos_weight=pos_weight)
+    return alpha * soft_loss + (1 - alpha) * hard_loss
+
+
+def train_student(student, train_loader, val_loader, optimizer, epochs=3, device='cuda',
+                  alpha=0.7, temperature=2.0, pos_weight=None, tracker=None, scheduler=None):
+    """
+    Distillation training loop. `tracker` can be the notebooks' ExperimentTracker
+    (anything with log_epoch and save_model); per-epoch weights are saved through it.
+    """
+    use_amp = torch.device(device).type == 'cuda'
+    scaler = torch.amp.GradScaler('cuda', enabled=use_amp)
+    student.to(device)
+
+    for epoch in range(epochs):
+        print(f"\n======== EPOCH {epoch+1}/{epochs} ========")
+        student.train()
+        train_loss = 0.0
+        for step, batch in enumerate(train_loader):
+            with torch.autocast(device_type='cuda', enabled=use_amp):
+                logits = student(**_model_inputs(batch, device)).logits
+            loss = distillation_loss(
+                logits.float(), batch['teacher_probs'].to(device), batch['labels'].to(device),
+                alpha=alpha, temperature=temperature, pos_weight=pos_weight,
+            )
+            optimizer.zero_grad()
+            scaler.scale(loss).backward()
+            scaler.step(optimizer)
+            scaler.update()
+            if scheduler is not None:
+                scheduler.step()
+            train_loss += loss.item()
+            if step % 500 == 0:
+                print(f"  Batch {step}/{len(train_loader)} | Current Loss: {loss.item():.4f}")
+
+        val_probs = collect_probs(student, val_loader, device)
+        val_labels = np.vstack([b['labels'].numpy() for b in val_loader])
+        val_teacher = np.vstack([b['teacher_probs'].numpy() for b in val_loader])
+        preds = (val_probs > 0.5).astype(int)
+        micro, macro = _micro_macro(preds, val_labels)
+        agreement = float(((val_teacher > 0.5) == preds).mean())
+
+        avg_train_loss = train_loss / len(train_loader)
+        print(f" Train Loss: {avg_train_loss:.4f} | Micro-F1: {micro:.4f} | Macro-F1: {macro:.4f} "
+              f"| Teacher agreement: {agreement:.4f}")
+        if tracker is not None:
+            tracker.log_epoch({
+                "epoch": epoch + 1,
+                "train_loss": avg_train_loss,
+                "val_f1_micro": micro,
+                "val_f1_macro": macro,
+                "teacher_agreement": agreement,
+            })
+            tracker.save_model(student, name=f"student_ep{epoch+1}.bin")
+    return student
+
+
+def _counts(preds, labels):
+    preds = np.asarray(preds).astype(bool)
+    labels = np.asarray(labels).astype(bool)
+    tp = (preds & labels).sum(axis=0)
+    return tp, preds.sum(axis=0) - tp, labels.sum(axis=0) - tp
+
+
+def _micro_macro(preds, labels):
+    tp, fp, fn = _counts(preds, labels)
+    return float(f1_from_counts(tp.sum(), fp.sum(), fn.sum())), float(f1_from_counts(tp, fp, fn).mean())
+
+
+def measure_throughput(model, loader, device='cuda', max_batches=50):
+    """Articles/sec over the first max_batches batches of a loader (after one warm-up batch)."""
+    model.eval().to(device)
+    autocast = torch.autocast(device_type=torch.device(device).type, enabled=device != 'cpu')
+    with torch.no_grad(), autocast:
+        model(**_model_inputs(next(iter(loader)), device))
+        if device.startswith('cuda'):
+            torch.cuda.synchronize()
+        n = 0
+        start = time.perf_counter()
+        for i, batch in enumerate(loader):
+            if i >= max_batches:
+                break
+            model(**_model_inputs(batch, device))
+            n += len(batch['input_ids'])
+        if device.startswith('cuda'):
+            torch.cuda.synchronize()
+    return n / (time.perf_counter() - start)
+
+
+def evaluate_student(student, val_loader, test_loader, teacher_test_probs, teacher_thresholds,
+                     device='cuda', labels=OFFICIAL_LABELS, teacher=None, teacher_loader=None):
+    """
+    Optimize the student's thresholds on val, then compare student and teacher on test.
+
+    teacher_test_probs must be row-aligned with test_loader. Throughput is
+    measured for the teacher only if `teacher` and `teacher_loader` are given.
+    """
+    val_probs = collect_probs(student, val_loader, device)
+    val_labels = np.vstack([b['labels'].numpy() for b in val_loader])
+    student_thresholds, _ = optimize_thresholds(val_probs, val_labels)
+
+    test_probs = collect_probs(student, test_loader, device)
+    test_labels = np.vstack([b['labels'].numpy() for b in test_loader])
+    student_preds = apply_thresholds(test_probs, student_thresholds)
+    teacher_preds = apply_thresholds(np.asarray(teacher_test_probs, dtype=float), teacher_thresholds)
+
+    student_f1 = f1_from_counts(*_counts(student_preds, test_labels))
+    teacher_f1 = f1_from_counts(*_counts(teacher_preds, test_labels))
+    s_micro, s_macro = _micro_macro(student_preds, test_labels)
+    t_micro, t_macro = _micro_macro(teacher_preds, test_labels)
+
+    report = {
+        'student_thresholds': dict(zip(labels, np.round(student_thresholds, 2).tolist())),
+        'per_class_f1': {
+            label: {'student': round(float(s), 4), 'teacher': round(float(t), 4),
+                    'delta': round(float(s - t), 4)}
+            for label, s, t in zip(labels, student_f1, teacher_f1)
+        },
+        'micro_f1': {'student': round(s_micro, 4), 'teacher': round(t_micro, 4)},
+        'macro_f1': {'student': round(s_macro, 4), 'teacher': round(t_macro, 4)},
+        'articles_per_sec': {'student': round(measure_throughput(student, test_loader, device), 1)},
+    }
+    if teacher is not None and teacher_loader is not None:
+        report['articles_per_sec']['teacher'] = round(measure_throughput(teacher, teacher_loader, device), 1)
+        report['articles_per_sec']['speedup'] = round(
+            report['articles_per_sec']['student'] / report['articles_per_sec']['teacher'], 2)
+    return report
+
+
+def print_report(report):
+    print(f"\n{'Class':<46}{'Student':>9}{'Teacher':>9}{'Delta':>8}")
+    for label, row in report['per_class_f1'].items():
+        print(f"{label:<46}{row['student']:>9.3f}{row['teacher']:>9.3f}{row['delta']:>+8.3f}")
+    for metric in ('micro_f1', 'macro_f1'):
+        print(f"{metric:<46}{report[metric]['student']:>9.3f}{report[metric]['teacher']:>9.3f}")
+    print(f"Articles/sec: {report['articles_per_sec']}")
+
+
+def save_student(student, tokenizer, report, out_dir):
+    """Student checkpoint (save_pretrained), its thresholds and the comparison report."""
+    os.makedirs(out_dir, exist_ok=True)
+    student.save_pretrained(out_dir)
+    tokenizer.save_pretrained(out_dir)
+    save_thresholds(list(report['student_thresholds'].values()),
+                    os.path.join(out_dir, 'class_thresholds_optimized.json'))
+    with open(os.path.join(out_dir, 'distillation_report.json'), 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"Student saved to: {out_dir}")
+
+
+def _load_classifier(name, num_labels, weights=None):
+    """A multi-label classifier from the hub name ('tiny-random' for CPU runs), optionally with notebook weights."""
+    if name == 'tiny-random':
+        from frame_delta.tiny import tiny_classifier
+
+        model = tiny_classifier(num_labels=num_labels)
+    else:
+        from transformers import AutoModelForSequenceClassification
+
+        model = AutoModelForSequenceClassification.from_pretrained(
+            name, num_labels=num_labels, problem_type="multi_label_classification")
+    if weights:
+        model.load_state_dict(torch.load(weights, map_location='cpu'))
+    return model
+
+
+def _load_tokenizer(name):
+    if name == 'tiny-random':
+        from frame_delta.tiny import tiny_tokenizer
+        return tiny_tokenizer()
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(name)
+
+
+def distill_from_stores(store, teacher_store, labels_path, teacher, teacher_thresholds, student_name,
+                        out_dir, device='cuda', epochs=3, batch_size=16, teacher_batch_size=8, lr=5e-5,
+                        alpha=0.7, temperature=2.0, labels=OFFICIAL_LABELS):
+    """
+    All three steps on row-aligned token stores: `teacher_store` holds the
+    teacher's inputs (e.g. Longformer 2048 truncated), `store` the student's
+    head+tail rows and splits.npz, `labels_path` an (N, C) .npy label matrix.
+    """
+    from frame_delta.token_store import load_splits, load_token_store
+
+    student_ids, student_mask, _ = load_token_store(store)
+    teacher_ids, teacher_mask, teacher_meta = load_token_store(teacher_store)
+    labels_matrix = np.load(labels_path, mmap_mode='r')
+    if not len(student_ids) == len(teacher_ids) == len(labels_matrix):
+        raise ValueError(f"{store}, {teacher_store} and {labels_path} must have the same rows "
+                         f"({len(student_ids)}, {len(teacher_ids)}, {len(labels_matrix)})")
+    splits = load_splits(store)
+
+    global_attention = getattr(teacher.config, 'model_type', '') == 'longformer'
+
+    def teacher_loader(indices=None):
+        rows = StoreRows(teacher_ids, teacher_mask, indices, global_attention=global_attention)
+        return DataLoader(rows, batch_size=teacher_batch_size)
+
+    teacher.to(device)
+    teacher_probs = cache_teacher_probs(teacher, teacher_loader(), out_dir, device=device,
+                                        key={'teacher_store': teacher_meta})
+
+    def make(split, shuffle):
+        dataset = DistillationDataset(student_ids, student_mask, labels_matrix, teacher_probs, splits[split])
+        return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle)
+
+    student = _load_classifier(student_name, labels_matrix.shape[1])
+    train_loader, val_loader, test_loader = make('train', True), make('val', False), make('test', False)
+    optimizer = torch.optim.AdamW(student.parameters(), lr=lr)
+    train_student(student, train_loader, val_loader, optimizer, epochs=epochs, device=device,
+                  alpha=alpha, temperature=temperature)
+    report = evaluate_student(student, val_loader, test_loader, teacher_probs[splits['test']],
+                              teacher_thresholds, device=device, labels=labels,
+                              teacher=teacher, teacher_loader=teacher_loader(splits['test']))
+    print_report(report)
+    save_student(student, _load_tokenizer(student_name), report, out_dir)
+    return report
+
+
+def _tiny_run(out_dir, n=256):
+    """Distil one random-init tiny model into another through on-disk tiny stores and a teacher checkpoint, on CPU."""
+    from frame_delta.pipeline import synthetic_articles
+    from frame_delta.thresholds import load_thresholds
+    from frame_delta.tiny import tiny_classifier, tiny_tokenizer
+    from frame_delta.token_store import encode_head_tail, save_splits, save_token_store
+
+    tokenizer = tiny_tokenizer()
+    articles = synthetic_articles(n)
+    encodings = tokenizer([f"{a['title']}\n{a['text']}" for a in articles])
+    labels_path = os.path.join(out_dir, 'labels_matrix.npy')
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(labels_path, np.random.default_rng(0).integers(0, 2, (n, len(OFFICIAL_LABELS))).astype(np.int8))
+
+    store, teacher_store = os.path.join(out_dir, 'store_128'), os.path.join(out_dir, 'store_256')
+    save_token_store(store, *encode_head_tail(encodings, tokenizer, max_len=128), {'tokenizer': 'tiny-random'})
+    save_token_store(teacher_store, *encode_head_tail(encodings, tokenizer, max_len=256), {'tokenizer': 'tiny-random'})
+    rows = np.arange(n)
+    save_splits(store, train=rows[:192], val=rows[192:224], test=rows[224:])
+
+    weights = os.path.join(out_dir, 'teacher.bin')
+    torch.save(tiny_classifier(seed=1).state_dict(), weights)
+    thresholds = os.path.join(out_dir, 'teacher_thresholds.json')
+    save_thresholds(np.full(len(OFFICIAL_LABELS), 0.5), thresholds)
+
+    for _ in range(2):      # the second run reuses the cached teacher probabilities
+        teacher = _load_classifier('tiny-random', len(OFFICIAL_LABELS), weights)
+        distill_from_stores(store, teacher_store, labels_path, teacher, load_thresholds(thresholds),
+                            'tiny-random', out_dir, device='cpu', epochs=1, batch_size=32, lr=1e-3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tiny', action='store_true', help='CPU smoke run with tiny random-init models')
+    parser.add_argument('--store', help='student token store (head+tail rows) with splits.npz')
+    parser.add_argument('--teacher-store', help='teacher token store, row-aligned with --store')
+    parser.add_argument('--labels', help='.npy (N, C) label matrix aligned with the stores')
+    parser.add_argument('--teacher-base-model', default='allenai/longformer-base-4096')
+    parser.add_argument('--teacher-weights', help='notebook state_dict checkpoint (.bin) of the teacher')
+    parser.add_argument('--teacher-thresholds', help='class_thresholds_optimized.json of the teacher')
+    parser.add_argument('--teacher-bundle', help='artifacts bundle instead of base model + weights + thresholds')
+    parser.add_argument('--student', default='distilroberta-base')
+    parser.add_argument('--out-dir', default='saved_models/distillation_tiny')
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--teacher-batch-size', type=int, default=8)
+    parser.add_argument('--lr', type=float, default=5e-5)
+    parser.add_argument('--alpha', type=float, default=0.7)
+    parser.add_argument('--temperature', type=float, default=2.0)
+    parser.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+    if args.tiny:
+        _tiny_run(args.out_dir)
+        return
+
+    if not (args.store and args.teacher_store and args.labels):
+        parser.error('--store, --teacher-store and --labels are required (or use --tiny)')
+    if args.teacher_bundle:
+        from frame_delta.artifacts import load_model, read_manifest
+
+        manifest = read_manifest(args.teacher_bundle)
+        teacher = load_model(args.teacher_bundle, manifest)
+        labels = manifest['labels']
+        teacher_thresholds = np.array([manifest['thresholds'][label] for label in labels], dtype=float)
+    elif args.teacher_weights and args.teacher_thresholds:
+        from frame_delta.thresholds import load_thresholds
+
+        labels = OFFICIAL_LABELS
+        teacher = _load_classifier(args.teacher_base_model, len(labels), args.teacher_weights)
+        teacher_thresholds = load_thresholds(args.teacher_thresholds, labels)
+    else:
+        parser.error('give --teacher-bundle, or --teacher-weights and --teacher-thresholds')
+
+    distill_from_stores(args.store, args.teacher_store, args.labels, teacher, teacher_thresholds, args.student,
+                        args.out_dir, device=args.device, epochs=args.epochs, batch_size=args.batch_size,
+                        teacher_batch_size=args.teacher_batch_size, lr=args.lr, alpha=args.alpha,
+                        temperature=args.temperature, labels=labels)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Data-parallel CPU training of the framing and topic classifiers.
+
+The notebook loops assume one CUDA device. This runs the same loop in N local
+processes with torch.distributed (gloo backend) and DistributedDataParallel:
+
+    - every rank reads the same memory-mapped token store (token_store.py)
+      and the persisted train/val split from its splits.npz
+    - a DistributedSampler gives each rank a disjoint shard of the train
+      split, reshuffled per epoch
+    - gradients are accumulated for ACCUMULATION_STEPS micro-batches under
+      no_sync(), so ranks only all-reduce on the optimizer step; the
+      effective batch is batch_size * accumulation_steps * world_size
+      (--keep-effective-batch divides accumulation_steps by world_size)
+    - validation is sharded too; counts are all-reduced before metrics
+    - only rank 0 prints and logs through ExperimentTracker
+
+Each rank gets cpu_count / world_size intra-op threads.
+
+Usage:
+    python -m frame_delta.distributed --store token_store/roberta_head_tail --labels labels_matrix.npy \\
+        --model FacebookAI/roberta-base --nprocs 8
+    python -m frame_delta.distributed --store token_store/topic --labels topic_ids.npy \\
+        --task multiclass --num-labels 120 --model FacebookAI/roberta-base --nprocs 8
+    python -m frame_delta.distributed --benchmark            # 1/2/4/8-process scaling, small model
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import socket
+import tempfile
+import time
+
+import numpy as np
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader, Dataset, DistributedSampler, Subset
+
+from frame_delta.accumulator import MetricAccumulator
+from frame_delta.training import ACCUMULATION_STEPS, EPOCHS, ExperimentTracker
+
+BACKEND = "gloo"
+BENCHMARK_PROCS = (1, 2, 4, 8)
+
+
+class StoreDataset(Dataset):
+    """Rows of token store arrays with their labels (float 0/1 vectors, or class ids for multiclass)."""
+
+    def __init__(self, input_ids, attention_mask, labels, task="multilabel"):
+        self.input_ids = input_ids
+        self.attention_mask = attention_mask
+        self.labels = labels
+        self.label_dtype = torch.float if task == "multilabel" else torch.long
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        return {
+            'input_ids': torch.tensor(self.input_ids[idx], dtype=torch.long),
+            'attention_mask': torch.tensor(self.attention_mask[idx], dtype=torch.long),
+            'labels': torch.tensor(self.labels[idx], dtype=self.label_dtype),
+        }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _entry(rank, world_size, port, fn, args):
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = str(port)
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // world_size))
+    dist.init_process_group(BACKEND, rank=rank, world_size=world_size)
+    try:
+        fn(rank, world_size, *args)
+    finally:
+        dist.destroy_process_group()
+
+
+def launch(fn, world_size, *args):
+    """Run fn(rank, world_size, *args) in world_size local processes joined by a gloo group."""
+    mp.spawn(_entry, args=(world_size, free_port(), fn, args), nprocs=world_size, join=True)
+
+
+def _all_reduce(values):
+    tensor = torch.as_tensor(np.asarray(values, dtype=np.float64))
+    dist.all_reduce(tensor)
+    return tensor.numpy()
+
+
+def _validate(model, loader, criterion, task):
+    """Validation on this rank's shard, reduced over all ranks."""
+    model.eval()
+    if task == "multilabel":
+        accumulator = MetricAccumulator()
+        with torch.inference_mode():
+            for batch in loader:
+                labels = batch.pop('labels')
+                logits = model(**batch).logits
+                accumulator.update(torch.sigmoid(logits), labels, loss=criterion(logits, labels).item())
+        accumulator.load_state_vector(_all_reduce(accumulator.state_vector()))
+        return {"val_loss": accumulator.loss, "val_f1_micro": accumulator.micro_f1(),
+                "val_f1_macro": accumulator.macro_f1()}
+
+    loss_sum, correct, total = 0.0, 0, 0
+    with torch.inference_mode():
+        for batch in loader:
+            labels = batch.pop('labels')
+            logits = model(**batch).logits
+            loss_sum += criterion(logits, labels).item() * len(labels)
+            correct += (logits.argmax(dim=-1) == labels).sum().item()
+            total += len(labels)
+    loss_sum, correct, total = _all_reduce([loss_sum, correct, total])
+    return {"val_loss": loss_sum / max(total, 1), "val_acc": correct / max(total, 1)}
+
+
+def ddp_train(model, train_dataset, val_dataset, optimizer, criterion, tracker=None, epochs=EPOCHS,
+              batch_size=4, accumulation_steps=ACCUMULATION_STEPS, task="multilabel", seed=42):
+    """
+    Train inside an initialised process group (see launch). tracker is only
+    used on rank 0 and may be None on the others. Returns the last epoch's
+    validation metrics (identical on every rank).
+    """
+    rank, world_size = dist.get_rank(), dist.get_world_size()
+    ddp_model = DistributedDataParallel(model)
+    sampler = DistributedSampler(train_dataset, num_replicas=world_size, rank=rank, shuffle=True, seed=seed)
+    train_loader = DataLoader(train_dataset, batch_size=batch_size, sampler=sampler)
+    # val shards are strided subsets (no padding duplicates, so counts stay exact)
+    val_loader = DataLoader(Subset(val_dataset, range(rank, len(val_dataset), world_size)), batch_size=batch_size)
+    n_batches = len(train_loader)
+    if rank == 0:
+        print(f"{world_size} processes | {n_batches} batches per rank per epoch | "
+              f"effective batch {batch_size * accumulation_steps * world_size}")
+
+    metrics = None
+    for epoch in range(epochs):
+        if rank == 0:
+            print(f"\n======== EPOCH {epoch+1}/{epochs} ========")
+        sampler.set_epoch(epoch)
+        ddp_model.train()
+        optimizer.zero_grad()
+        train_loss = 0.0
+        start = time.perf_counter()
+
+        for step, batch in enumerate(train_loader):
+            labels = batch.pop('labels')
+            sync = (step + 1) % accumulation_steps == 0 or step + 1 == n_batches
+            with contextlib.nullcontext() if sync else ddp_model.no_sync():
+                logits = ddp_model(**batch).logits
+                loss = criterion(logits, labels) / accumulation_steps
+                loss.backward()
+            if sync:
+                optimizer.step()
+                optimizer.zero_grad()
+            train_loss += loss.item() * accumulation_steps
+            if rank == 0 and step % 500 == 0:
+                print(f"  Batch {step}/{n_batches} | Current Loss: {loss.item() * accumulation_steps:.4f}")
+
+        elapsed = time.perf_counter() - start
+        loss_sum, batches = _all_reduce([train_loss, n_batches])
+        metrics = {"epoch": epoch + 1, "train_loss": loss_sum / batches,
+                   **_validate(ddp_model.module, val_loader, criterion, task),
+                   "samples_per_sec": n_batches * batch_size * world_size / elapsed}
+        if rank == 0:
+            print(" | ".join(f"{k}: {v:.4f}" for k, v in metrics.items() if k != "epoch"))
+            if tracker is not None:
+                tracker.log_epoch(metrics)
+                tracker.save_model(model, name=f"model_ep{epoch+1}.bin")
+
+    if rank == 0:
+        print("Training Complete.")
+        if tracker is not None:
+            tracker.save_model(model, name="final_model.bin")
+    return metrics
+
+
+def _load_model(name, num_labels, task, seed):
+    torch.manual_seed(seed)
+    problem_type = "multi_label_classification" if task == "multilabel" else "single_label_classification"
+    if name == "tiny-random":
+        from frame_delta.tiny import tiny_classifier
+        model = tiny_classifier(num_labels=num_labels, seed=seed)
+        model.config.problem_type = problem_type
+        return model
+    from transformers import AutoModelForSequenceClassification
+    return AutoModelForSequenceClassification.from_pretrained(name, num_labels=num_labels,
+                                                              problem_type=problem_type)
+
+
+def _criterion(train_labels, task):
+    if task == "multiclass":
+        return torch.nn.CrossEntropyLoss()
+    # same class weighting as the notebooks: n_neg / n_pos
+    num_positives = torch.tensor(train_labels.sum(axis=0), dtype=torch.float)
+    num_negatives = len(train_labels) - num_positives
+    return torch.nn.BCEWithLogitsLoss(pos_weight=num_negatives / (num_positives + 1e-5))
+
+
+def _train_worker(rank, world_size, args):
+    from frame_delta.token_store import load_splits, load_token_store
+
+    input_ids, attention_mask, _ = load_token_store(args.store)
+    labels = np.load(args.labels, mmap_mode='r')
+    splits = load_splits(args.store)
+    full = StoreDataset(input_ids, attention_mask, labels, task=args.task)
+    train_dataset, val_dataset = Subset(full, splits['train']), Subset(full, splits['val'])
+    num_labels = args.num_labels or labels.shape[1]
+
+    model = _load_model(args.model, num_labels, args.task, args.seed)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=args.lr, weight_decay=args.weight_decay)
+    criterion = _criterion(np.asarray(labels[splits['train']]), args.task)
+    accumulation_steps = args.accumulation_steps
+    if args.keep_effective_batch:
+        accumulation_steps = max(1, accumulation_steps // world_size)
+
+    tracker = None
+    if rank == 0:
+        tracker = ExperimentTracker(args.run_name, base_dir=args.out_dir, config={
+            "model": args.model, "task": args.task, "batch_size": args.batch_size,
+            "accum_steps": accumulation_steps, "world_size": world_size, "backend": BACKEND,
+            "lr": args.lr,
+        })
+    ddp_train(model, train_dataset, val_dataset, optimizer, criterion, tracker, epochs=args.epochs,
+              batch_size=args.batch_size, accumulation_steps=accumulation_steps, task=args.task,
+              seed=args.seed)
+
+
+def _benchmark_worker(rank, world_size, steps, batch_size, seq_len, accumulation_steps, result_path):
+    """Time `steps` optimizer steps of a small RoBERTa on synthetic batches."""
+    from transformers import AutoModelForSequenceClassification
+
+    from frame_delta.tiny import tiny_config
+
+    config = tiny_config()
+    config.update({"hidden_size": 128, "num_hidden_layers": 4, "num_attention_heads": 4,
+                   "intermediate_size": 512})
+    torch.manual_seed(0)
+    model = DistributedDataParallel(AutoModelForSequenceClassification.from_config(config))
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-4)
+    criterion = torch.nn.BCEWithLogitsLoss()
+    generator = torch.Generator().manual_seed(rank)
+    input_ids = torch.randint(5, config.vocab_size, (batch_size, seq_len), generator=generator)
+    attention_mask = torch.ones_like(input_ids)
+    labels = (torch.rand(batch_size, config.num_labels, generator=generator) < 0.2).float()
+
+    def optimizer_step():
+        for micro in range(accumulation_steps):
+            sync = micro == accumulation_steps - 1
+            with contextlib.nullcontext() if sync else model.no_sync():
+                loss = criterion(model(input_ids=input_ids, attention_mask=attention_mask).logits, labels)
+                (loss / accumulation_steps).backward()
+        optimizer.step()
+        optimizer.zero_grad()
+
+    optimizer_step()                       # warm-up
+    dist.barrier()
+    start = time.perf_counter()
+    for _ in range(steps):
+        optimizer_step()
+    dist.barrier()
+    elapsed = time.perf_counter() - start
+    if rank == 0:
+        with open(result_path, "w") as f:
+            json.dump({"world_size": world_size, "seconds": elapsed,
+                       "samples_per_sec": steps * accumulation_steps * batch_size * world_size / elapsed}, f)
+
+
+def benchmark(procs=BENCHMARK_PROCS, steps=10, batch_size=8, seq_len=128, accumulation_steps=ACCUMULATION_STEPS):
+    """Weak-scaling benchmark: fixed per-rank batch, throughput and efficiency per process count."""
+    print(f"{os.cpu_count()} CPUs | per-rank batch {batch_size} x {seq_len} tokens | "
+          f"{accumulation_steps} accumulation steps | {steps} optimizer steps")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for world_size in procs:
+            if world_size > (os.cpu_count() or 1):
+                print(f"  note: {world_size} processes on {os.cpu_count()} CPUs are oversubscribed")
+            result_path = os.path.join(tmp, f"{world_size}.json")
+            launch(_benchmark_worker, world_size, steps, batch_size, seq_len, accumulation_steps, result_path)
+            with open(result_path) as f:
+                results.append(json.load(f))
+
+    base = results[0]["samples_per_sec"] / results[0]["world_size"]
+    print(f"\n{'procs':>5} {'seconds':>9} {'samples/s':>10} {'speedup':>8} {'efficiency':>10}")
+    for r in results:
+        speedup = r["samples_per_sec"] / base
+        print(f"{r['world_size']:>5} {r['seconds']:>9.2f} {r['samples_per_sec']:>10.1f} "
+              f"{speedup:>8.2f} {speedup / r['world_size']:>10.0%}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--benchmark', action='store_true', help='1/2/4/8-process scaling benchmark')
+    parser.add_argument('--procs', type=int, nargs='+', default=list(BENCHMARK_PROCS))
+    parser.add_argument('--steps', type=int, default=10, help='benchmark optimizer steps')
+    parser.add_argument('--store', help='token store directory with splits.npz')
+    parser.add_argument('--labels', help='.npy labels aligned with the store rows')
+    parser.add_argument('--task', choices=['multilabel', 'multiclass'], default='multilabel')
+    parser.add_argument('--num-labels', type=int, default=None, help='required for multiclass')
+    parser.add_argument('--model', default='FacebookAI/roberta-base')
+    parser.add_argument('--nprocs', type=int, default=os.cpu_count())
+    parser.add_argument('--epochs', type=int, default=EPOCHS)
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--accumulation-steps', type=int, default=ACCUMULATION_STEPS)
+    parser.add_argument('--keep-effective-batch', action='store_true',
+                        help='divide accumulation steps by the process count')
+    parser.add_argument('--lr', type=float, default=3e-5)
+    parser.add_argument('--weight-decay', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--run-name', default='ddp_cpu')
+    parser.add_argument('--out-dir', default='saved_models/framing_training_runs_ddp')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.procs, steps=args.steps, accumulation_steps=args.accumulation_steps)
+        return
+    if not args.store or not args.labels:
+        parser.error('--store and --labels are required (or use --benchmark)')
+    if args.task == 'multiclass' and not args.num_labels:
+        parser.error('--num-labels is required for --task multiclass')
+    launch(_train_worker, args.nprocs, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Precomputed frame distributions and co-occurrence for the labelled tables.
+
+Instead of recounting frames with unnest(...) GROUP BY or
+explode().value_counts() on every run, the loaders' reports and the
+notebooks read frame_summary, which keeps per
+(source, gpt_topic, political_leaning, split) group:
+
+    n_docs, n_labeled          documents, and documents with at least one frame
+    frame_counts  bigint[15]   documents per frame, in OFFICIAL_LABELS order
+    cooccurrence  bigint[225]  15x15 row-major, documents having both frames
+
+Sources are mm_framing_full (text_generic_frame, gpt_topic, political_leaning),
+semeval_subtask2 (frames_mfc, split) and frac_gold_standard (label_mfc).
+Missing group values are stored as ''.
+
+Statement-level triggers append every inserted/deleted/updated row to
+frame_summary_delta; refresh() folds the pending deltas (grouped by frame
+combination, so it is cheap) into frame_summary. rebuild() recomputes a
+source from scratch, and sync() is what the loaders call after a write.
+
+Usage:
+    python -m frame_delta.frame_stats --install        # tables + triggers + full build
+    python -m frame_delta.frame_stats                  # refresh, then print the report
+    python -m frame_delta.frame_stats --rebuild semeval_subtask2
+
+    from frame_delta.frame_stats import label_counts, pos_weight
+    counts, n_docs = label_counts(conn, sources=['mm_framing_full'])
+"""
+
+import argparse
+
+import numpy as np
+
+from frame_delta.labels import NUM_LABELS, OFFICIAL_LABELS
+
+SUMMARY_TABLE = "frame_summary"
+DELTA_TABLE = "frame_summary_delta"
+GROUP_COLUMNS = ("gpt_topic", "political_leaning", "split")
+
+# per source: expressions over a row alias r for the group columns and frame array
+SOURCES = {
+    "mm_framing_full": {
+        "gpt_topic": "r.gpt_topic",
+        "political_leaning": "r.political_leaning",
+        "split": "NULL",
+        "frames": "r.text_generic_frame",
+    },
+    "semeval_subtask2": {
+        "gpt_topic": "NULL",
+        "political_leaning": "NULL",
+        "split": "r.split",
+        "frames": "r.frames_mfc",
+    },
+    "frac_gold_standard": {
+        "gpt_topic": "NULL",
+        "political_leaning": "NULL",
+        "split": "NULL",
+        "frames": "ARRAY[r.label_mfc]",
+    },
+}
+
+
+def _select(source, relation, sign=None):
+    """Grouped (source, group columns, frames, weight) rows of a relation aliased r."""
+    exprs = SOURCES[source]
+    groups = ", ".join(f"COALESCE({exprs[c]}, '') AS {c}" for c in GROUP_COLUMNS)
+    weight = "COUNT(*)" if sign is None else f"{sign} * COUNT(*)"
+    return f"""
+        SELECT '{source}' AS source, {groups}, COALESCE({exprs['frames']}, '{{}}') AS frames, {weight} AS weight
+        FROM {relation} r
+        GROUP BY 2, 3, 4, 5
+    """
+
+
+def install(conn):
+    """Create the summary and delta tables and the change-capture triggers."""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (
+                source text NOT NULL,
+                gpt_topic text NOT NULL,
+                political_leaning text NOT NULL,
+                split text NOT NULL,
+                n_docs bigint NOT NULL,
+                n_labeled bigint NOT NULL,
+                frame_counts bigint[] NOT NULL,
+                cooccurrence bigint[] NOT NULL,
+                PRIMARY KEY (source, gpt_topic, political_leaning, split)
+            );
+            CREATE TABLE IF NOT EXISTS {DELTA_TABLE} (
+                id bigserial PRIMARY KEY,
+                source text NOT NULL,
+                gpt_topic text NOT NULL,
+                political_leaning text NOT NULL,
+                split text NOT NULL,
+                frames text[] NOT NULL,
+                weight bigint NOT NULL
+            );
+        """)
+        for source in SOURCES:
+            cur.execute(f"SELECT to_regclass(%s)", (source,))
+            if cur.fetchone()[0] is None:
+                print(f"  {source} not found, skipping its triggers")
+                continue
+            insert = f"INSERT INTO {DELTA_TABLE} (source, {', '.join(GROUP_COLUMNS)}, frames, weight)"
+            cur.execute(f"""
+                CREATE OR REPLACE FUNCTION {source}_frame_delta() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                        {insert} {_select(source, 'old_rows', -1)};
+                    END IF;
+                    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+                        {insert} {_select(source, 'new_rows', 1)};
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                DROP TRIGGER IF EXISTS {source}_frame_delta_ins ON {source};
+                DROP TRIGGER IF EXISTS {source}_frame_delta_upd ON {source};
+                DROP TRIGGER IF EXISTS {source}_frame_delta_del ON {source};
+                CREATE TRIGGER {source}_frame_delta_ins AFTER INSERT ON {source}
+                    REFERENCING NEW TABLE AS new_rows
+                    FOR EACH STATEMENT EXECUTE FUNCTION {source}_frame_delta();
+                CREATE TRIGGER {source}_frame_delta_upd AFTER UPDATE ON {source}
+                    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+                    FOR EACH STATEMENT EXECUTE FUNCTION {source}_frame_delta();
+                CREATE TRIGGER {source}_frame_delta_del AFTER DELETE ON {source}
+                    REFERENCING OLD TABLE AS old_rows
+                    FOR EACH STATEMENT EXECUTE FUNCTION {source}_frame_delta();
+            """)
+    conn.commit()
+
+
+def aggregate(rows):
+    """
+    Fold (source, gpt_topic, political_leaning, split, frames, weight) rows into
+    {group key: (n_docs, n_labeled, frame_counts[15], cooccurrence[15, 15])}.
+    """
+    index = {label: i for i, label in enumerate(OFFICIAL_LABELS)}
+    keys = {}
+    group_of, hot, weights = [], [], []
+    for *key, frames, weight in rows:
+        key = tuple(key)
+        group_of.append(keys.setdefault(key, len(keys)))
+        row = np.zeros(NUM_LABELS, dtype=np.int64)
+        row[[index[f] for f in (frames or []) if f in index]] = 1
+        hot.append(row)
+        weights.append(weight)
+    if not keys:
+        return {}
+
+    group_of = np.array(group_of)
+    hot = np.array(hot)
+    weights = np.array(weights, dtype=np.int64)
+    n_groups = len(keys)
+
+    n_docs = np.bincount(group_of, weights=weights, minlength=n_groups).astype(np.int64)
+    n_labeled = np.bincount(group_of, weights=weights * (hot.sum(axis=1) > 0), minlength=n_groups).astype(np.int64)
+    counts = np.zeros((n_groups, NUM_LABELS), dtype=np.int64)
+    np.add.at(counts, group_of, hot * weights[:, None])
+    cooc = np.zeros((n_groups, NUM_LABELS, NUM_LABELS), dtype=np.int64)
+    np.add.at(cooc, group_of, hot[:, :, None] * hot[:, None, :] * weights[:, None, None])
+
+    return {key: (n_docs[g], n_labeled[g], counts[g], cooc[g]) for key, g in keys.items()}
+
+
+def _upsert(cur, totals):
+    for (source, topic, leaning, split), (n_docs, n_labeled, counts, cooc) in totals.items():
+        cur.execute(f"""
+            INSERT INTO {SUMMARY_TABLE} AS t
+                (source, gpt_topic, political_leaning, split, n_docs, n_labeled, frame_counts, cooccurrence)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (source, gpt_topic, political_leaning, split) DO UPDATE SET
+                n_docs = t.n_docs + EXCLUDED.n_docs,
+                n_labeled = t.n_labeled + EXCLUDED.n_labeled,
+                frame_counts = (SELECT array_agg(a + b ORDER BY i)
+                                FROM unnest(t.frame_counts, EXCLUDED.frame_counts) WITH ORDINALITY AS x(a, b, i)),
+                cooccurrence = (SELECT array_agg(a + b ORDER BY i)
+                                FROM unnest(t.cooccurrence, EXCLUDED.cooccurrence) WITH ORDINALITY AS x(a, b, i))
+        """, (source, topic, leaning, split, int(n_docs), int(n_labeled),
+              counts.tolist(), cooc.ravel().tolist()))
+    cur.execute(f"DELETE FROM {SUMMARY_TABLE} WHERE n_docs = 0")
+
+
+def refresh(conn):
+    """Fold pending deltas into the summary; returns the number of delta rows consumed."""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            WITH consumed AS (DELETE FROM {DELTA_TABLE} RETURNING *)
+            SELECT source, gpt_topic, political_leaning, split, frames, SUM(weight)
+            FROM consumed GROUP BY 1, 2, 3, 4, 5
+        """)
+        rows = cur.fetchall()
+        _upsert(cur, aggregate(rows))
+    conn.commit()
+    return len(rows)
+
+
+def rebuild(conn, sources=None):
+    """Recompute sources from their tables (locked against writes while counting)."""
+    with conn.cursor() as cur:
+        for source in sources or SOURCES:
+            cur.execute(f"SELECT to_regclass(%s)", (source,))
+            if cur.fetchone()[0] is None:
+                continue
+            cur.execute(f"LOCK TABLE {source} IN SHARE MODE")
+            cur.execute(f"DELETE FROM {SUMMARY_TABLE} WHERE source = %s", (source,))
+            cur.execute(f"DELETE FROM {DELTA_TABLE} WHERE source = %s", (source,))
+            cur.execute(_select(source, source))
+            _upsert(cur, aggregate(cur.fetchall()))
+            conn.commit()
+
+
+def sync(conn, source):
+    """
+    Bring one source's summary up to date after a write: refresh() when its
+    triggers are in place, otherwise install them and rebuild the source
+    (rows written before the triggers existed were never logged).
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_trigger WHERE tgname = %s", (f"{source}_frame_delta_ins",))
+        has_triggers = cur.fetchone() is not None
+    if has_triggers:
+        refresh(conn)
+    else:
+        install(conn)
+        rebuild(conn, [source])
+
+
+def _fetch(conn, sources=None, **filters):
+    """Summary rows matching sources and exact group values (None = any)."""
+    where, params = [], []
+    if sources is not None:
+        where.append("source = ANY(%s)")
+        params.append(list(sources))
+    for column, value in filters.items():
+        if column not in GROUP_COLUMNS:
+            raise ValueError(f"unknown group column {column!r}, expected one of {GROUP_COLUMNS}")
+        if value is not None:
+            where.append(f"{column} = %s")
+            params.append(value)
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT source, gpt_topic, political_leaning, split, n_docs, n_labeled, frame_counts, cooccurrence
+            FROM {SUMMARY_TABLE} {'WHERE ' + ' AND '.join(where) if where else ''}
+        """, params)
+        return cur.fetchall()
+
+
+def label_counts(conn, sources=None, **filters):
+    """(frame counts (15,), number of documents) over the matching groups."""
+    rows = _fetch(conn, sources, **filters)
+    if not rows:
+        return np.zeros(NUM_LABELS, dtype=np.int64), 0
+    return np.array([r[6] for r in rows], dtype=np.int64).sum(axis=0), int(sum(r[4] for r in rows))
+
+
+def cooccurrence(conn, sources=None, **filters):
+    """(15, 15) documents carrying both frames; the diagonal is the frame count."""
+    rows = _fetch(conn, sources, **filters)
+    matrix = np.zeros((NUM_LABELS, NUM_LABELS), dtype=np.int64)
+    for r in rows:
+        matrix += np.array(r[7], dtype=np.int64).reshape(NUM_LABELS, NUM_LABELS)
+    return matrix
+
+
+def counts_by(conn, column, sources=None, **filters):
+    """
+    Group values of `column` ('source' or a group column) with their
+    (k, 15) frame counts and (k,) document counts.
+    """
+    position = {"source": 0, "gpt_topic": 1, "political_leaning": 2, "split": 3}[column]
+    totals = {}
+    for r in _fetch(conn, sources, **filters):
+        counts, n_docs = totals.get(r[position], (np.zeros(NUM_LABELS, dtype=np.int64), 0))
+        totals[r[position]] = (counts + np.array(r[6], dtype=np.int64), n_docs + r[4])
+    keys = sorted(totals)
+    return keys, np.array([totals[k][0] for k in keys]).reshape(-1, NUM_LABELS), \
+        np.array([totals[k][1] for k in keys], dtype=np.int64)
+
+
+def pos_weight(conn, sources=("mm_framing_full",), **filters):
+    """BCEWithLogitsLoss pos_weight = negatives / positives, as in the training notebooks."""
+    counts, n_docs = label_counts(conn, sources, **filters)
+    return (n_docs - counts) / (counts + 1e-5)
+
+
+def print_report(conn):
+    for source in SOURCES:
+        counts, n_docs = label_counts(conn, [source])
+        if not n_docs:
+            continue
+        print(f"\n{source}: {n_docs} documents")
+        for i in np.argsort(-counts):
+            print(f"  {OFFICIAL_LABELS[i]:<48} {counts[i]:>8} ({counts[i] / n_docs:.1%})")
+
+        matrix = cooccurrence(conn, [source])
+        off_diagonal = np.triu(matrix, k=1)
+        top = np.dstack(np.unravel_index(np.argsort(-off_diagonal, axis=None)[:5], matrix.shape))[0]
+        print("  Most frequent pairs:")
+        for i, j in top:
+            if off_diagonal[i, j]:
+                print(f"    {OFFICIAL_LABELS[i]} + {OFFICIAL_LABELS[j]}: {off_diagonal[i, j]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--install', action='store_true', help='create tables and triggers, then rebuild')
+    parser.add_argument('--rebuild', nargs='*', choices=list(SOURCES), help='recompute these sources (all if none)')
+    parser.add_argument('--quiet', action='store_true', help='skip the report')
+    args = parser.parse_args()
+
+    from frame_delta.db import connect
+
+    conn = connect()
+    if args.install:
+        print("Installing summary tables and triggers...")
+        install(conn)
+        rebuild(conn)
+    elif args.rebuild is not None:
+        print(f"Rebuilding {', '.join(args.rebuild or SOURCES)}...")
+        rebuild(conn, args.rebuild or None)
+    else:
+        print(f"Refreshed from {refresh(conn)} pending delta groups")
+
+    if not args.quiet:
+        print_report(conn)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Model input construction shared by training notebooks and inference code.
+
+The frame models were trained on "TOPIC:{gpt_topic}\\n{title}\\n{body}" text
+(Longformer, Run 4) or "TOPIC: {gpt_topic}\\n..." (RoBERTa, Run 5), then
+either truncated to max_len or cut to head+tail. Inference has to rebuild
+exactly the same input, so both steps live here.
+"""
+
+import torch
+
+from frame_delta.token_store import head_tail_ids
+
+LONGFORMER_TOPIC_FORMAT = "TOPIC:{topic}\n"
+ROBERTA_TOPIC_FORMAT = "TOPIC: {topic}\n"
+# --topic-format choices; 'none' for models trained without the topic line
+TOPIC_FORMATS = {'longformer': LONGFORMER_TOPIC_FORMAT, 'roberta': ROBERTA_TOPIC_FORMAT, 'none': None}
+
+STRATEGIES = ('head_tail', 'truncate')
+
+
+def format_article(text, title=None, topic=None, topic_format=LONGFORMER_TOPIC_FORMAT):
+    """
+    Prepend title and topic the way the training notebooks did. topic_format
+    None (a model trained without the topic line) ignores the topic.
+    """
+    text = str(text or '')
+    if title:
+        text = f"{title}\n{text}"
+    if topic and topic_format:
+        text = topic_format.format(topic=topic) + text
+    return text
+
+
+def encode_texts(tokenizer, texts, max_len=512, strategy='head_tail', global_attention=False):
+    """
+    Tokenize a batch of formatted texts into padded tensors.
+
+    strategy: 'head_tail' keeps the first and last tokens (320/190 of 510 at
+    max_len=512, scaled for other lengths), 'truncate' keeps the first max_len.
+    Padding is to the longest sequence in the batch, not to max_len.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"strategy must be one of {STRATEGIES}, got {strategy!r}")
+
+    if strategy == 'truncate':
+        sequences = tokenizer(list(texts), max_length=max_len, truncation=True)['input_ids']
+    else:
+        content_len = max_len - 2
+        head_len = round(content_len * 320 / 510)
+        sequences = [
+            head_tail_ids(ids, tokenizer.cls_token_id, tokenizer.sep_token_id,
+                          head_len=head_len, tail_len=content_len - head_len)
+            for ids in tokenizer(list(texts))['input_ids']
+        ]
+    return pad_batch(sequences, tokenizer.pad_token_id, global_attention=global_attention)
+
+
+def pad_batch(sequences, pad_id, global_attention=False):
+    """Pad id lists to the longest one; optionally add a [CLS]-only global attention mask."""
+    longest = max(len(ids) for ids in sequences)
+    input_ids = torch.full((len(sequences), longest), pad_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(sequences), longest), dtype=torch.long)
+    for i, ids in enumerate(sequences):
+        input_ids[i, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+        attention_mask[i, :len(ids)] = 1
+
+    batch = {'input_ids': input_ids, 'attention_mask': attention_mask}
+    if global_attention:
+        global_attention_mask = torch.zeros_like(attention_mask)
+        global_attention_mask[:, 0] = 1
+        batch['global_attention_mask'] = global_attention_mask
+    return batch
@@ -0,0 +1,121 @@
+"""
+The 15-label MFC frame space shared by every framing classifier.
+
+The order of OFFICIAL_LABELS matches the classes of the MultiLabelBinarizer
+saved to notebooks/encoders/mlb_15_classes.pkl, so column i of any label or
+probability matrix is OFFICIAL_LABELS[i]. The FrAC and SemEval label tables
+are shared by their loaders and frame_delta.cross_eval.
+"""
+
+import os
+
+import numpy as np
+
+OFFICIAL_LABELS = [
+    "Economic", "Capacity and resources", "Morality", "Fairness and equality",
+    "Legality, constitutionality and jurisprudence", "Policy prescription and evaluation",
+    "Crime and punishment", "Security and defense", "Health and safety",
+    "Quality of life", "Cultural identity", "Public opinion", "Political",
+    "External regulation and reputation", "Other"
+]
+NUM_LABELS = len(OFFICIAL_LABELS)
+
+# FrAC gold standard (scripts/load_frac_to_postgres.py): MFC numeric label -> FrAC and MFC names
+# FrAC collapsed: Legality+Crime, Political+Policy, removed Capacity and External Regulation
+FRAC_LABEL_MAPPING = {
+    1: {
+        'frac': 'Economic',
+        'mfc': 'Economic'
+    },
+    3: {
+        'frac': 'Morality',
+        'mfc': 'Morality'
+    },
+    4: {
+        'frac': 'Fairness and Equality',
+        'mfc': 'Fairness and equality'
+    },
+    5: {
+        'frac': 'Legality and Crime',  # FrAC merged Legality + Crime
+        'mfc': 'Legality, constitutionality and jurisprudence'
+    },
+    6: {
+        'frac': 'Political and Policies',  # FrAC merged Policy + Political
+        'mfc': 'Policy prescription and evaluation'
+    },
+    7: {
+        'frac': 'Legality and Crime',  # Would map here if present
+        'mfc': 'Crime and punishment'
+    },
+    8: {
+        'frac': 'Security and Defense',
+        'mfc': 'Security and defense'
+    },
+    9: {
+        'frac': 'Health and Safety',
+        'mfc': 'Health and safety'
+    },
+    10: {
+        'frac': 'Quality of Life',  # Not in gold standard but defining for completeness
+        'mfc': 'Quality of life'
+    },
+    11: {
+        'frac': 'Cultural Identity',
+        'mfc': 'Cultural identity'
+    },
+    12: {
+        'frac': 'Public Opinion',
+        'mfc': 'Public opinion'
+    },
+    13: {
+        'frac': 'Political and Policies',  # Would map here if present
+        'mfc': 'Political'
+    },
+    15: {
+        'frac': 'Other',
+        'mfc': 'Other'
+    }
+}
+
+# SemEval 2023 subtask 2 (scripts/load_semeval_to_postgres.py): SemEval uses underscores, MFC spaces
+SEMEVAL_FRAME_NORMALIZE = {
+    'Economic': 'Economic',
+    'Capacity_and_resources': 'Capacity and resources',
+    'Morality': 'Morality',
+    'Fairness_and_equality': 'Fairness and equality',
+    'Legality_Constitutionality_and_jurisprudence': 'Legality, constitutionality and jurisprudence',
+    'Policy_prescription_and_evaluation': 'Policy prescription and evaluation',
+    'Crime_and_punishment': 'Crime and punishment',
+    'Security_and_defense': 'Security and defense',
+    'Health_and_safety': 'Health and safety',
+    'Quality_of_life': 'Quality of life',
+    'Cultural_identity': 'Cultural identity',
+    'Public_opinion': 'Public opinion',
+    'Political': 'Political',
+    'External_regulation_and_reputation': 'External regulation and reputation',
+}
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LABEL_ENCODER_PATH = os.path.join(PROJECT_ROOT, 'notebooks', 'encoders', 'mlb_15_classes.pkl')
+
+
+def load_label_encoder(path: str = LABEL_ENCODER_PATH):
+    """Load the fitted MultiLabelBinarizer and check it uses the official label order."""
+    import joblib
+
+    mlb = joblib.load(path)
+    if list(mlb.classes_) != OFFICIAL_LABELS:
+        raise ValueError(f"Label encoder at {path} does not match OFFICIAL_LABELS")
+    return mlb
+
+
+def binarize(frame_lists) -> np.ndarray:
+    """Turn an iterable of frame-name lists into an (N, 15) multi-hot matrix."""
+    index = {label: i for i, label in enumerate(OFFICIAL_LABELS)}
+    frame_lists = list(frame_lists)
+    matrix = np.zeros((len(frame_lists), NUM_LABELS), dtype=np.int64)
+    for row, frames in enumerate(frame_lists):
+        for frame in frames:
+            if frame in index:
+                matrix[row, index[frame]] = 1
+    return matrix
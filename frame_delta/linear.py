@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+"""
+Hashed n-gram features + one-vs-rest linear heads: a frame classifier cheap
+enough to label the whole newsarticles table on CPU.
+
+Features are hashed into a fixed 2^20 space, so nothing is fitted before
+training and batches can be featurized independently:
+
+    - word unigrams and bigrams over "{title}\\n{maintext}"
+    - char 3-5 grams over the first CHAR_PREFIX characters (title + lead)
+    - one "TOPIC:{gpt_topic}" feature, the same signal the transformer runs
+      get from the TOPIC: prefix
+
+Two hashers produce these: FrameHasher (default) hashes every n-gram of a
+whole batch at once with NumPy rolling hashes; vectorizer='sklearn' uses
+HashingVectorizer for the word and char_wb n-grams instead, as a reference,
+at about a quarter of the throughput (~2.5k vs ~550 articles/s per core on
+500-word articles; 10k+/s comes from --workers processes, one per core).
+
+Heads are 15 SGDClassifier(loss='log_loss') models, trained out of core with
+partial_fit over server-side cursor batches of mm_framing_full JOIN
+newsarticles. Train/val/test membership comes from a hash of the url
+(80/10/10), so every pass and every rerun sees the same split. Per-class
+thresholds are tuned on val with thresholds.optimize_thresholds, and test F1
+is printed next to Runs 1-5 from experiment_log.md.
+
+Usage:
+    python -m frame_delta.linear --tiny                          # synthetic benchmark
+    python -m frame_delta.linear --train --out-dir saved_models/linear_frames
+    python -m frame_delta.linear --label --out-dir saved_models/linear_frames --workers 8
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from frame_delta.labels import NUM_LABELS, OFFICIAL_LABELS, binarize
+from frame_delta.thresholds import apply_thresholds, f1_from_counts, optimize_thresholds
+
+N_FEATURES = 2 ** 20
+WORD_NGRAMS = (1, 2)
+CHAR_NGRAMS = (3, 5)
+CHAR_PREFIX = 1000
+MIN_WORDS = 100
+BATCH_SIZE = 5000
+LABEL_TABLE = "newsarticle_frames_linear"
+EXPERIMENT_LOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "experiment_log.md")
+
+TRAIN_QUERY = """
+    SELECT a.url, a.text_generic_frame, a.gpt_topic, a.title, b.maintext
+    FROM mm_framing_full a
+    JOIN newsarticles b ON a.url = b.url
+    WHERE b.maintext IS NOT NULL
+    ORDER BY md5(a.url || %s)
+"""
+LABEL_QUERY = """
+    SELECT n.url, n.title, n.maintext, f.gpt_topic
+    FROM newsarticles n
+    LEFT JOIN (SELECT DISTINCT ON (url) url, gpt_topic FROM mm_framing_full ORDER BY url) f ON f.url = n.url
+    WHERE n.maintext IS NOT NULL
+"""
+
+_P = np.uint64(0x100000001B3)
+_P_INV = np.uint64(pow(0x100000001B3, -1, 2 ** 64))
+_BIGRAM = np.uint64(0x9E3779B97F4A7C15)
+_MIX = np.uint64(0xFF51AFD7ED558CCD)
+_NAMESPACES = {'word': 0x1F3D5B79, 'bigram': 0x2E4C6A88, 'char': 0x3B5D7F91, 'topic': 0x4A6C8EA2}
+
+
+class FrameHasher:
+    """
+    Word/char n-gram and topic features hashed into n_features columns.
+
+    The hash of bytes s[i:j] is (H[j] - H[i]) * P^-i with H the prefix sums of
+    s[k] * P^k (mod 2^64), so every n-gram of a batch is hashed with a few
+    vectorised array operations. Rows are scaled to 1/sqrt(n-gram count).
+    """
+
+    def __init__(self, n_features=N_FEATURES, word_ngrams=WORD_NGRAMS, char_ngrams=CHAR_NGRAMS,
+                 char_prefix=CHAR_PREFIX, topic_weight=1.0, chunk_size=1000):
+        if n_features & (n_features - 1):
+            raise ValueError("n_features must be a power of two")
+        self.n_features = n_features
+        self.word_ngrams = word_ngrams
+        self.char_ngrams = char_ngrams
+        self.char_prefix = char_prefix
+        self.topic_weight = topic_weight
+        self.chunk_size = chunk_size
+        self._powers = np.ones(1, dtype=np.uint64)
+        self._inverse_powers = np.ones(1, dtype=np.uint64)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_powers'] = state['_inverse_powers'] = np.ones(1, dtype=np.uint64)
+        return state
+
+    def _ensure_powers(self, n):
+        if len(self._powers) > n:
+            return
+        size = max(n + 1, 2 * len(self._powers))
+        with np.errstate(over='ignore'):
+            self._powers = np.cumprod(np.r_[np.uint64(1), np.full(size - 1, _P)])
+            self._inverse_powers = np.cumprod(np.r_[np.uint64(1), np.full(size - 1, _P_INV)])
+
+    def _encode(self, texts):
+        """One NUL-separated byte buffer, its prefix hashes, and each document's end offset."""
+        encoded = [text.lower().encode('utf-8') for text in texts]
+        buffer = np.frombuffer(b'\0'.join(encoded) + b'\0', dtype=np.uint8)
+        ends = np.cumsum(np.fromiter((len(e) + 1 for e in encoded), dtype=np.int64, count=len(encoded))) - 1
+        self._ensure_powers(len(buffer))
+        prefix = np.zeros(len(buffer) + 1, dtype=np.uint64)
+        np.multiply(buffer, self._powers[:len(buffer)], out=prefix[1:], dtype=np.uint64, casting='unsafe')
+        prefix[1:] += self._powers[:len(buffer)]          # byte value + 1, so NULs still count
+        np.cumsum(prefix[1:], out=prefix[1:])
+        return buffer, prefix, ends
+
+    def _span_hash(self, prefix, start, end):
+        return (prefix[end] - prefix[start]) * self._inverse_powers[start]
+
+    def _columns(self, hashes, namespace):
+        h = hashes ^ np.uint64(_NAMESPACES[namespace])
+        h ^= h >> np.uint64(33)
+        h *= _MIX
+        h ^= h >> np.uint64(33)
+        return (h & np.uint64(self.n_features - 1)).astype(np.int32)
+
+    def _word_features(self, texts):
+        buffer, prefix, ends = self._encode(texts)
+        is_word = (buffer >= 128) | ((buffer >= 97) & (buffer <= 122)) | ((buffer >= 48) & (buffer <= 57))
+        edges = np.diff(is_word.view(np.int8), prepend=np.int8(0), append=np.int8(0))
+        starts, stops = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        word_hash = self._span_hash(prefix, starts, stops)
+        docs = np.searchsorted(ends, starts)
+        parts = []
+        if self.word_ngrams[0] <= 1:
+            parts.append((docs, self._columns(word_hash, 'word')))
+        if self.word_ngrams[1] >= 2:
+            same_doc = docs[1:] == docs[:-1]
+            bigram_hash = (word_hash[:-1] * _BIGRAM + word_hash[1:])[same_doc]
+            parts.append((docs[:-1][same_doc], self._columns(bigram_hash, 'bigram')))
+        return parts
+
+    def _char_features(self, texts):
+        buffer, prefix, ends = self._encode([text[:self.char_prefix] for text in texts])
+        positions = np.arange(len(buffer))
+        docs = np.searchsorted(ends, positions)
+        parts = []
+        for n in range(self.char_ngrams[0], self.char_ngrams[1] + 1):
+            start = positions[:len(buffer) - n]
+            start = start[start + n <= ends[docs[start]]]
+            parts.append((docs[start], self._columns(self._span_hash(prefix, start, start + n) + np.uint64(n),
+                                                     'char')))
+        return parts
+
+    def transform(self, texts, topics=None):
+        """(len(texts), n_features) float32 CSR matrix."""
+        import scipy.sparse as sp
+
+        texts = [text or '' for text in texts]
+        if len(texts) > self.chunk_size:
+            # bounded temporaries: every n-gram position of a chunk is held as int64 arrays
+            return sp.vstack([
+                self.transform(texts[i:i + self.chunk_size],
+                               None if topics is None else topics[i:i + self.chunk_size])
+                for i in range(0, len(texts), self.chunk_size)
+            ], format='csr')
+        n_docs = len(texts)
+        with np.errstate(over='ignore'):
+            parts = self._word_features(texts)
+            if self.char_ngrams and self.char_prefix:
+                parts += self._char_features(texts)
+            n_grams = sum(np.bincount(rows, minlength=n_docs) for rows, _ in parts)
+            values = [(1.0 / np.sqrt(np.maximum(n_grams, 1))).astype(np.float32)[rows] for rows, _ in parts]
+            if topics is not None:
+                topic_hashes = np.array([zlib.crc32(f"TOPIC:{topic}".encode('utf-8')) for topic in topics],
+                                        dtype=np.uint64)
+                has_topic = np.array([topic is not None for topic in topics])
+                rows = np.flatnonzero(has_topic)
+                parts.append((rows, self._columns(topic_hashes[rows], 'topic')))
+                values.append(np.full(len(rows), self.topic_weight, dtype=np.float32))
+
+        # every part is already ordered by document, so the CSR arrays are filled without sorting
+        counts = [np.bincount(rows, minlength=n_docs) for rows, _ in parts]
+        indptr = np.zeros(n_docs + 1, dtype=np.int64)
+        np.cumsum(sum(counts), out=indptr[1:])
+        indices = np.empty(indptr[-1], dtype=np.int32)
+        data = np.empty(indptr[-1], dtype=np.float32)
+        offset = indptr[:-1].copy()
+        for (rows, columns), part_values, part_counts in zip(parts, values, counts):
+            first = np.cumsum(part_counts) - part_counts
+            target = offset[rows] + np.arange(len(rows)) - first[rows]
+            indices[target] = columns
+            data[target] = part_values
+            offset += part_counts
+        return sp.csr_matrix((data, indices, indptr), shape=(n_docs, self.n_features))
+
+
+class SklearnHasher:
+    """The same feature groups built from sklearn's HashingVectorizer / FeatureHasher (slower reference)."""
+
+    def __init__(self, n_features=N_FEATURES, word_ngrams=WORD_NGRAMS, char_ngrams=CHAR_NGRAMS,
+                 char_prefix=CHAR_PREFIX):
+        from sklearn.feature_extraction import FeatureHasher
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.char_prefix = char_prefix
+        self.word = HashingVectorizer(n_features=n_features, ngram_range=word_ngrams, alternate_sign=False)
+        self.char = HashingVectorizer(n_features=n_features, analyzer='char_wb', ngram_range=char_ngrams,
+                                      alternate_sign=False)
+        self.topic = FeatureHasher(n_features=n_features, input_type='string', alternate_sign=False)
+
+    def transform(self, texts, topics=None):
+        import scipy.sparse as sp
+
+        texts = [text or '' for text in texts]
+        blocks = [self.word.transform(texts), self.char.transform([text[:self.char_prefix] for text in texts])]
+        if topics is not None:
+            blocks.append(self.topic.transform([[f"TOPIC:{topic}"] if topic is not None else [] for topic in topics]))
+        return sp.hstack(blocks, format='csr', dtype=np.float32)
+
+
+def make_vectorizer(kind='numpy', **kwargs):
+    return SklearnHasher(**kwargs) if kind == 'sklearn' else FrameHasher(**kwargs)
+
+
+class LinearFrameClassifier:
+    """One SGD logistic head per frame over hashed features, trained with partial_fit."""
+
+    def __init__(self, vectorizer=None, alpha=1e-6, labels=OFFICIAL_LABELS, random_state=42):
+        from sklearn.linear_model import SGDClassifier
+
+        self.vectorizer = vectorizer or FrameHasher()
+        self.labels = list(labels)
+        self.heads = [SGDClassifier(loss='log_loss', alpha=alpha, random_state=random_state + i)
+                      for i in range(len(self.labels))]
+        self.coef_ = None
+        self.intercept_ = None
+
+    def partial_fit(self, texts, labels_matrix, topics=None):
+        X = self.vectorizer.transform(texts, topics)
+        labels_matrix = np.asarray(labels_matrix)
+        for i, head in enumerate(self.heads):
+            head.partial_fit(X, labels_matrix[:, i], classes=np.array([0, 1]))
+        self.coef_ = None
+        return self
+
+    def _stack(self):
+        # one (n_features, C) matrix, so scoring is a single sparse x dense product
+        self.coef_ = np.ascontiguousarray(np.vstack([head.coef_.ravel() for head in self.heads]).T, dtype=np.float32)
+        self.intercept_ = np.array([head.intercept_[0] for head in self.heads], dtype=np.float32)
+
+    def predict_proba(self, texts, topics=None):
+        """(N, 15) sigmoid probabilities."""
+        from scipy.special import expit
+
+        if self.coef_ is None:
+            self._stack()
+        X = self.vectorizer.transform(texts, topics)
+        return expit(X @ self.coef_ + self.intercept_)
+
+    def save(self, path):
+        import joblib
+
+        if self.coef_ is None:
+            self._stack()
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        import joblib
+
+        return joblib.load(path)
+
+
+def split_of(urls, val_bucket=1, test_bucket=0, buckets=10):
+    """'train' / 'val' / 'test' per url from crc32(url) % 10 (80/10/10, stable across runs)."""
+    bucket = np.array([zlib.crc32(url.encode('utf-8')) % buckets for url in urls])
+    return np.where(bucket == test_bucket, 'test', np.where(bucket == val_bucket, 'val', 'train'))
+
+
+def _prepare(rows):
+    """DB rows -> (urls, texts, topics, label matrix), dropping articles of MIN_WORDS words or fewer."""
+    urls, texts, topics, frames = [], [], [], []
+    for url, frame_list, topic, title, maintext in rows:
+        if len(maintext.split()) <= MIN_WORDS:
+            continue
+        urls.append(url)
+        texts.append(f"{title or ''}\n{maintext}")
+        topics.append(topic)
+        frames.append(frame_list or [])
+    return urls, texts, topics, binarize(frames)
+
+
+def train(conn, model, epochs=2, batch_size=BATCH_SIZE):
+    """
+    Out-of-core training over the train split; val and test rows are kept in
+    memory (about 10% of mm_framing_full each) for threshold tuning and scoring.
+    Returns {'val': (probs, labels), 'test': (probs, labels)}.
+    """
+    from frame_delta.db import stream_rows
+
+    held_out = {'val': ([], [], []), 'test': ([], [], [])}
+    start = time.perf_counter()
+    seen = 0
+    for epoch in range(epochs):
+        print(f"\n======== EPOCH {epoch+1}/{epochs} ========")
+        for rows in stream_rows(conn, TRAIN_QUERY, (str(epoch),), batch_size=batch_size, name='linear_train'):
+            urls, texts, topics, labels = _prepare(rows)
+            split = split_of(urls)
+            train_rows = np.flatnonzero(split == 'train')
+            if len(train_rows):
+                model.partial_fit([texts[i] for i in train_rows], labels[train_rows],
+                                  [topics[i] for i in train_rows])
+            seen += len(train_rows)
+            if epoch == 0:
+                for name in held_out:
+                    rows_idx = np.flatnonzero(split == name)
+                    held_out[name][0].extend(texts[i] for i in rows_idx)
+                    held_out[name][1].extend(topics[i] for i in rows_idx)
+                    held_out[name][2].append(labels[rows_idx])
+            print(f"  {seen} training rows ({seen / (time.perf_counter() - start):.0f}/s)")
+
+    return {name: (model.predict_proba(texts, topics), np.vstack(labels))
+            for name, (texts, topics, labels) in held_out.items()}
+
+
+def score(probs, labels, thresholds):
+    """Micro/macro F1 and per-class F1 with per-class thresholds."""
+    preds = apply_thresholds(probs, thresholds).astype(bool)
+    labels = np.asarray(labels).astype(bool)
+    tp = (preds & labels).sum(axis=0)
+    fp, fn = preds.sum(axis=0) - tp, labels.sum(axis=0) - tp
+    per_class = f1_from_counts(tp, fp, fn)
+    return {
+        'micro_f1': float(f1_from_counts(tp.sum(), fp.sum(), fn.sum())),
+        'macro_f1': float(per_class.mean()),
+        'per_class_f1': dict(zip(OFFICIAL_LABELS, per_class.round(4).tolist())),
+    }
+
+
+def load_run_scores(path=EXPERIMENT_LOG):
+    """{'Run 1 (RoBERTa baseline)': (micro, macro), ...} from the summary block of experiment_log.md."""
+    pattern = re.compile(r"^(Run \d+ \([^)]*\))\s*->\s*Micro ([\d.]+), Macro ([\d.]+)", re.MULTILINE)
+    with open(path, encoding='utf-8') as f:
+        return {name: (float(micro), float(macro)) for name, micro, macro in pattern.findall(f.read())}
+
+
+def print_comparison(result, path=EXPERIMENT_LOG, name="Linear (hashed n-grams + topic)"):
+    runs = load_run_scores(path) if os.path.exists(path) else {}
+    print(f"\n{'Model':<34} {'Micro F1':>9} {'Macro F1':>9}")
+    for run, (micro, macro) in runs.items():
+        print(f"{run:<34} {micro:>9.3f} {macro:>9.3f}")
+    print(f"{name:<34} {result['micro_f1']:>9.3f} {result['macro_f1']:>9.3f}")
+
+
+_worker_model = None
+
+
+def _init_worker(model_path):
+    global _worker_model
+    _worker_model = LinearFrameClassifier.load(model_path)
+
+
+def _predict_batch(urls, texts, topics, thresholds):
+    probs = _worker_model.predict_proba(texts, topics)
+    preds = apply_thresholds(probs, thresholds).astype(bool)
+    frames = [[OFFICIAL_LABELS[j] for j in np.flatnonzero(row)] for row in preds]
+    return urls, frames, probs.astype(np.float32)
+
+
+def label_newsarticles(conn, model_path, thresholds, batch_size=BATCH_SIZE, workers=None):
+    """Predict frames for every newsarticles row into LABEL_TABLE (url, frames, probs)."""
+    from frame_delta.db import connect, copy_rows, stream_rows
+
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {LABEL_TABLE} (
+                url text PRIMARY KEY,
+                frames text[] NOT NULL,
+                probs real[] NOT NULL
+            )
+        """)
+        cur.execute(f"TRUNCATE {LABEL_TABLE}")
+    conn.commit()
+
+    read_conn = connect()
+    pending = deque()
+    max_pending = 2 * (workers or os.cpu_count() or 1)
+    processed = 0
+    start = time.perf_counter()
+
+    def drain(future):
+        nonlocal processed
+        urls, frames, probs = future.result()
+        with conn.cursor() as cur:
+            copy_rows(cur, LABEL_TABLE, ("url", "frames", "probs"),
+                      ((url, "{" + ",".join(f'"{f}"' for f in row_frames) + "}",
+                        "{" + ",".join(f"{p:.4f}" for p in row_probs) + "}")
+                       for url, row_frames, row_probs in zip(urls, frames, probs)))
+        conn.commit()
+        processed += len(urls)
+        print(f"  {processed} articles ({processed / (time.perf_counter() - start):.0f}/s)")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_path,)) as executor:
+        for rows in stream_rows(read_conn, LABEL_QUERY, batch_size=batch_size, name='linear_label'):
+            urls = [row[0] for row in rows]
+            texts = [f"{title or ''}\n{maintext}" for _, title, maintext, _ in rows]
+            topics = [row[3] for row in rows]
+            pending.append(executor.submit(_predict_batch, urls, texts, topics, thresholds))
+            while len(pending) >= max_pending:
+                drain(pending.popleft())
+        while pending:
+            drain(pending.popleft())
+    read_conn.close()
+    return processed
+
+
+def _synthetic_corpus(n, seed=0):
+    """Synthetic articles whose frames show up as words from a small per-frame vocabulary (and partly as topic)."""
+    from frame_delta.pipeline import synthetic_articles
+
+    rng = np.random.default_rng(seed)
+    articles = synthetic_articles(n, seed=seed)
+    labels = (rng.random((n, NUM_LABELS)) < 0.15).astype(np.int64)
+    topics = rng.integers(0, 30, n)
+    labels[:, 12] |= (topics < 10)                           # "Political" follows the topic
+    vocab = np.array([[f"frame{j}word{k}" for k in range(20)] for j in range(NUM_LABELS)])
+    texts = []
+    for article, row in zip(articles, labels):
+        cues = [vocab[j, rng.integers(0, 20, rng.integers(0, 8))] for j in np.flatnonzero(row)]
+        noise = vocab[rng.integers(0, NUM_LABELS), rng.integers(0, 20, 2)]
+        words = np.concatenate(cues + [noise, article['text'].split()])
+        rng.shuffle(words)
+        texts.append(f"{article['title']}\n{' '.join(words)}")
+    return texts, [f"topic_{t}" for t in topics], labels
+
+
+def _tiny_run(out_dir, n=20000, batch_size=2000, workers=2):
+    import tempfile
+
+    texts, topics, labels = _synthetic_corpus(n)
+    train_rows, val_rows, test_rows = np.arange(0, int(n * .8)), np.arange(int(n * .8), int(n * .9)), \
+        np.arange(int(n * .9), n)
+
+    model = LinearFrameClassifier()
+    start = time.perf_counter()
+    for epoch in range(2):
+        for i in range(0, len(train_rows), batch_size):
+            rows = train_rows[i:i + batch_size]
+            model.partial_fit([texts[j] for j in rows], labels[rows], [topics[j] for j in rows])
+    print(f"partial_fit: {2 * len(train_rows) / (time.perf_counter() - start):.0f} rows/s")
+
+    def probs_for(rows):
+        return model.predict_proba([texts[j] for j in rows], [topics[j] for j in rows])
+
+    thresholds, _ = optimize_thresholds(probs_for(val_rows), labels[val_rows])
+    result = score(probs_for(test_rows), labels[test_rows], thresholds)
+    print_comparison(result, name="Linear (synthetic data)")
+
+    for kind in ('numpy', 'sklearn'):
+        vectorizer = make_vectorizer(kind)
+        start = time.perf_counter()
+        vectorizer.transform(texts[:batch_size], topics[:batch_size])
+        print(f"{kind} featurization: {batch_size / (time.perf_counter() - start):.0f} articles/s (1 process)")
+
+    os.makedirs(out_dir or tempfile.gettempdir(), exist_ok=True)
+    model_path = os.path.join(out_dir or tempfile.gettempdir(), "linear_frames_tiny.joblib")
+    model.save(model_path)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_path,)) as executor:
+        futures = [executor.submit(_predict_batch, list(range(i, i + batch_size)), texts[i:i + batch_size],
+                                   topics[i:i + batch_size], thresholds) for i in range(0, n, batch_size)]
+        predicted = sum(len(f.result()[0]) for f in futures)
+    print(f"featurize + predict + threshold: {predicted / (time.perf_counter() - start):.0f} articles/s "
+          f"({workers} processes on {os.cpu_count()} CPUs)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tiny', action='store_true', help='synthetic training run and throughput benchmark')
+    parser.add_argument('--train', action='store_true', help='train on mm_framing_full, tune, score, save')
+    parser.add_argument('--label', action='store_true', help=f'label newsarticles into {LABEL_TABLE}')
+    parser.add_argument('--out-dir', default='saved_models/linear_frames')
+    parser.add_argument('--vectorizer', choices=['numpy', 'sklearn'], default='numpy')
+    parser.add_argument('--alpha', type=float, default=1e-6)
+    parser.add_argument('--epochs', type=int, default=2)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.tiny:
+        _tiny_run(None, workers=args.workers or 2)
+        return
+    if not (args.train or args.label):
+        parser.error('choose --train, --label or --tiny')
+
+    from frame_delta.db import connect
+    from frame_delta.thresholds import load_thresholds, save_thresholds
+
+    model_path = os.path.join(args.out_dir, "linear_frames.joblib")
+    thresholds_path = os.path.join(args.out_dir, "class_thresholds_optimized.json")
+    conn = connect()
+    if args.train:
+        os.makedirs(args.out_dir, exist_ok=True)
+        model = LinearFrameClassifier(make_vectorizer(args.vectorizer), alpha=args.alpha)
+        held_out = train(conn, model, epochs=args.epochs, batch_size=args.batch_size)
+        thresholds, _ = optimize_thresholds(*held_out['val'])
+        result = score(*held_out['test'], thresholds)
+        model.save(model_path)
+        save_thresholds(thresholds, thresholds_path)
+        with open(os.path.join(args.out_dir, "metrics.json"), "w") as f:
+            json.dump(result, f, indent=4)
+        print_comparison(result)
+    if args.label:
+        thresholds = load_thresholds(thresholds_path)
+        processed = label_newsarticles(conn, model_path, thresholds, batch_size=args.batch_size,
+                                       workers=args.workers)
+        print(f"Labelled {processed} articles into {LABEL_TABLE}.")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
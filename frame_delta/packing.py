@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Sequence packing of short articles into full 512-token RoBERTa rows.
+
+With the RoBERTa runs' filtering most articles are 100-400 words, so a
+fixed (N, 512) token store row is largely padding, and every padded row
+costs a full forward/backward. Packing concatenates several tokenized
+articles (each keeping its own <s> ... </s>) into one row:
+
+    row:        <s> a a a </s> <s> b b </s> <s> c c c c </s> <pad> ...
+    positions:  2   3 4 5 6    2   3 4 5    2   3 4 5 6 7    1
+    attention:  block-diagonal, so a, b and c never attend to each other
+
+Positions restart at padding_idx + 1 for every article and the attention
+mask is block-diagonal, so each article's hidden states are the same as if
+it had its own row. The classification head then runs on each article's
+<s> token, giving one row of logits per article for the BCE loss.
+
+Rows are filled best-fit decreasing from the token store's lengths (the
+attention_mask sums), once per dataset. PackedSequenceClassifier wraps a
+RoBERTa-style *ForSequenceClassification model (its head reads token 0) and
+keeps its state_dict keys, so packed training writes the same model_ep*.bin
+files as the notebooks and the model is evaluated and served unpacked. A
+PackedDataset loader plugs into training.train_engine unchanged. Needs a
+transformers version that accepts a prepared 4D attention mask.
+
+Usage:
+    python -m frame_delta.packing --tiny              # padded vs packed: pad tokens, epoch time, F1
+    python -m frame_delta.packing --store token_store/roberta_512 --stats
+"""
+
+import argparse
+import bisect
+import time
+from functools import partial
+
+import numpy as np
+import torch
+from torch import nn
+from torch.utils.data import Dataset
+from transformers.modeling_outputs import SequenceClassifierOutput
+
+from frame_delta.token_store import MAX_LEN
+
+MIN_FREE = 8        # a row with fewer free tokens than this is closed
+
+
+def pack_lengths(lengths, max_len=MAX_LEN):
+    """Best-fit decreasing packing of sequence lengths into rows of max_len -> list of index lists."""
+    lengths = np.asarray(lengths)
+    if lengths.max(initial=0) > max_len:
+        raise ValueError(f"a sequence of {lengths.max()} tokens does not fit max_len={max_len}")
+    rows, free = [], []          # free: sorted (tokens left, row) of open rows
+    for i in np.argsort(-lengths, kind='stable'):
+        n = int(lengths[i])
+        pos = bisect.bisect_left(free, (n, -1))
+        if pos < len(free):
+            left, row = free.pop(pos)
+        else:
+            left, row = max_len, len(rows)
+            rows.append([])
+        rows[row].append(int(i))
+        if left - n >= MIN_FREE:
+            bisect.insort(free, (left - n, row))
+    return rows
+
+
+def padding_stats(lengths, rows=None, batch_size=32, max_len=MAX_LEN, seed=0):
+    """
+    Share of padded tokens for fixed max_len rows (the notebooks), dynamic
+    padding to the longest row of each random batch, and packed rows
+    padded per batch (batch_size articles' worth of packed rows).
+    """
+    lengths = np.asarray(lengths)
+    real = lengths.sum()
+    rng = np.random.default_rng(seed)
+
+    def dynamic(row_lengths, size):
+        order = rng.permutation(len(row_lengths))
+        return sum(row_lengths[order[i:i + size]].max() * len(order[i:i + size])
+                   for i in range(0, len(order), size))
+
+    out = {'articles': len(lengths), 'real_tokens': int(real),
+           'fixed': 1 - real / (len(lengths) * max_len),
+           'dynamic': 1 - real / dynamic(lengths, batch_size)}
+    if rows is not None:
+        row_lengths = np.array([lengths[r].sum() for r in rows])
+        per_row = len(lengths) / len(rows)
+        out.update({'packed_rows': len(rows), 'articles_per_row': per_row,
+                    'packed': 1 - real / dynamic(row_lengths, max(1, round(batch_size / per_row)))})
+    return out
+
+
+class PackedDataset(Dataset):
+    def __init__(self, input_ids, attention_mask, labels=None, indices=None, max_len=MAX_LEN):
+        """
+        input_ids / attention_mask: (N, L) token store arrays (can be mmapped)
+        labels: (N, C) multi-hot matrix, or None at inference
+        indices: rows of the store to use (e.g. a split from load_splits)
+        """
+        self.input_ids = input_ids
+        self.labels = labels
+        self.indices = np.arange(len(input_ids)) if indices is None else np.asarray(indices)
+        self.lengths = np.asarray(attention_mask[self.indices]).sum(axis=1).astype(np.int64)
+        self.rows = pack_lengths(self.lengths, max_len)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, idx):
+        members = self.rows[idx]
+        stored = self.indices[members]
+        item = {
+            'input_ids': torch.as_tensor(np.concatenate([
+                np.asarray(self.input_ids[r, :n]) for r, n in zip(stored, self.lengths[members])
+            ]), dtype=torch.long),
+            'lengths': torch.as_tensor(self.lengths[members]),
+        }
+        if self.labels is not None:
+            item['labels'] = torch.as_tensor(np.asarray(self.labels[stored]), dtype=torch.float)
+        return item
+
+
+def collate_packed(batch, pad_id, padding_idx=None):
+    """
+    Pad packed rows to the longest in the batch. Returns input_ids and
+    position_ids (B, L), a (B, 1, L, L) bool block-diagonal attention_mask,
+    cls_index (flat B*L index of every article's <s>) and stacked labels.
+    """
+    padding_idx = pad_id if padding_idx is None else padding_idx
+    longest = max(len(item['input_ids']) for item in batch)
+    input_ids = torch.full((len(batch), longest), pad_id, dtype=torch.long)
+    position_ids = torch.full((len(batch), longest), padding_idx, dtype=torch.long)
+    attention_mask = torch.zeros((len(batch), 1, longest, longest), dtype=torch.bool)
+    cls_index = []
+    for b, item in enumerate(batch):
+        input_ids[b, :len(item['input_ids'])] = item['input_ids']
+        start = 0
+        for n in item['lengths'].tolist():
+            position_ids[b, start:start + n] = torch.arange(padding_idx + 1, padding_idx + 1 + n)
+            attention_mask[b, 0, start:start + n, start:start + n] = True
+            cls_index.append(b * longest + start)
+            start += n
+        # padding attends to itself only, so no softmax row is fully masked
+        pad = torch.arange(start, longest)
+        attention_mask[b, 0, pad, pad] = True
+
+    batch_out = {
+        'input_ids': input_ids,
+        'attention_mask': attention_mask,
+        'position_ids': position_ids,
+        'cls_index': torch.tensor(cls_index, dtype=torch.long),
+    }
+    if 'labels' in batch[0]:
+        batch_out['labels'] = torch.cat([item['labels'] for item in batch])
+    return batch_out
+
+
+class PackedSequenceClassifier(nn.Module):
+    def __init__(self, model):
+        """
+        model: a RoBERTa-style *ForSequenceClassification whose classifier
+        head pools token 0 of its input (RobertaClassificationHead).
+        Unpacked batches (no cls_index) go straight to the wrapped model.
+        """
+        super().__init__()
+        self.model = model
+        self.config = model.config
+
+    def state_dict(self, *args, **kwargs):
+        return self.model.state_dict(*args, **kwargs)
+
+    def load_state_dict(self, state_dict, *args, **kwargs):
+        return self.model.load_state_dict(state_dict, *args, **kwargs)
+
+    def forward(self, input_ids, attention_mask, position_ids=None, cls_index=None, labels=None):
+        if cls_index is None:
+            logits = self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+        else:
+            dtype = next(self.model.parameters()).dtype
+            additive = torch.zeros(attention_mask.shape, dtype=dtype, device=attention_mask.device)
+            additive = additive.masked_fill(~attention_mask, torch.finfo(dtype).min)
+            encoder = getattr(self.model, self.model.base_model_prefix)
+            hidden = encoder(input_ids=input_ids, attention_mask=additive,
+                             position_ids=position_ids).last_hidden_state
+            starts = hidden.reshape(-1, hidden.shape[-1])[cls_index]
+            logits = self.model.classifier(starts.unsqueeze(1))
+
+        loss = None
+        if labels is not None:
+            loss = nn.functional.binary_cross_entropy_with_logits(logits, labels)
+        return SequenceClassifierOutput(loss=loss, logits=logits)
+
+
+def _synthetic_store(n, seed=0, vocab_size=1000, num_labels=15, max_len=MAX_LEN, cue_share=0.1):
+    """
+    Token rows of 100-400 "words" (~1.3 tokens each); each label has its own
+    cue token, which fills about cue_share of the article when the label is on.
+    """
+    rng = np.random.default_rng(seed)
+    lengths = np.minimum((rng.integers(100, 401, n) * 1.3).astype(int), max_len - 2)
+    labels = (rng.random((n, num_labels)) < 0.2).astype(np.float32)
+    cues = 3 + np.arange(num_labels)
+    input_ids = np.full((n, max_len), 1, dtype=np.int32)
+    attention_mask = np.zeros((n, max_len), dtype=np.int8)
+    for i, length in enumerate(lengths):
+        body = rng.integers(3 + num_labels, vocab_size, length)
+        for label in np.flatnonzero(labels[i]):
+            body[rng.integers(0, length, max(1, int(cue_share * length)))] = cues[label]
+        input_ids[i, :length + 2] = np.concatenate([[0], body, [2]])
+        attention_mask[i, :length + 2] = 1
+    return input_ids, attention_mask, labels
+
+
+def _tiny_run(n=1600, epochs=12, batch_size=16, seed=0):
+    from torch.utils.data import DataLoader, TensorDataset
+
+    from frame_delta.accumulator import MetricAccumulator, evaluate
+    from frame_delta.tiny import tiny_config
+
+    input_ids, attention_mask, labels = _synthetic_store(n, seed)
+    train_rows, val_rows = np.arange(0, n - 320), np.arange(n - 320, n)
+    config = tiny_config()
+    config.update({'hidden_size': 64, 'num_attention_heads': 4, 'intermediate_size': 128,
+                   'hidden_dropout_prob': 0.0, 'attention_probs_dropout_prob': 0.0})
+
+    class DictDataset(TensorDataset):
+        def __getitem__(self, idx):
+            ids, mask, y = super().__getitem__(idx)
+            return {'input_ids': ids, 'attention_mask': mask, 'labels': y}
+
+    def as_tensors(rows):
+        return (torch.as_tensor(input_ids[rows], dtype=torch.long),
+                torch.as_tensor(attention_mask[rows], dtype=torch.long), torch.as_tensor(labels[rows]))
+
+    packed_train = PackedDataset(input_ids, attention_mask, labels, train_rows)
+    per_row = len(train_rows) / len(packed_train)
+    stats = padding_stats(packed_train.lengths, packed_train.rows, batch_size)
+    print(f"{stats['articles']} articles -> {stats['packed_rows']} packed rows "
+          f"({stats['articles_per_row']:.2f} articles per row)")
+    print(f"padded tokens: {stats['fixed']:.1%} fixed 512 rows, {stats['dynamic']:.1%} dynamic padding, "
+          f"{stats['packed']:.1%} packed")
+
+    val_loader = DataLoader(DictDataset(*as_tensors(val_rows)), batch_size=64)
+    loaders = {
+        'padded': DataLoader(DictDataset(*as_tensors(train_rows)), batch_size=batch_size, shuffle=True),
+        'packed': DataLoader(packed_train, batch_size=max(1, round(batch_size / per_row)), shuffle=True,
+                             collate_fn=partial(collate_packed, pad_id=1)),
+    }
+
+    # the same articles packed and unpacked give the same logits; rows holding
+    # several articles are the ones where a leaking mask or position would show
+    from transformers import AutoModelForSequenceClassification
+
+    torch.manual_seed(seed)
+    check = PackedSequenceClassifier(AutoModelForSequenceClassification.from_config(config)).eval()
+    multi = [i for i, row in enumerate(packed_train.rows) if len(row) > 1][:2]
+    batch = collate_packed([packed_train[i] for i in multi], pad_id=1)
+    members = [m for i in multi for m in packed_train.rows[i]]
+    with torch.no_grad():
+        packed_logits = check(**{k: v for k, v in batch.items() if k != 'labels'}).logits
+        ids, mask, _ = as_tensors(train_rows[members])
+        plain_logits = check(input_ids=ids, attention_mask=mask).logits
+    print(f"max |packed - unpacked| logit difference over {len(members)} articles in {len(multi)} rows: "
+          f"{(packed_logits - plain_logits).abs().max():.2e}")
+
+    # predicting every label for every article; a model that has learned anything beats this
+    prevalence = labels[val_rows].mean(axis=0)
+    print(f"all-positive baseline macro F1: {float(np.mean(2 * prevalence / (1 + prevalence))):.4f}")
+
+    print(f"\n{'mode':<8} {'epoch s':>8} {'steps':>6} {'val loss':>9} {'macro F1':>9}")
+    results = {}
+    for mode, loader in loaders.items():
+        torch.manual_seed(seed)
+        model = PackedSequenceClassifier(AutoModelForSequenceClassification.from_config(config))
+        optimizer = torch.optim.AdamW(model.parameters(), lr=3e-3)
+        criterion = nn.BCEWithLogitsLoss()
+        epoch_times = []
+        for _ in range(epochs):
+            model.train()
+            start = time.perf_counter()
+            for batch in loader:
+                outputs = model(**{k: v for k, v in batch.items() if k != 'labels'})
+                loss = criterion(outputs.logits, batch['labels'])
+                loss.backward()
+                optimizer.step()
+                optimizer.zero_grad()
+            epoch_times.append(time.perf_counter() - start)
+        acc = evaluate(model, val_loader, 'cpu', MetricAccumulator(), criterion=criterion, progress=False)
+        thresholds, _ = acc.best_thresholds()
+        results[mode] = float(np.mean(epoch_times))
+        print(f"{mode:<8} {results[mode]:>8.2f} {len(loader):>6} {acc.loss:>9.4f} "
+              f"{float(acc.f1_at(thresholds).mean()):>9.4f}")
+    print(f"\nspeedup per epoch: {results['padded'] / results['packed']:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tiny', action='store_true', help='train a small model padded vs packed on CPU')
+    parser.add_argument('--store', help='token store directory to report packing statistics for')
+    parser.add_argument('--stats', action='store_true', help='only print padding statistics for --store')
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--epochs', type=int, default=12)
+    args = parser.parse_args()
+
+    if args.tiny:
+        _tiny_run(epochs=args.epochs, batch_size=args.batch_size)
+        return
+    if not args.store:
+        parser.error('choose --tiny or --store')
+
+    from frame_delta.token_store import load_token_store
+
+    loaded = load_token_store(args.store)
+    if loaded is None:
+        parser.error(f'no token store at {args.store}')
+    _, attention_mask, meta = loaded
+    lengths = np.asarray(attention_mask).sum(axis=1)
+    stats = padding_stats(lengths, pack_lengths(lengths, meta['max_len']), args.batch_size, meta['max_len'])
+    print(f"{stats['articles']} articles, {stats['real_tokens']} real tokens, "
+          f"{stats['packed_rows']} packed rows ({stats['articles_per_row']:.2f} articles per row)")
+    print(f"padded tokens: {stats['fixed']:.1%} fixed rows, {stats['dynamic']:.1%} dynamic padding "
+          f"(batch {args.batch_size}), {stats['packed']:.1%} packed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Two-stage topic -> frame pipeline with a single tokenization pass.
+
+New articles have no GPT topic, so the topic_classifier_bert_v2 model has to
+run before the frame model can be given its "TOPIC:{topic}" prefix. Both
+models use the RoBERTa BPE vocabulary (Longformer reuses it), so the article
+is tokenized once:
+
+    title ids + body ids        tokenized once per batch
+    topic input  = head+tail(body ids)                     (as in topic_classifier_bert_v2)
+    frame input  = topic prefix ids + title ids + body ids (head+tail or truncated)
+
+The prefix ids for every topic are tokenized once when the pipeline is built.
+Pieces are split at newlines, so concatenating their ids gives the same
+tokens as tokenizing the full "TOPIC:...\\ntitle\\nbody" string.
+
+Usage:
+    python -m frame_delta.pipeline --tiny --n 512          # CPU benchmark
+    python -m frame_delta.pipeline --topic-model notebooks/saved_models/final_topic_classifier \\
+        --frame-base-model FacebookAI/roberta-base --frame-weights .../best_model_state.bin \\
+        --frame-thresholds .../class_thresholds.json --topic-labels topics.json --input articles.parquet
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import torch
+
+from frame_delta.inputs import ROBERTA_TOPIC_FORMAT, encode_texts, format_article, pad_batch
+from frame_delta.labels import OFFICIAL_LABELS
+from frame_delta.token_store import HEAD_LEN, TAIL_LEN
+
+
+def _head_tail(ids, content_len):
+    """Head+tail cut of content ids (no specials) scaled to content_len."""
+    if len(ids) <= content_len:
+        return ids
+    head_len = round(content_len * HEAD_LEN / (HEAD_LEN + TAIL_LEN))
+    return ids[:head_len] + ids[len(ids) - (content_len - head_len):]
+
+
+class TopicFramePipeline:
+    def __init__(self, topic_model, frame_model, tokenizer, topic_labels, frame_thresholds,
+                 frame_labels=OFFICIAL_LABELS, topic_max_len=512, frame_max_len=512,
+                 frame_strategy='head_tail', topic_format=ROBERTA_TOPIC_FORMAT, device='cpu'):
+        """
+        topic_labels: id -> topic name, in the order the topic model was trained
+                      (id_to_label in topic_classifier_bert_v2.ipynb)
+        frame_strategy: 'head_tail' (RoBERTa runs) or 'truncate' (Longformer)
+        """
+        self.topic_model = topic_model.to(device).eval()
+        self.frame_model = frame_model.to(device).eval()
+        self.tokenizer = tokenizer
+        self.topic_labels = list(topic_labels)
+        self.frame_thresholds = np.asarray(frame_thresholds, dtype=float)
+        self.frame_labels = list(frame_labels)
+        self.topic_max_len = topic_max_len
+        self.frame_max_len = frame_max_len
+        self.frame_strategy = frame_strategy
+        self.topic_format = topic_format
+        self.device = device
+        self.frame_global_attention = getattr(frame_model.config, 'model_type', '') == 'longformer'
+
+        # cached "TOPIC: x\n" ids, one entry per topic id
+        self.topic_prefix_ids = tokenizer(
+            [topic_format.format(topic=label) for label in self.topic_labels],
+            add_special_tokens=False
+        )['input_ids']
+
+    def _tokenize(self, articles):
+        """Title and body ids for a batch, in one tokenizer call."""
+        titles = [f"{a['title']}\n" if a.get('title') else '' for a in articles]
+        bodies = [str(a.get('text') or '') for a in articles]
+        ids = self.tokenizer(titles + bodies, add_special_tokens=False)['input_ids']
+        return ids[:len(articles)], ids[len(articles):]
+
+    def _wrap(self, ids):
+        return [self.tokenizer.cls_token_id] + ids + [self.tokenizer.sep_token_id]
+
+    def _topic_batch(self, body_ids):
+        content_len = self.topic_max_len - 2
+        return pad_batch([self._wrap(_head_tail(ids, content_len)) for ids in body_ids],
+                         self.tokenizer.pad_token_id)
+
+    def _frame_batch(self, topic_ids, title_ids, body_ids):
+        content_len = self.frame_max_len - 2
+        sequences = []
+        for topic_id, title, body in zip(topic_ids, title_ids, body_ids):
+            ids = self.topic_prefix_ids[topic_id] + title + body
+            if self.frame_strategy == 'head_tail':
+                ids = _head_tail(ids, content_len)
+            else:
+                ids = ids[:content_len]
+            sequences.append(self._wrap(ids))
+        return pad_batch(sequences, self.tokenizer.pad_token_id,
+                         global_attention=self.frame_global_attention)
+
+    def _forward(self, model, batch):
+        batch = {k: v.to(self.device) for k, v in batch.items()}
+        return model(**batch).logits
+
+    def run(self, articles, batch_size=32):
+        """
+        Predict topic and frames for a list of {'text', 'title'} dicts.
+
+        Returns (topics, frame_probs, frame_preds): topic names, an (N, 15)
+        probability matrix and its thresholded 0/1 matrix.
+        """
+        topics = []
+        probs = []
+        with torch.inference_mode():
+            for start in range(0, len(articles), batch_size):
+                chunk = articles[start:start + batch_size]
+                title_ids, body_ids = self._tokenize(chunk)
+
+                topic_logits = self._forward(self.topic_model, self._topic_batch(body_ids))
+                topic_ids = topic_logits.argmax(dim=-1).tolist()
+
+                frame_logits = self._forward(self.frame_model,
+                                             self._frame_batch(topic_ids, title_ids, body_ids))
+                topics.extend(self.topic_labels[t] for t in topic_ids)
+                probs.append(torch.sigmoid(frame_logits).float().cpu().numpy())
+
+        probs = np.vstack(probs)
+        return topics, probs, (probs > self.frame_thresholds[None, :]).astype(int)
+
+    def run_separately(self, articles, batch_size=32):
+        """
+        Baseline: the two models as independent steps, each tokenizing from text.
+
+        The topic model tokenizes the body, then the frame text is rebuilt with
+        the predicted topic and tokenized again from scratch.
+        """
+        topics = []
+        with torch.inference_mode():
+            for start in range(0, len(articles), batch_size):
+                chunk = articles[start:start + batch_size]
+                batch = encode_texts(self.tokenizer, [a.get('text') or '' for a in chunk],
+                                     max_len=self.topic_max_len, strategy='head_tail')
+                topic_ids = self._forward(self.topic_model, batch).argmax(dim=-1).tolist()
+                topics.extend(self.topic_labels[t] for t in topic_ids)
+
+            probs = []
+            for start in range(0, len(articles), batch_size):
+                chunk = articles[start:start + batch_size]
+                texts = [format_article(a.get('text'), a.get('title'), topic, self.topic_format)
+                         for a, topic in zip(chunk, topics[start:start + batch_size])]
+                batch = encode_texts(self.tokenizer, texts, max_len=self.frame_max_len,
+                                     strategy=self.frame_strategy,
+                                     global_attention=self.frame_global_attention)
+                probs.append(torch.sigmoid(self._forward(self.frame_model, batch)).float().cpu().numpy())
+
+        probs = np.vstack(probs)
+        return topics, probs, (probs > self.frame_thresholds[None, :]).astype(int)
+
+
+def benchmark(pipeline, articles, batch_size=32, repeats=3):
+    """Articles/sec of the combined pipeline vs the two models run separately."""
+    results = {}
+    for name, fn in [('separate', pipeline.run_separately), ('combined', pipeline.run)]:
+        fn(articles[:batch_size], batch_size)  # warm-up
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn(articles, batch_size)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        results[name] = {'seconds': round(best, 3), 'articles_per_sec': round(len(articles) / best, 1)}
+
+    results['speedup'] = round(results['combined']['articles_per_sec']
+                               / results['separate']['articles_per_sec'], 2)
+
+    _, sep_probs, _ = pipeline.run_separately(articles, batch_size)
+    _, comb_probs, _ = pipeline.run(articles, batch_size)
+    results['max_prob_diff'] = float(np.abs(sep_probs - comb_probs).max())
+    return results
+
+
+def tiny_pipeline(n_topics=20):
+    """Random-init topic and frame models sharing the tiny hashing tokenizer."""
+    from frame_delta.tiny import tiny_classifier, tiny_tokenizer
+
+    topic_model = tiny_classifier(num_labels=n_topics, seed=1)
+    topic_model.config.problem_type = 'single_label_classification'
+    return TopicFramePipeline(
+        topic_model, tiny_classifier(seed=2), tiny_tokenizer(),
+        topic_labels=[f'Topic {i}' for i in range(n_topics)],
+        frame_thresholds=np.full(len(OFFICIAL_LABELS), 0.5),
+    )
+
+
+def synthetic_articles(n, seed=0):
+    rng = np.random.default_rng(seed)
+    words = np.array(['immigration', 'court', 'economy', 'vote', 'police', 'health', 'school',
+                      'border', 'tax', 'senate', 'market', 'crime', 'policy', 'family'])
+    return [
+        {'title': ' '.join(rng.choice(words, 8)),
+         'text': '\n'.join(' '.join(rng.choice(words, 60)) for _ in range(rng.integers(2, 15)))}
+        for _ in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tiny', action='store_true', help='benchmark tiny random-init models on CPU')
+    parser.add_argument('--topic-model', help='save_pretrained directory of the topic classifier')
+    parser.add_argument('--topic-labels', help='JSON list of topic names in label-id order')
+    parser.add_argument('--frame-base-model', default='FacebookAI/roberta-base')
+    parser.add_argument('--frame-weights')
+    parser.add_argument('--frame-thresholds')
+    parser.add_argument('--frame-max-len', type=int, default=512)
+    parser.add_argument('--frame-strategy', choices=['head_tail', 'truncate'], default='head_tail')
+    parser.add_argument('--input', help='parquet with title/text columns (synthetic if omitted)')
+    parser.add_argument('--n', type=int, default=256)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+
+    if args.tiny:
+        pipeline = tiny_pipeline()
+    else:
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        from frame_delta.thresholds import load_thresholds
+
+        with open(args.topic_labels, 'r') as f:
+            topic_labels = json.load(f)
+        topic_model = AutoModelForSequenceClassification.from_pretrained(args.topic_model)
+        frame_model = AutoModelForSequenceClassification.from_pretrained(
+            args.frame_base_model, num_labels=len(OFFICIAL_LABELS),
+            problem_type="multi_label_classification"
+        )
+        frame_model.load_state_dict(torch.load(args.frame_weights, map_location=args.device))
+        pipeline = TopicFramePipeline(
+            topic_model, frame_model, AutoTokenizer.from_pretrained(args.topic_model),
+            topic_labels, load_thresholds(args.frame_thresholds),
+            frame_max_len=args.frame_max_len, frame_strategy=args.frame_strategy, device=args.device,
+        )
+
+    if args.input:
+        import pandas as pd
+        df = pd.read_parquet(args.input, columns=['title', 'text']).head(args.n)
+        articles = df.to_dict('records')
+    else:
+        articles = synthetic_articles(args.n)
+
+    print(f"Benchmarking {len(articles)} articles, batch size {args.batch_size}...")
+    results = benchmark(pipeline, articles, args.batch_size)
+    for name in ('separate', 'combined'):
+        print(f"  {name:<9} {results[name]['articles_per_sec']:>8.1f} articles/sec "
+              f"({results[name]['seconds']:.2f}s)")
+    print(f"  speedup   {results['speedup']:.2f}x")
+    print(f"  max |prob diff| between paths: {results['max_prob_diff']:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Salient-passage selection to fit long articles into the 512-token budget.
+
+Instead of the fixed head(320)+tail(190) cut, every article body is split into
+passages (paragraphs, with overly long paragraphs split into sentences), each
+passage is scored against TF-IDF centroids of the 15 frames fitted on the
+training labels, and the highest-scoring passages are packed into the token
+budget and emitted in document order. The TOPIC/title prefix and the lead
+paragraph are always kept.
+
+Scoring, tokenization and packing all run over the whole corpus at once:
+one sparse matrix product scores every passage, one batched tokenizer call
+measures them, and packing is a lexsort + cumsum over the flat passage table.
+
+    scorer = SalienceScorer().fit(train_bodies, train_labels_matrix)
+    input_ids, attention_mask = cached_salient_encode(
+        'token_store/salient_roberta', prefixes, bodies, tokenizer, scorer)
+"""
+
+import re
+
+import numpy as np
+
+from frame_delta.token_store import MAX_LEN, fingerprint, load_token_store, save_token_store, to_padded_arrays
+
+MAX_PASSAGE_CHARS = 600
+
+PARAGRAPH_RE = re.compile(r'\n*[^\n]+')
+SENTENCE_SPLIT_RE = re.compile(r'(?:(?<=[.!?])|(?<=[.!?]["”’)]))(?=\s+["“(]?[A-Z0-9])')
+
+
+def split_passages(text, max_passage_chars=MAX_PASSAGE_CHARS):
+    """
+    Split a body into paragraphs, and long paragraphs into sentences.
+
+    Whitespace is kept at the start of each passage, so concatenating the
+    tokens of the passages reproduces the tokenization of the full text.
+    """
+    passages = []
+    for paragraph in PARAGRAPH_RE.findall(text or ''):
+        if len(paragraph) > max_passage_chars:
+            passages.extend(p for p in SENTENCE_SPLIT_RE.split(paragraph) if p.strip())
+        elif paragraph.strip():
+            passages.append(paragraph)
+    return passages
+
+
+def flatten_passages(bodies, max_passage_chars=MAX_PASSAGE_CHARS):
+    """Flat passage list plus the article index and in-article position of each passage."""
+    passages = []
+    doc_index = []
+    position = []
+    for i, body in enumerate(bodies):
+        parts = split_passages(body, max_passage_chars)
+        passages.extend(parts)
+        doc_index.extend([i] * len(parts))
+        position.extend(range(len(parts)))
+    return passages, np.array(doc_index, dtype=np.int64), np.array(position, dtype=np.int64)
+
+
+class SalienceScorer:
+    def __init__(self, max_features=50000, min_df=5):
+        """TF-IDF centroids per frame, fitted on article bodies and their frame labels."""
+        self.max_features = max_features
+        self.min_df = min_df
+        self.vectorizer = None
+        self.cue_weights = None  # (n_frames, vocab) non-negative
+        self.column_mean = None
+        self.column_std = None
+
+    def fit(self, bodies, labels_matrix):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        labels = np.asarray(labels_matrix, dtype=np.float64)
+        self.vectorizer = TfidfVectorizer(
+            sublinear_tf=True, stop_words='english',
+            max_features=self.max_features, min_df=self.min_df
+        )
+        X = self.vectorizer.fit_transform(bodies)
+
+        # Frame centroid minus corpus centroid: what is over-represented in
+        # articles with the frame. Negative weights are dropped so the result
+        # reads as a cue-word lexicon per frame.
+        frame_sums = np.asarray((X.T @ labels).T)  # (n_frames, vocab)
+        frame_counts = np.maximum(labels.sum(axis=0), 1)[:, None]
+        corpus_mean = np.asarray(X.mean(axis=0))
+        self.cue_weights = np.clip(frame_sums / frame_counts - corpus_mean, 0, None)
+
+        # Standardize per-frame scores so cues of rare frames compete with
+        # cues of the dominant ones
+        scores = self._raw_scores(X)
+        self.column_mean = scores.mean(axis=0)
+        self.column_std = scores.std(axis=0) + 1e-9
+        return self
+
+    def _raw_scores(self, X):
+        return np.asarray(X @ self.cue_weights.T)
+
+    def score(self, passages) -> np.ndarray:
+        """(n_passages,) salience: best standardized frame-cue score of each passage."""
+        X = self.vectorizer.transform(passages)
+        scores = (self._raw_scores(X) - self.column_mean) / self.column_std
+        return scores.max(axis=1)
+
+    def top_cues(self, labels, n=15):
+        """The n strongest cue words per frame, for sanity checking the lexicon."""
+        vocab = np.array(self.vectorizer.get_feature_names_out())
+        order = np.argsort(-self.cue_weights, axis=1)[:, :n]
+        return {label: vocab[order[i]].tolist() for i, label in enumerate(labels)}
+
+    def cache_key(self) -> str:
+        """Identifies the fitted lexicon in token-store metadata."""
+        return fingerprint(np.round(self.cue_weights.sum(axis=1), 6).tolist()
+                           + [self.max_features, self.min_df])
+
+    def save(self, path):
+        import joblib
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        import joblib
+        return joblib.load(path)
+
+
+def pack_passages(doc_index, position, scores, lengths, budgets):
+    """
+    Choose which passages to keep in each article.
+
+    Passages are ranked within their article by score (position 0 - the lead -
+    always first), and kept while the running token count fits the article's
+    budget. Returns a boolean mask over the flat passage table.
+    """
+    ranked_scores = np.where(position == 0, np.inf, scores)
+    order = np.lexsort((-ranked_scores, doc_index))  # by article, best first
+
+    sorted_docs = doc_index[order]
+    sorted_lengths = lengths[order]
+    cumulative = np.cumsum(sorted_lengths)
+    doc_starts = np.searchsorted(sorted_docs, sorted_docs, side='left')
+    offset = np.concatenate([[0], cumulative])[doc_starts]
+    used = cumulative - offset
+
+    keep_sorted = used <= budgets[sorted_docs]
+    # the top passage is always kept (and clipped later) so no article is left empty
+    keep_sorted |= np.r_[True, sorted_docs[1:] != sorted_docs[:-1]]
+
+    keep = np.zeros(len(order), dtype=bool)
+    keep[order] = keep_sorted
+    return keep
+
+
+def salient_encode(prefixes, bodies, tokenizer, scorer, max_len=MAX_LEN,
+                   max_passage_chars=MAX_PASSAGE_CHARS):
+    """
+    Build (N, max_len) input_ids / attention_mask from salient passages.
+
+    prefixes: per-article text always kept in front, e.g. "TOPIC: x\\ntitle\\n"
+    bodies: per-article body text to select passages from
+    """
+    cls_id, sep_id, pad_id = tokenizer.cls_token_id, tokenizer.sep_token_id, tokenizer.pad_token_id
+    content_len = max_len - 2
+
+    passages, doc_index, position = flatten_passages(bodies, max_passage_chars)
+    scores = scorer.score(passages) if passages else np.zeros(0)
+
+    prefix_ids = tokenizer(list(prefixes), add_special_tokens=False)['input_ids']
+    passage_ids = tokenizer(passages, add_special_tokens=False)['input_ids'] if passages else []
+    lengths = np.array([len(ids) for ids in passage_ids], dtype=np.int64)
+    budgets = np.maximum(content_len - np.array([len(ids) for ids in prefix_ids]), 0)
+
+    keep = pack_passages(doc_index, position, scores, lengths, budgets)
+
+    # passages are already in (article, position) order, so selected ones
+    # come out in document order
+    sequences = [list(ids) for ids in prefix_ids]
+    for i in np.flatnonzero(keep):
+        sequences[doc_index[i]].extend(passage_ids[i])
+    sequences = [[cls_id] + ids[:content_len] + [sep_id] for ids in sequences]
+    return to_padded_arrays(sequences, pad_id, max_len)
+
+
+def cached_salient_encode(store_dir, prefixes, bodies, tokenizer, scorer, max_len=MAX_LEN,
+                          max_passage_chars=MAX_PASSAGE_CHARS):
+    """salient_encode with the result cached in (and reloaded from) a token store."""
+    expected_meta = {
+        'strategy': 'salient_passages',
+        'tokenizer': tokenizer.name_or_path,
+        'max_len': max_len,
+        'max_passage_chars': max_passage_chars,
+        'scorer': scorer.cache_key(),
+        'corpus': fingerprint(list(prefixes) + list(bodies)),
+    }
+    cached = load_token_store(store_dir, expected_meta)
+    if cached is not None:
+        print(f"Loaded salient-passage tokens from {store_dir}")
+        return cached[0], cached[1]
+
+    print("Selecting salient passages...")
+    input_ids, attention_mask = salient_encode(
+        prefixes, bodies, tokenizer, scorer, max_len=max_len, max_passage_chars=max_passage_chars
+    )
+    save_token_store(store_dir, input_ids, attention_mask, expected_meta)
+    print(f"Saved {len(input_ids)} rows to {store_dir}")
+    return input_ids, attention_mask
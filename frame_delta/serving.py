@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Local HTTP inference server for the frame classifier.
+
+Loads the model, tokenizer, label encoder and optimized thresholds once, then
+coalesces concurrent requests into dynamic micro-batches: a batch is run as
+soon as it reaches --max-batch-size or the oldest waiting request has waited
+--max-wait-ms, whichever comes first. The model runs on a worker thread so
+the event loop keeps accepting requests while a batch is on the device.
+
+Endpoints:
+    POST /predict   {"text": ..., "title": ..., "topic": ...}
+                    or {"articles": [{...}, ...]}
+    GET  /metrics   latency percentiles and batch-size histogram
+    GET  /health
+
+Usage:
+    python -m frame_delta.serving --base-model allenai/longformer-base-4096 \\
+        --weights notebooks/saved_models/.../model_ep3.bin \\
+        --thresholds notebooks/saved_models/.../class_thresholds_optimized.json \\
+        --max-len 2048 --strategy truncate
+    python -m frame_delta.serving --bundle bundles/longformer_run4     # see frame_delta.artifacts
+
+    # CPU smoke test with a tiny random-initialised model
+    python -m frame_delta.serving --tiny
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+from frame_delta.inputs import LONGFORMER_TOPIC_FORMAT, TOPIC_FORMATS, encode_texts, format_article
+from frame_delta.labels import LABEL_ENCODER_PATH, NUM_LABELS, load_label_encoder
+from frame_delta.thresholds import load_thresholds
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+LATENCY_WINDOW = 10000
+
+
+class FramePredictor:
+    def __init__(self, model, tokenizer, thresholds, labels, max_len=512, strategy='head_tail',
+                 topic_format=LONGFORMER_TOPIC_FORMAT, device='cpu'):
+        """Everything needed to turn raw articles into thresholded frame labels."""
+        self.model = model.to(device).eval()
+        self.tokenizer = tokenizer
+        self.thresholds = np.asarray(thresholds, dtype=float)
+        self.labels = list(labels)
+        self.max_len = max_len
+        self.strategy = strategy
+        self.topic_format = topic_format
+        self.device = device
+        self.global_attention = getattr(model.config, 'model_type', '') == 'longformer'
+
+    @classmethod
+    def from_checkpoint(cls, base_model, weights_path, thresholds_path,
+                        label_encoder_path=LABEL_ENCODER_PATH, device='cpu', **kwargs):
+        """Load a notebook checkpoint (state_dict .bin) on top of its base model."""
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        labels = list(load_label_encoder(label_encoder_path).classes_)
+        model = AutoModelForSequenceClassification.from_pretrained(
+            base_model, num_labels=len(labels), problem_type="multi_label_classification"
+        )
+        model.load_state_dict(torch.load(weights_path, map_location=device))
+        tokenizer = AutoTokenizer.from_pretrained(base_model)
+        thresholds = load_thresholds(thresholds_path, labels)
+        return cls(model, tokenizer, thresholds, labels, device=device, **kwargs)
+
+    @classmethod
+    def from_bundle(cls, bundle_dir, device='cpu'):
+        """Load an artifacts bundle (mmapped safetensors weights, labels, thresholds, input config)."""
+        from frame_delta.artifacts import load_predictor
+
+        return load_predictor(bundle_dir, device=device)
+
+    @classmethod
+    def tiny(cls, **kwargs):
+        """Random-init model and hashing tokenizer, for CPU tests of the serving path."""
+        from frame_delta.labels import OFFICIAL_LABELS
+        from frame_delta.tiny import tiny_classifier, tiny_tokenizer
+
+        return cls(tiny_classifier(), tiny_tokenizer(), np.full(NUM_LABELS, 0.5),
+                   OFFICIAL_LABELS, **kwargs)
+
+    def predict_proba(self, articles) -> np.ndarray:
+        """(len(articles), n_labels) sigmoid probabilities for a list of article dicts."""
+        texts = [
+            format_article(a.get('text'), a.get('title'), a.get('topic'), self.topic_format)
+            for a in articles
+        ]
+        batch = encode_texts(self.tokenizer, texts, max_len=self.max_len,
+                             strategy=self.strategy, global_attention=self.global_attention)
+        batch = {k: v.to(self.device) for k, v in batch.items()}
+        with torch.inference_mode():
+            logits = self.model(**batch).logits
+        return torch.sigmoid(logits).float().cpu().numpy()
+
+    def predict(self, articles):
+        """Per-article dicts of frame probabilities and thresholded labels."""
+        probs = self.predict_proba(articles)
+        preds = probs > self.thresholds[None, :]
+        return [
+            {
+                'probabilities': dict(zip(self.labels, np.round(row, 6).tolist())),
+                'labels': [label for label, on in zip(self.labels, row_preds) if on],
+            }
+            for row, row_preds in zip(probs, preds)
+        ]
+
+
+class ServerMetrics:
+    def __init__(self, window=LATENCY_WINDOW):
+        """Rolling request latencies and a histogram of executed batch sizes."""
+        self.latencies_ms = deque(maxlen=window)
+        self.batch_sizes = Counter()
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self.started = time.time()
+
+    def record_batch(self, size, latencies_ms):
+        self.batches += 1
+        self.requests += size
+        self.batch_sizes[size] += 1
+        self.latencies_ms.extend(latencies_ms)
+
+    def snapshot(self):
+        latencies = np.array(self.latencies_ms) if self.latencies_ms else np.zeros(1)
+        p50, p90, p95, p99 = np.percentile(latencies, [50, 90, 95, 99])
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'errors': self.errors,
+            'uptime_s': round(time.time() - self.started, 1),
+            'mean_batch_size': round(self.requests / self.batches, 2) if self.batches else 0,
+            'latency_ms': {
+                'p50': round(p50, 2), 'p90': round(p90, 2),
+                'p95': round(p95, 2), 'p99': round(p99, 2),
+                'max': round(float(latencies.max()), 2),
+            },
+            'batch_size_histogram': {str(k): v for k, v in sorted(self.batch_sizes.items())},
+        }
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=10.0, metrics=None):
+        """
+        predict_fn: blocking function mapping a list of requests to a list of results
+        max_wait_ms: how long the first request of a batch may wait for company
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = metrics or ServerMetrics()
+        self.queue = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='frame-model')
+        self._worker = None
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=False)
+
+    async def submit(self, item):
+        """Queue one request and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        """Wait for one request, then gather more until the batch is full or the deadline passes."""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            items = [item for item, _, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.predict_fn, items)
+            except Exception as e:
+                self.metrics.errors += len(batch)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            done = time.perf_counter()
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+            self.metrics.record_batch(len(batch), [(done - t0) * 1000 for _, _, t0 in batch])
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+async def read_request(reader):
+    """Parse a minimal HTTP/1.1 request: (method, path, body bytes)."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, path, _ = request_line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise HTTPError(400, 'malformed request line')
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get('content-length', 0) or 0)
+    except ValueError:
+        raise HTTPError(400, 'invalid Content-Length')
+    if length < 0:
+        raise HTTPError(400, 'invalid Content-Length')
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, 'request body too large')
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), path.split('?', 1)[0], body
+
+
+def parse_articles(body):
+    """Request JSON -> (list of article dicts, whether the caller sent a batch)."""
+    try:
+        payload = json.loads(body or b'{}')
+    except json.JSONDecodeError as e:
+        raise HTTPError(400, f'invalid JSON: {e}')
+
+    if isinstance(payload, dict) and 'articles' in payload:
+        articles, is_batch = payload['articles'], True
+    else:
+        articles, is_batch = [payload], False
+
+    if not isinstance(articles, list) or not articles:
+        raise HTTPError(400, '"articles" must be a non-empty list')
+    for article in articles:
+        if not isinstance(article, dict) or not str(article.get('text') or '').strip():
+            raise HTTPError(400, 'every article needs a non-empty "text" field')
+    return articles, is_batch
+
+
+class FrameServer:
+    def __init__(self, predictor, max_batch_size=32, max_wait_ms=10.0):
+        self.predictor = predictor
+        self.batcher = MicroBatcher(predictor.predict, max_batch_size, max_wait_ms)
+
+    @property
+    def metrics(self):
+        return self.batcher.metrics
+
+    async def route(self, method, path, body):
+        if path == '/predict':
+            if method != 'POST':
+                raise HTTPError(405, 'use POST')
+            articles, is_batch = parse_articles(body)
+            results = await asyncio.gather(*(self.batcher.submit(a) for a in articles))
+            return {'results': results} if is_batch else results[0]
+        if path == '/metrics':
+            return self.metrics.snapshot()
+        if path == '/health':
+            return {'status': 'ok', 'labels': self.predictor.labels}
+        raise HTTPError(404, f'no route for {path}')
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    status, payload = 200, await self.route(*request)
+                except HTTPError as e:
+                    status, payload = e.status, {'error': e.message}
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+
+                data = json.dumps(payload).encode('utf-8')
+                writer.write(
+                    f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\n'
+                    f'Content-Type: application/json\r\n'
+                    f'Content-Length: {len(data)}\r\n\r\n'.encode('latin-1') + data
+                )
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8000):
+        await self.batcher.start()
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving frame predictions on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-model', default='allenai/longformer-base-4096')
+    parser.add_argument('--weights', help='state_dict .bin saved by the training notebook')
+    parser.add_argument('--thresholds', help='class_thresholds_optimized.json')
+    parser.add_argument('--label-encoder', default=LABEL_ENCODER_PATH)
+    parser.add_argument('--bundle', help='frame_delta.artifacts bundle (replaces the four options above)')
+    parser.add_argument('--max-len', type=int, default=2048)
+    parser.add_argument('--strategy', choices=['head_tail', 'truncate'], default='truncate')
+    parser.add_argument('--topic-format', choices=list(TOPIC_FORMATS), default='longformer',
+                        help="topic prefix the --weights model was trained with ('TOPIC:' or 'TOPIC: ')")
+    parser.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=10.0)
+    parser.add_argument('--tiny', action='store_true', help='serve a tiny random-init model on CPU')
+    args = parser.parse_args()
+
+    print("Loading model...")
+    if args.tiny:
+        predictor = FramePredictor.tiny(max_len=512, strategy='head_tail')
+    elif args.bundle:
+        predictor = FramePredictor.from_bundle(args.bundle, device=args.device)
+    else:
+        if not args.weights or not args.thresholds:
+            parser.error('--weights and --thresholds (or --bundle) are required unless --tiny is set')
+        predictor = FramePredictor.from_checkpoint(
+            args.base_model, args.weights, args.thresholds,
+            label_encoder_path=args.label_encoder, device=args.device,
+            max_len=args.max_len, strategy=args.strategy, topic_format=TOPIC_FORMATS[args.topic_format],
+        )
+
+    server = FrameServer(predictor, args.max_batch_size, args.max_wait_ms)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nStopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Backfill word, character and token counts for newsarticles into side tables.
+
+The notebooks recompute df['article_text'].str.split().str.len() over 200k
+texts every session, and the Longformer notebook tokenizes the whole corpus
+again just to look at token lengths, only to filter num_words > 100. This
+job computes both once per url:
+
+    newsarticle_text_stats    (url, num_words, num_chars)
+    newsarticle_token_counts  (url, tokenizer, num_tokens)   special tokens included
+
+num_words matches str.split().str.len(), num_tokens matches
+len(tokenizer(text)['input_ids']). Only urls missing from the tables are
+processed, so rerunning picks up new articles; each batch is committed as it
+finishes. Filters then stay in SQL:
+
+    SELECT a.*, b.maintext FROM mm_framing_full a
+    JOIN newsarticles b ON a.url = b.url
+    JOIN newsarticle_text_stats s ON a.url = s.url
+    WHERE s.num_words > 100 AND s.num_words <= 1500
+
+or come from load_stats() as arrays for bucketing.
+
+Usage:
+    python -m frame_delta.text_stats --tiny                 # synthetic smoke test, no DB
+    python -m frame_delta.text_stats --workers 8
+    python -m frame_delta.text_stats --tokenizers FacebookAI/roberta-base
+"""
+
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+TOKENIZERS = ("FacebookAI/roberta-base", "allenai/longformer-base-4096")
+STATS_TABLE = "newsarticle_text_stats"
+TOKEN_TABLE = "newsarticle_token_counts"
+
+_worker_tokenizers = {}
+
+
+def _load_tokenizer(name):
+    if name == 'tiny-random':
+        from frame_delta.tiny import tiny_tokenizer
+        return tiny_tokenizer()
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(name)
+
+
+def _init_worker(tokenizer_names):
+    for name in tokenizer_names:
+        _worker_tokenizers[name] = _load_tokenizer(name)
+
+
+def text_stats(texts, tokenizers):
+    """
+    Word/char counts and per-tokenizer token counts for a batch of texts.
+    Returns (num_words, num_chars, {tokenizer name: num_tokens}) as int arrays.
+    """
+    texts = [text or '' for text in texts]
+    num_words = np.fromiter((len(text.split()) for text in texts), dtype=np.int32, count=len(texts))
+    num_chars = np.fromiter((len(text) for text in texts), dtype=np.int32, count=len(texts))
+    num_tokens = {
+        name: np.array([len(ids) for ids in tokenizer(texts, return_attention_mask=False)['input_ids']],
+                       dtype=np.int32)
+        for name, tokenizer in tokenizers.items()
+    }
+    return num_words, num_chars, num_tokens
+
+
+def _worker_batch(urls, texts, tokenizer_names):
+    tokenizers = {name: _worker_tokenizers[name] for name in tokenizer_names}
+    return urls, text_stats(texts, tokenizers)
+
+
+def create_tables(cur):
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATS_TABLE} (
+            url text PRIMARY KEY,
+            num_words integer NOT NULL,
+            num_chars integer NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS {STATS_TABLE}_words_idx ON {STATS_TABLE} (num_words);
+        CREATE TABLE IF NOT EXISTS {TOKEN_TABLE} (
+            url text NOT NULL,
+            tokenizer text NOT NULL,
+            num_tokens integer NOT NULL,
+            PRIMARY KEY (url, tokenizer)
+        );
+        CREATE INDEX IF NOT EXISTS {TOKEN_TABLE}_len_idx ON {TOKEN_TABLE} (tokenizer, num_tokens);
+    """)
+
+
+def pending_query(tokenizer_names):
+    """newsarticles rows missing word stats or a token count for any of the tokenizers."""
+    missing_tokens = " OR ".join(
+        f"NOT EXISTS (SELECT 1 FROM {TOKEN_TABLE} t WHERE t.url = n.url AND t.tokenizer = %s)"
+        for _ in tokenizer_names
+    )
+    query = f"""
+        SELECT n.url, n.maintext FROM newsarticles n
+        WHERE n.maintext IS NOT NULL
+          AND (NOT EXISTS (SELECT 1 FROM {STATS_TABLE} s WHERE s.url = n.url)
+               {'OR ' + missing_tokens if missing_tokens else ''})
+    """
+    return query, list(tokenizer_names)
+
+
+def write_batch(conn, urls, stats, tokenizer_names):
+    """Insert one batch; rows already present (from an interrupted run) are left as they are."""
+    from frame_delta.db import copy_rows
+
+    num_words, num_chars, num_tokens = stats
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS stats_batch (LIKE {STATS_TABLE}) ON COMMIT DELETE ROWS")
+        cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS tokens_batch (LIKE {TOKEN_TABLE}) ON COMMIT DELETE ROWS")
+        copy_rows(cur, "stats_batch", ("url", "num_words", "num_chars"),
+                  zip(urls, num_words.tolist(), num_chars.tolist()))
+        copy_rows(cur, "tokens_batch", ("url", "tokenizer", "num_tokens"),
+                  ((url, name, n) for name in tokenizer_names
+                   for url, n in zip(urls, num_tokens[name].tolist())))
+        cur.execute(f"INSERT INTO {STATS_TABLE} SELECT * FROM stats_batch ON CONFLICT (url) DO NOTHING")
+        cur.execute(f"INSERT INTO {TOKEN_TABLE} SELECT * FROM tokens_batch ON CONFLICT (url, tokenizer) DO NOTHING")
+    conn.commit()
+
+
+def backfill(conn, tokenizer_names=TOKENIZERS, batch_size=2000, workers=None):
+    from frame_delta.db import connect, stream_rows
+
+    with conn.cursor() as cur:
+        create_tables(cur)
+    conn.commit()
+
+    # reads stream on their own connection so per-batch commits don't close the named cursor
+    read_conn = connect()
+    query, params = pending_query(tokenizer_names)
+    processed = 0
+    start = time.perf_counter()
+    pending = deque()
+    max_pending = 2 * (workers or os.cpu_count() or 1)
+
+    def drain(future):
+        nonlocal processed
+        urls, stats = future.result()
+        write_batch(conn, urls, stats, tokenizer_names)
+        processed += len(urls)
+        print(f"  {processed} articles ({processed / (time.perf_counter() - start):.0f}/s)")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(tuple(tokenizer_names),)) as executor:
+        for rows in stream_rows(read_conn, query, params, batch_size=batch_size, name='text_stats_stream'):
+            urls = [url for url, _ in rows]
+            texts = [text for _, text in rows]
+            pending.append(executor.submit(_worker_batch, urls, texts, tuple(tokenizer_names)))
+            while len(pending) >= max_pending:
+                drain(pending.popleft())
+        while pending:
+            drain(pending.popleft())
+
+    read_conn.close()
+    return processed
+
+
+def load_stats(conn, tokenizer=None, urls=None):
+    """
+    url, num_words, num_chars (and num_tokens for `tokenizer`) as a DataFrame,
+    optionally restricted to a list of urls, for length bucketing without text.
+    """
+    import pandas as pd
+
+    columns = "s.url, s.num_words, s.num_chars"
+    join = ""
+    params = []
+    if tokenizer:
+        columns += ", t.num_tokens"
+        join = f"JOIN {TOKEN_TABLE} t ON t.url = s.url AND t.tokenizer = %s"
+        params.append(tokenizer)
+    where = ""
+    if urls is not None:
+        where = "WHERE s.url = ANY(%s)"
+        params.append(list(urls))
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT {columns} FROM {STATS_TABLE} s {join} {where}", params)
+        names = [d[0] for d in cur.description]
+        return pd.DataFrame(cur.fetchall(), columns=names)
+
+
+def _tiny_run(n=4000, batch_size=500, workers=2):
+    """Parallel batches over synthetic texts with the tiny tokenizer, checked against pandas."""
+    import pandas as pd
+
+    from frame_delta.pipeline import synthetic_articles
+
+    texts = [a['text'] for a in synthetic_articles(n)]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(('tiny-random',),)) as executor:
+        futures = [executor.submit(_worker_batch, list(range(i, i + batch_size)),
+                                   texts[i:i + batch_size], ('tiny-random',))
+                   for i in range(0, n, batch_size)]
+        results = [f.result() for f in futures]
+    elapsed = time.perf_counter() - start
+
+    num_words = np.concatenate([stats[0] for _, stats in results])
+    num_tokens = np.concatenate([stats[2]['tiny-random'] for _, stats in results])
+    expected = pd.Series(texts).str.split().str.len().to_numpy()
+    print(f"{n} texts in {elapsed:.2f}s; words match pandas: {np.array_equal(num_words, expected)}; "
+          f"mean tokens {num_tokens.mean():.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tiny', action='store_true', help='synthetic smoke test without a database')
+    parser.add_argument('--tokenizers', nargs='+', default=list(TOKENIZERS))
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.tiny:
+        _tiny_run()
+        return
+
+    from frame_delta.db import connect
+
+    conn = connect()
+    print(f"Backfilling {STATS_TABLE} / {TOKEN_TABLE} ({', '.join(args.tokenizers)})...")
+    processed = backfill(conn, args.tokenizers, batch_size=args.batch_size, workers=args.workers)
+    conn.close()
+    print(f"Done: {processed} new articles.")
+
+
+if __name__ == "__main__":
+    main()
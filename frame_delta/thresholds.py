@@ -0,0 +1,71 @@
+"""
+Per-class decision threshold optimization.
+
+Vectorized version of the grid search in the framing notebooks: every class
+is tested at thresholds 0.10, 0.15, ..., 0.90 on the validation probabilities
+and keeps the one with the best F1 (prediction is `prob > threshold`).
+"""
+
+import json
+
+import numpy as np
+
+from frame_delta.labels import OFFICIAL_LABELS
+
+THRESHOLD_GRID = np.arange(0.1, 0.95, 0.05)
+
+
+def f1_from_counts(tp, fp, fn) -> np.ndarray:
+    """F1 from TP/FP/FN counts (any matching shapes), 0 where undefined."""
+    tp = np.asarray(tp, dtype=np.float64)
+    denom = 2 * tp + np.asarray(fp, dtype=np.float64) + np.asarray(fn, dtype=np.float64)
+    return np.divide(2 * tp, denom, out=np.zeros_like(denom), where=denom > 0)
+
+
+def optimize_thresholds(probs: np.ndarray, labels: np.ndarray, grid=THRESHOLD_GRID):
+    """
+    Find the best threshold for each class.
+
+    Returns (thresholds, scores), both of shape (n_classes,). Classes where no
+    grid point beats F1=0 keep the default threshold of 0.5.
+    """
+    probs = np.asarray(probs)
+    labels = np.asarray(labels).astype(bool)
+    n_classes = probs.shape[1]
+
+    best_thresholds = np.full(n_classes, 0.5)
+    best_scores = np.zeros(n_classes)
+    positives = labels.sum(axis=0)
+
+    for thresh in grid:
+        preds = probs > thresh
+        tp = (preds & labels).sum(axis=0)
+        fp = preds.sum(axis=0) - tp
+        fn = positives - tp
+        scores = f1_from_counts(tp, fp, fn)
+
+        # strict improvement keeps the lowest threshold on ties, as in the notebooks
+        improved = scores > best_scores
+        best_thresholds[improved] = thresh
+        best_scores[improved] = scores[improved]
+
+    return best_thresholds, best_scores
+
+
+def apply_thresholds(probs: np.ndarray, thresholds) -> np.ndarray:
+    """Binarize an (N, C) probability matrix with per-class thresholds."""
+    return (np.asarray(probs) > np.asarray(thresholds)[None, :]).astype(int)
+
+
+def save_thresholds(thresholds, path: str, labels=OFFICIAL_LABELS):
+    """Save thresholds as the {label: threshold} JSON the notebooks write."""
+    threshold_dict = dict(zip(labels, np.asarray(thresholds, dtype=float).tolist()))
+    with open(path, 'w') as f:
+        json.dump(threshold_dict, f, indent=4)
+
+
+def load_thresholds(path: str, labels=OFFICIAL_LABELS) -> np.ndarray:
+    """Load a {label: threshold} JSON into an array in label order."""
+    with open(path, 'r') as f:
+        threshold_dict = json.load(f)
+    return np.array([threshold_dict[label] for label in labels], dtype=float)
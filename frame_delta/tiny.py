@@ -0,0 +1,81 @@
+"""
+Tiny randomly initialised models and tokenizers for CPU smoke tests.
+
+Nothing here downloads weights, so the serving, chunking and training code
+can be exercised end to end on a laptop without the trained checkpoints.
+"""
+
+from frame_delta.labels import NUM_LABELS
+
+SPECIAL_TOKENS = ['<s>', '<pad>', '</s>', '<unk>', '<mask>']
+
+
+def tiny_config(vocab_size=1000, max_position_embeddings=514, num_labels=NUM_LABELS):
+    """A small RoBERTa config (2 layers, hidden size 32)."""
+    from transformers import AutoConfig
+
+    return AutoConfig.for_model(
+        'roberta', vocab_size=vocab_size, hidden_size=32, num_hidden_layers=2,
+        num_attention_heads=2, intermediate_size=64,
+        max_position_embeddings=max_position_embeddings,
+        num_labels=num_labels, problem_type='multi_label_classification',
+        pad_token_id=1, bos_token_id=0, eos_token_id=2,
+    )
+
+
+def tiny_tokenizer(vocab_size=1000):
+    """
+    A whitespace word-level tokenizer with RoBERTa-style special tokens.
+
+    Words are hashed into the vocabulary, so any text maps to valid ids
+    without training a vocabulary first.
+    """
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast
+
+    words = [f'w{i}' for i in range(vocab_size - len(SPECIAL_TOKENS))]
+    vocab = {token: i for i, token in enumerate(SPECIAL_TOKENS + words)}
+
+    backend = Tokenizer(models.WordLevel(vocab=vocab, unk_token='<unk>'))
+    backend.normalizer = normalizers.Lowercase()
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    backend.post_processor = processors.TemplateProcessing(
+        single='<s> $A </s>', special_tokens=[('<s>', 0), ('</s>', 2)]
+    )
+
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, bos_token='<s>', eos_token='</s>', cls_token='<s>',
+        sep_token='</s>', pad_token='<pad>', unk_token='<unk>', mask_token='<mask>',
+    )
+    tokenizer.name_or_path = 'tiny-random'
+    return _HashingTokenizer(tokenizer, len(words))
+
+
+class _HashingTokenizer:
+    """Maps every word to `w{hash % n}` before tokenizing, so nothing is <unk>."""
+
+    def __init__(self, tokenizer, n_words):
+        self._tokenizer = tokenizer
+        self._n_words = n_words
+
+    def _hash_text(self, text):
+        return ' '.join(f'w{sum(map(ord, word)) % self._n_words}' for word in str(text).split())
+
+    def __call__(self, text, *args, **kwargs):
+        if isinstance(text, str):
+            return self._tokenizer(self._hash_text(text), *args, **kwargs)
+        return self._tokenizer([self._hash_text(t) for t in text], *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._tokenizer, name)
+
+
+def tiny_classifier(num_labels=NUM_LABELS, vocab_size=1000, seed=0):
+    """A random-init RobertaForSequenceClassification on the tiny config."""
+    import torch
+    from transformers import AutoModelForSequenceClassification
+
+    torch.manual_seed(seed)
+    return AutoModelForSequenceClassification.from_config(
+        tiny_config(vocab_size=vocab_size, num_labels=num_labels)
+    )
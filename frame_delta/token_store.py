@@ -0,0 +1,120 @@
+"""
+Fixed-length token arrays and an on-disk cache for them.
+
+The RoBERTa notebooks tokenize the whole corpus and then cut every article
+to head (320) + tail (190) tokens in a Python loop. The helpers here build the
+same (N, 512) input_ids / attention_mask arrays and save them as .npy files
+next to a small meta.json, so a second session (or another notebook) can
+memory-map them instead of re-tokenizing.
+
+A store directory looks like:
+
+    token_store/<name>/
+        input_ids.npy        int32 (N, max_len)
+        attention_mask.npy   int8  (N, max_len)
+        meta.json            tokenizer, strategy, max_len, row count, key
+        splits.npz           optional train/val/test row indices (save_splits)
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+HEAD_LEN = 320
+TAIL_LEN = 190
+CONTENT_LEN = HEAD_LEN + TAIL_LEN
+MAX_LEN = CONTENT_LEN + 2  # [CLS] + [SEP]
+
+
+def strip_special(ids, cls_id, sep_id):
+    """Drop the [CLS] ... [SEP] pair the tokenizer adds, if present."""
+    if len(ids) >= 2 and ids[0] == cls_id and ids[-1] == sep_id:
+        return ids[1:-1]
+    return ids
+
+
+def head_tail_ids(ids, cls_id, sep_id, head_len=HEAD_LEN, tail_len=TAIL_LEN):
+    """Head+tail cut of one article, with [CLS]/[SEP] added back."""
+    ids = list(strip_special(ids, cls_id, sep_id))
+    if len(ids) > head_len + tail_len:
+        ids = ids[:head_len] + ids[-tail_len:]
+    return [cls_id] + ids + [sep_id]
+
+
+def to_padded_arrays(sequences, pad_id, max_len=MAX_LEN):
+    """Pack a list of id lists into (N, max_len) input_ids / attention_mask arrays."""
+    input_ids = np.full((len(sequences), max_len), pad_id, dtype=np.int32)
+    attention_mask = np.zeros((len(sequences), max_len), dtype=np.int8)
+    for i, ids in enumerate(sequences):
+        n = min(len(ids), max_len)
+        input_ids[i, :n] = ids[:n]
+        attention_mask[i, :n] = 1
+    return input_ids, attention_mask
+
+
+def encode_head_tail(encodings, tokenizer, max_len=MAX_LEN):
+    """Head+tail arrays from an untruncated tokenizer output, as in framing_classifier.ipynb."""
+    cls_id, sep_id = tokenizer.cls_token_id, tokenizer.sep_token_id
+    content_len = max_len - 2
+    head_len = min(HEAD_LEN, content_len)
+    sequences = [
+        head_tail_ids(ids, cls_id, sep_id, head_len=head_len, tail_len=content_len - head_len)
+        for ids in encodings['input_ids']
+    ]
+    return to_padded_arrays(sequences, tokenizer.pad_token_id, max_len)
+
+
+def fingerprint(texts) -> str:
+    """Stable short hash of the corpus texts (or urls) a store was built from."""
+    digest = hashlib.sha1()
+    for text in texts:
+        digest.update(str(text).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+
+def save_token_store(store_dir, input_ids, attention_mask, meta):
+    """Write arrays plus meta.json. `meta` should include anything the arrays depend on."""
+    os.makedirs(store_dir, exist_ok=True)
+    np.save(os.path.join(store_dir, 'input_ids.npy'), input_ids)
+    np.save(os.path.join(store_dir, 'attention_mask.npy'), attention_mask)
+
+    meta = dict(meta, rows=int(input_ids.shape[0]), max_len=int(input_ids.shape[1]))
+    with open(os.path.join(store_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=4)
+
+
+def load_token_store(store_dir, expected_meta=None, mmap=True):
+    """
+    Load (input_ids, attention_mask, meta) from a store, or None if it is
+    missing or any key in `expected_meta` differs from what was saved.
+    """
+    meta_path = os.path.join(store_dir, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r') as f:
+        meta = json.load(f)
+
+    for key, value in (expected_meta or {}).items():
+        if meta.get(key) != value:
+            return None
+
+    mmap_mode = 'r' if mmap else None
+    input_ids = np.load(os.path.join(store_dir, 'input_ids.npy'), mmap_mode=mmap_mode)
+    attention_mask = np.load(os.path.join(store_dir, 'attention_mask.npy'), mmap_mode=mmap_mode)
+    return input_ids, attention_mask, meta
+
+
+def save_splits(store_dir, **splits):
+    """Persist row indices of each split (train=..., val=..., test=...) as splits.npz."""
+    os.makedirs(store_dir, exist_ok=True)
+    np.savez(os.path.join(store_dir, 'splits.npz'),
+             **{name: np.asarray(idx, dtype=np.int64) for name, idx in splits.items()})
+
+
+def load_splits(store_dir):
+    """{split name: row indices} saved by save_splits."""
+    with np.load(os.path.join(store_dir, 'splits.npz')) as data:
+        return {name: data[name] for name in data.files}
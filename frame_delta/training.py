@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Resumable training engine for the frame classifiers.
+
+The notebooks' train_engine runs multi-hour epochs and only saves
+model_ep{n}.bin at the end of each one, synchronously. This version of the
+same loop (AMP, ACCUMULATION_STEPS, weighted criterion, per-epoch validation
+and ExperimentTracker logging) also writes step-level checkpoints:
+
+    checkpoints/step_00001500.pt
+        model, optimizer, GradScaler and LR scheduler state
+        python / numpy / torch / CUDA RNG state
+        sampler epoch, seed and position, running train loss, tracker history
+
+Checkpoints are taken on optimizer-step boundaries, so no partial gradient
+needs saving. The state is copied to CPU on the training thread and written
+by a background thread (tmp file + rename, so a crash mid-write never leaves
+a truncated checkpoint); only the newest keep_last are kept. A resumed run
+continues at the exact next batch with the same shuffling and dropout masks.
+
+Usage (in the notebook, replacing the train_engine cell):
+
+    from frame_delta.training import ResumableSampler, train_engine
+    train_loader = DataLoader(train_ds, batch_size=4, sampler=ResumableSampler(train_ds, seed=42))
+    train_engine(model, train_loader, val_loader, optimizer, tracker, criterion,
+                 checkpoint_dir="saved_models/longformer_checkpoints")
+
+Rerunning the same call after a crash picks up from the newest checkpoint in
+checkpoint_dir.
+
+    python -m frame_delta.training --tiny    # CPU check that resume == uninterrupted run
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+import numpy as np
+import torch
+from torch.utils.data import Sampler
+
+from frame_delta.accumulator import MetricAccumulator, evaluate
+
+EPOCHS = 4
+ACCUMULATION_STEPS = 4
+CHECKPOINT_EVERY = 500      # optimizer steps
+KEEP_LAST = 3
+CHECKPOINT_PATTERN = re.compile(r"step_(\d+)\.pt$")
+
+
+class ResumableSampler(Sampler):
+    """
+    Shuffling sampler whose order depends only on (seed, epoch), and which can
+    start part-way through an epoch. The engine sets `position` (samples
+    already consumed) before each epoch and stores it in checkpoints.
+    """
+
+    def __init__(self, data_source, shuffle=True, seed=0):
+        self.num_samples = len(data_source)
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.position = 0
+
+    def set_epoch(self, epoch, position=0):
+        self.epoch = epoch
+        self.position = position
+
+    def order(self):
+        if not self.shuffle:
+            return torch.arange(self.num_samples)
+        generator = torch.Generator()
+        generator.manual_seed(self.seed + self.epoch)
+        return torch.randperm(self.num_samples, generator=generator)
+
+    def __iter__(self):
+        return iter(self.order()[self.position:].tolist())
+
+    def __len__(self):
+        return self.num_samples - self.position
+
+    def state_dict(self):
+        return {'epoch': self.epoch, 'position': self.position, 'seed': self.seed, 'shuffle': self.shuffle}
+
+    def load_state_dict(self, state):
+        self.seed, self.shuffle = state['seed'], state['shuffle']
+        self.set_epoch(state['epoch'], state['position'])
+
+
+def rng_state():
+    state = {
+        'python': random.getstate(),
+        'numpy': np.random.get_state(),
+        'torch': torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(state):
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+
+def cpu_snapshot(obj):
+    """Deep copy of a (nested) state dict with every tensor copied to CPU memory."""
+    if torch.is_tensor(obj):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {k: cpu_snapshot(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(cpu_snapshot(v) for v in obj)
+    return obj
+
+
+class CheckpointWriter:
+    """
+    Writes snapshots with torch.save on one background thread.
+
+    At most one write is in flight: a new save first waits for the previous
+    one, so host memory holds at most two copies of the state and errors from
+    a failed write surface on the next save (or on close()).
+    """
+
+    def __init__(self, checkpoint_dir, keep_last=KEEP_LAST):
+        self.checkpoint_dir = checkpoint_dir
+        self.keep_last = keep_last
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='checkpoint')
+        self._pending = None
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def wait(self):
+        if self._pending is not None:
+            self._pending.result()
+            self._pending = None
+
+    def submit(self, state, path, evict=False):
+        """Snapshot `state` to CPU now, write it to `path` in the background."""
+        self.wait()
+        snapshot = cpu_snapshot(state)
+        self._pending = self._executor.submit(self._write, snapshot, path, evict)
+
+    def save_checkpoint(self, state, step):
+        path = os.path.join(self.checkpoint_dir, f"step_{step:08d}.pt")
+        self.submit(state, path, evict=True)
+
+    def _write(self, snapshot, path, evict):
+        start = time.perf_counter()
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                torch.save(snapshot, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if evict:
+            for old in list_checkpoints(self.checkpoint_dir)[:-self.keep_last]:
+                os.remove(old)
+        print(f"  Saved {os.path.basename(path)} in {time.perf_counter() - start:.1f}s (background)")
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown()
+
+
+def list_checkpoints(checkpoint_dir):
+    """Step checkpoints in checkpoint_dir, oldest first."""
+    paths = [p for p in glob.glob(os.path.join(checkpoint_dir, "step_*.pt")) if CHECKPOINT_PATTERN.search(p)]
+    return sorted(paths, key=lambda p: int(CHECKPOINT_PATTERN.search(p).group(1)))
+
+
+def load_latest(checkpoint_dir):
+    """The newest checkpoint dict, or None if there is none yet."""
+    paths = list_checkpoints(checkpoint_dir) if checkpoint_dir and os.path.isdir(checkpoint_dir) else []
+    if not paths:
+        return None
+    print(f"Resuming from {paths[-1]}")
+    return torch.load(paths[-1], map_location='cpu', weights_only=False)
+
+
+def _model_inputs(batch, device):
+    """Tensor values except labels, on device; the notebook collates' metadata / article_text lists are dropped."""
+    return {k: v.to(device) for k, v in batch.items() if k != 'labels' and torch.is_tensor(v)}
+
+
+def train_engine(model, train_loader, val_loader, optimizer, tracker, criterion, epochs=EPOCHS,
+                 accumulation_steps=ACCUMULATION_STEPS, scheduler=None, device='cuda',
+                 checkpoint_dir=None, checkpoint_every=CHECKPOINT_EVERY, keep_last=KEEP_LAST,
+                 resume=True, max_steps=None):
+    """
+    The notebook training loop with step-level, resumable checkpoints.
+
+    tracker: the notebooks' ExperimentTracker (run_dir, history, log_epoch);
+             per-epoch and final weights go to its run_dir under the same
+             names as save_model used, but are written in the background.
+    scheduler: optional LR scheduler, stepped once per optimizer step.
+    checkpoint_dir: defaults to <run_dir>/checkpoints. Point it at an earlier
+                    run's directory to resume that run under a new tracker.
+    max_steps: stop (after checkpointing) once this many optimizer steps have
+               run in total, e.g. to fit a job time limit.
+
+    For an exact resume train_loader should use a ResumableSampler; with any
+    other sampler the already-seen batches of the interrupted epoch are
+    skipped by iterating over them.
+
+    Returns the last epoch's validation MetricAccumulator.
+    """
+    device_type = torch.device(device).type
+    use_amp = device_type == 'cuda'
+    scaler = torch.amp.GradScaler(device_type, enabled=use_amp)
+    checkpoint_dir = checkpoint_dir or os.path.join(tracker.run_dir, "checkpoints")
+    writer = CheckpointWriter(checkpoint_dir, keep_last=keep_last)
+    sampler = train_loader.sampler if isinstance(train_loader.sampler, ResumableSampler) else None
+    batch_size = train_loader.batch_size or 1
+    if sampler is not None:
+        sampler.set_epoch(0)
+    n_batches = len(train_loader)
+
+    start_epoch, start_batch, global_step, train_loss = 0, 0, 0, 0.0
+    rng = None
+    checkpoint = load_latest(checkpoint_dir) if resume else None
+    if checkpoint is not None:
+        model.load_state_dict(checkpoint['model'])
+        optimizer.load_state_dict(checkpoint['optimizer'])
+        if checkpoint['scaler']:
+            scaler.load_state_dict(checkpoint['scaler'])
+        if scheduler is not None and checkpoint['scheduler'] is not None:
+            scheduler.load_state_dict(checkpoint['scheduler'])
+        if sampler is not None and checkpoint['sampler']:
+            sampler.load_state_dict(checkpoint['sampler'])
+        start_epoch, start_batch = checkpoint['epoch'], checkpoint['batch']
+        global_step, train_loss = checkpoint['global_step'], checkpoint['train_loss']
+        tracker.history['epochs'] = checkpoint['history']
+        rng = checkpoint['rng']
+
+    def save(epoch, batch):
+        writer.save_checkpoint({
+            'model': model.state_dict(),
+            'optimizer': optimizer.state_dict(),
+            'scaler': scaler.state_dict(),
+            'scheduler': scheduler.state_dict() if scheduler is not None else None,
+            'rng': rng_state(),
+            'sampler': sampler.state_dict() if sampler is not None else None,
+            'epoch': epoch,
+            'batch': batch,
+            'global_step': global_step,
+            'train_loss': train_loss,
+            'history': list(tracker.history['epochs']),
+        }, global_step)
+
+    def optimizer_step():
+        nonlocal global_step
+        scaler.step(optimizer)
+        scaler.update()
+        optimizer.zero_grad()
+        if scheduler is not None:
+            scheduler.step()
+        global_step += 1
+
+    val_metrics = None
+    model.to(device)
+    try:
+        for epoch in range(start_epoch, epochs):
+            print(f"\n======== EPOCH {epoch+1}/{epochs} ========")
+            model.train()
+            first_batch = start_batch if epoch == start_epoch else 0
+            if epoch != start_epoch:
+                train_loss = 0.0
+            optimizer.zero_grad()
+
+            if sampler is not None:
+                sampler.set_epoch(epoch, first_batch * batch_size)
+                batches = iter(train_loader)
+            else:
+                batches = islice(iter(train_loader), first_batch, None)
+            # restore RNG after the loader iterator exists: creating it draws a seed
+            # from the global generator, exactly as it did at the start of the original epoch
+            if rng is not None:
+                set_rng_state(rng)
+                rng = None
+
+            for step, batch in enumerate(batches, start=first_batch):
+                labels = batch['labels'].to(device)
+                with torch.autocast(device_type=device_type, enabled=use_amp):
+                    outputs = model(**_model_inputs(batch, device))
+                    loss = criterion(outputs.logits.float(), labels.float()) / accumulation_steps
+                scaler.scale(loss).backward()
+                train_loss += loss.item() * accumulation_steps
+
+                if (step + 1) % accumulation_steps == 0:
+                    optimizer_step()
+                    if global_step % checkpoint_every == 0 or global_step == max_steps:
+                        save(epoch, step + 1)
+                    if global_step == max_steps:
+                        print(f"Stopping after {global_step} optimizer steps.")
+                        return val_metrics
+                if step % 500 == 0:
+                    print(f"  Batch {step}/{n_batches} | Current Loss: {loss.item() * accumulation_steps:.4f}")
+
+            # the leftover batches' step; a checkpoint saved right after it resumes past it
+            if n_batches % accumulation_steps != 0 and first_batch < n_batches:
+                optimizer_step()
+                if global_step == max_steps:
+                    save(epoch, n_batches)
+                    print(f"Stopping after {global_step} optimizer steps.")
+                    return val_metrics
+
+            avg_train_loss = train_loss / n_batches
+            print("Running Validation...")
+            val_metrics = evaluate(model, val_loader, device, MetricAccumulator(), criterion=criterion,
+                                   progress=False)
+            print(f" Train Loss: {avg_train_loss:.4f} | Val Loss: {val_metrics.loss:.4f} "
+                  f"| Micro-F1: {val_metrics.micro_f1():.4f} | Macro-F1: {val_metrics.macro_f1():.4f}")
+            tracker.log_epoch({
+                "epoch": epoch + 1,
+                "train_loss": avg_train_loss,
+                "val_loss": val_metrics.loss,
+                "val_f1_micro": val_metrics.micro_f1(),
+                "val_f1_macro": val_metrics.macro_f1(),
+            })
+            train_loss = 0.0
+            save(epoch + 1, 0)
+            writer.submit(model.state_dict(), os.path.join(tracker.run_dir, f"model_ep{epoch+1}.bin"))
+
+        print("Training Complete.")
+        writer.submit(model.state_dict(), os.path.join(tracker.run_dir, "final_model.bin"))
+    finally:
+        writer.close()
+    return val_metrics
+
+
+class ExperimentTracker:
+    """
+    The notebooks' ExperimentTracker, importable so scripts (and the worker
+    processes of frame_delta.distributed) can log runs the same way.
+    """
+
+    def __init__(self, run_name, base_dir="saved_models/framing_training_runs_longformer", config=None):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+        self.run_dir = os.path.join(base_dir, f"{timestamp}_{run_name}")
+        os.makedirs(self.run_dir, exist_ok=True)
+        print(f" Experiment initialized. Saving to: {self.run_dir}")
+        self.history = {"config": dict(config or {}), "epochs": []}
+
+    def log_epoch(self, epoch_data):
+        """Append epoch results to history and save immediately."""
+        self.history["epochs"].append(epoch_data)
+        self.save_history()
+
+    def save_history(self):
+        with open(os.path.join(self.run_dir, "metrics.json"), "w") as f:
+            json.dump(self.history, f, indent=4)
+
+    def save_model(self, model, name="model_state.bin"):
+        torch.save(model.state_dict(), os.path.join(self.run_dir, name))
+        print(f"Model saved: {name}")
+
+    def save_report(self, df_report, name="classification_report.csv"):
+        df_report.to_csv(os.path.join(self.run_dir, name))
+
+
+def _tiny_run(out_dir, n=192, seed=0):
+    """Train a tiny model twice on CPU, once interrupted and resumed, and compare the weights."""
+    from torch.utils.data import DataLoader, TensorDataset
+
+    from frame_delta.labels import NUM_LABELS
+    from frame_delta.tiny import tiny_classifier
+
+    class DictDataset(TensorDataset):
+        def __getitem__(self, idx):
+            input_ids, labels = super().__getitem__(idx)
+            return {'input_ids': input_ids, 'attention_mask': torch.ones_like(input_ids), 'labels': labels}
+
+    rng = np.random.default_rng(seed)
+    input_ids = torch.as_tensor(rng.integers(5, 1000, (n, 64)))
+    labels = torch.as_tensor(rng.random((n, NUM_LABELS)) < 0.2, dtype=torch.float)
+    train_ds, val_ds = DictDataset(input_ids[:160], labels[:160]), DictDataset(input_ids[160:], labels[160:])
+    criterion = torch.nn.BCEWithLogitsLoss()
+
+    def run(name, max_steps=None, fresh=True):
+        torch.manual_seed(seed)
+        model = tiny_classifier(seed=seed)
+        optimizer = torch.optim.AdamW(model.parameters(), lr=1e-3)
+        scheduler = torch.optim.lr_scheduler.LinearLR(optimizer, start_factor=1.0, end_factor=0.1, total_iters=20)
+        train_loader = DataLoader(train_ds, batch_size=8, sampler=ResumableSampler(train_ds, seed=seed))
+        val_loader = DataLoader(val_ds, batch_size=16)
+        tracker = ExperimentTracker(name, base_dir=out_dir)
+        train_engine(model, train_loader, val_loader, optimizer, tracker, criterion, epochs=3,
+                     accumulation_steps=3, scheduler=scheduler, device='cpu',
+                     checkpoint_dir=os.path.join(out_dir, f"{name}_checkpoints"),
+                     checkpoint_every=2, keep_last=2, resume=not fresh, max_steps=max_steps)
+        return model, tracker
+
+    reference, reference_tracker = run("uninterrupted")
+    run("resumed", max_steps=7)          # stops on epoch 1's leftover step (7 optimizer steps per epoch)
+    run("resumed", max_steps=9, fresh=False)     # then mid-epoch 2
+    resumed, resumed_tracker = run("resumed", fresh=False)
+
+    same = all(torch.equal(a, b) for a, b in zip(reference.state_dict().values(), resumed.state_dict().values()))
+    kept = [os.path.basename(p) for p in list_checkpoints(os.path.join(out_dir, "resumed_checkpoints"))]
+    print(f"\nResumed weights identical to uninterrupted run: {same}")
+    print(f"Same metrics history: {reference_tracker.history['epochs'] == resumed_tracker.history['epochs']}")
+    print(f"Checkpoints kept: {kept}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tiny', action='store_true', help='CPU check that a resumed run matches an uninterrupted one')
+    parser.add_argument('--out-dir', default=None)
+    args = parser.parse_args()
+    if not args.tiny:
+        parser.error('training on real data is driven from the notebooks; use --tiny for a smoke run')
+    if args.out_dir:
+        _tiny_run(args.out_dir)
+    else:
+        with tempfile.TemporaryDirectory() as out_dir:
+            _tiny_run(out_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Inter-annotator agreement and consensus frame labels for the assembled MFC corpus.
+
+All annotations are loaded in one pass into a bit-packed (article x annotator)
+uint16 matrix: bit k-1 is set when the annotator used frame code k (1-15)
+anywhere in the article. A separate boolean matrix marks which annotators
+coded which articles, so "no frame" and "not annotated" stay distinct.
+Agreement and consensus are computed from these arrays without per-article
+Python loops.
+
+Per frame (each frame is a binary present/absent variable):
+    - Krippendorff's alpha (nominal, missing data allowed)
+    - Cohen's kappa, averaged over annotator pairs weighted by shared articles
+Per article:
+    - majority / union / intersection consensus labels
+
+Usage:
+    python agreement.py immigration_corpus.parquet
+    python agreement.py mfc_corpus                  # combined, per-issue breakdown
+    python agreement.py immigration_corpus.parquet smoking_corpus.parquet --min-annotators 2
+
+Output:
+    agreement_report.json
+    consensus_labels.parquet   article_id, issue, n_annotators, majority/union/intersection codes
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from corpus_schema import ANNOTATOR_CODES, load_corpus
+
+NUM_FRAMES = 15
+FRAME_CODES = np.arange(1, NUM_FRAMES + 1)
+CODES_JSON = "codes.json"
+REPORT_FILE = "agreement_report.json"
+CONSENSUS_FILE = "consensus_labels.parquet"
+CONSENSUS_METHODS = ("majority", "union", "intersection")
+
+
+class AnnotationMatrix:
+    """
+    masks:    (articles, annotators) uint16, bit k-1 set for frame code k
+    observed: (articles, annotators) bool, annotator coded the article
+    """
+
+    def __init__(self, article_ids, issues, annotators, masks, observed):
+        self.article_ids = np.asarray(article_ids)
+        self.issues = np.asarray(issues)
+        self.annotators = list(annotators)
+        self.masks = masks
+        self.observed = observed
+
+    @classmethod
+    def from_arrow(cls, article_ids, frame_annotations, issues):
+        """Build from a list<struct<annotator, codes>> column in one vectorized pass."""
+        frame_annotations = frame_annotations.combine_chunks() \
+            if isinstance(frame_annotations, pa.ChunkedArray) else frame_annotations
+        n_articles = len(frame_annotations)
+
+        entry_article = pc.list_parent_indices(frame_annotations).to_numpy()
+        entries = pc.list_flatten(frame_annotations)
+        entry_annotator, annotators = pd.factorize(
+            entries.field("annotator").to_numpy(zero_copy_only=False), sort=True
+        )
+
+        observed = np.zeros((n_articles, len(annotators)), dtype=bool)
+        observed[entry_article, entry_annotator] = True
+
+        codes = entries.field("codes")
+        code_entry = pc.list_parent_indices(codes).to_numpy()
+        code_values = pc.list_flatten(codes).to_numpy(zero_copy_only=False).astype(np.int64)
+        valid = (code_values >= 1) & (code_values <= NUM_FRAMES)
+        bits = np.left_shift(1, code_values[valid] - 1).astype(np.uint16)
+
+        masks = np.zeros((n_articles, len(annotators)), dtype=np.uint16)
+        np.bitwise_or.at(masks, (entry_article[code_entry[valid]], entry_annotator[code_entry[valid]]), bits)
+        return cls(article_ids, issues, annotators, masks, observed)
+
+    @classmethod
+    def from_corpus(cls, paths):
+        """
+        Load one or more corpus files (or the combined mfc_corpus/ directory).
+
+        A file's issue comes from its issue=<name> partition, or else from its
+        <issue>_corpus.parquet file name.
+        """
+        article_ids, annotations, issues = [], [], []
+        for path in paths:
+            table = pq.read_table(path, columns=[c for c in ("article_id", "frame_annotations", "issue")
+                                                 if c in pq.read_schema(path).names] if os.path.isfile(path) else None)
+            names = table.column_names
+            if "frame_annotations" in names and pa.types.is_string(table.schema.field("frame_annotations").type):
+                # files written before the typed schema
+                df = load_corpus(path, columns=["article_id", "frame_annotations"])
+                column = pa.array(df["frame_annotations"].tolist(), type=pa.list_(ANNOTATOR_CODES))
+            else:
+                column = table.column("frame_annotations")
+            if "issue" in names:
+                issue = table.column("issue").cast(pa.string()).to_numpy(zero_copy_only=False)
+            else:
+                issue = np.full(table.num_rows, os.path.basename(path.rstrip("/")).split("_corpus")[0])
+            article_ids.append(table.column("article_id").to_numpy(zero_copy_only=False))
+            annotations.append(column)
+            issues.append(issue)
+
+        chunks = [chunk for c in annotations for chunk in (c.chunks if isinstance(c, pa.ChunkedArray) else [c])]
+        column = pa.chunked_array(chunks, type=pa.list_(ANNOTATOR_CODES))
+        return cls.from_arrow(np.concatenate(article_ids), column, np.concatenate(issues))
+
+    def dense(self):
+        """(articles, annotators, frames) bool tensor, unpacked from the bitmasks."""
+        return ((self.masks[:, :, None] >> np.arange(NUM_FRAMES, dtype=np.uint16)) & 1).astype(bool)
+
+    def frame_votes(self):
+        """(articles, frames) number of annotators who used each frame."""
+        votes = np.zeros((len(self.masks), NUM_FRAMES), dtype=np.int32)
+        for bit in range(NUM_FRAMES):  # 15 vectorized passes, not per article
+            votes[:, bit] = ((self.masks >> bit) & 1).sum(axis=1)
+        return votes
+
+    def n_annotators(self):
+        return self.observed.sum(axis=1)
+
+    def subset(self, rows):
+        """Articles selected by a boolean or index array (annotator columns kept)."""
+        return AnnotationMatrix(self.article_ids[rows], self.issues[rows], self.annotators,
+                                self.masks[rows], self.observed[rows])
+
+
+def krippendorff_alpha(matrix):
+    """
+    Nominal Krippendorff's alpha per frame, treating each frame as binary.
+
+    With n_u1 annotators marking the frame out of m_u on article u, the
+    observed disagreement is sum_u 2*n_u0*n_u1/(m_u-1) over articles with
+    m_u >= 2, and alpha = 1 - (n-1) * that sum / (2 * n_0 * n_1).
+    """
+    m = matrix.n_annotators().astype(np.float64)
+    pairable = m >= 2
+    n1 = matrix.frame_votes()[pairable].astype(np.float64)
+    m = m[pairable][:, None]
+    n0 = m - n1
+
+    disagreement = (2 * n0 * n1 / (m - 1)).sum(axis=0)
+    n = m.sum()
+    total_0, total_1 = n0.sum(axis=0), n1.sum(axis=0)
+    expected = 2 * total_0 * total_1
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        alpha = 1 - (n - 1) * disagreement / expected
+    return np.where(expected > 0, alpha, np.nan)
+
+
+def cohen_kappa(matrix, min_overlap=20):
+    """
+    Cohen's kappa per frame for every annotator pair with >= min_overlap shared
+    articles. Returns (mean kappa weighted by overlap, pairwise (F, A, A) array).
+    """
+    x = matrix.dense().astype(np.float32)           # (U, A, F)
+    o = matrix.observed.astype(np.float32)          # (U, A)
+
+    both = o.T @ o                                                  # (A, A) shared articles
+    yes_yes = np.einsum("uaf,ubf->fab", x, x)                       # both marked the frame
+    yes_i = np.einsum("uaf,ub->fab", x, o)                          # i marked, j coded the article
+    yes_j = yes_i.transpose(0, 2, 1)
+    no_no = both[None] - yes_i - yes_j + yes_yes
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p_observed = (yes_yes + no_no) / both[None]
+        p_i, p_j = yes_i / both[None], yes_j / both[None]
+        p_expected = p_i * p_j + (1 - p_i) * (1 - p_j)
+        kappa = (p_observed - p_expected) / (1 - p_expected)
+
+    pairs = np.triu(both >= min_overlap, k=1)[None] & np.isfinite(kappa)
+    weights = np.where(pairs, both[None], 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = (np.where(pairs, kappa, 0) * weights).sum(axis=(1, 2)) / weights.sum(axis=(1, 2))
+    return mean, np.where(pairs | pairs.transpose(0, 2, 1), kappa, np.nan)
+
+
+def consensus_labels(matrix, method="majority"):
+    """(articles, frames) 0/1 consensus: more than half, any, or all annotators."""
+    votes = matrix.frame_votes()
+    m = matrix.n_annotators()[:, None]
+    if method == "majority":
+        labels = 2 * votes > m
+    elif method == "union":
+        labels = votes > 0
+    elif method == "intersection":
+        labels = (votes == m) & (m > 0)
+    else:
+        raise ValueError(f"method must be one of {CONSENSUS_METHODS}, got {method!r}")
+    return labels.astype(np.int8)
+
+
+def frame_names(codes_path=CODES_JSON):
+    if os.path.exists(codes_path):
+        with open(codes_path, "r", encoding="utf-8") as f:
+            codes = json.load(f)
+        return [codes.get(f"{code}.0", str(code)) for code in FRAME_CODES]
+    return [str(code) for code in FRAME_CODES]
+
+
+def agreement_report(matrix, min_overlap=20):
+    names = frame_names()
+    alpha = krippendorff_alpha(matrix)
+    kappa, _ = cohen_kappa(matrix, min_overlap=min_overlap)
+    votes = matrix.frame_votes()
+
+    def clean(value):
+        return None if not np.isfinite(value) else round(float(value), 4)
+
+    return {
+        "articles": int(len(matrix.masks)),
+        "articles_with_2plus_annotators": int((matrix.n_annotators() >= 2).sum()),
+        "annotators": int(matrix.observed.any(axis=0).sum()),
+        "frames": {
+            name: {
+                "krippendorff_alpha": clean(alpha[i]),
+                "cohen_kappa": clean(kappa[i]),
+                "articles_marked": int((votes[:, i] > 0).sum()),
+            }
+            for i, name in enumerate(names)
+        },
+        "mean_krippendorff_alpha": clean(np.nanmean(alpha)) if np.isfinite(alpha).any() else None,
+        "mean_cohen_kappa": clean(np.nanmean(kappa)) if np.isfinite(kappa).any() else None,
+    }
+
+
+def consensus_table(matrix):
+    """One row per article with consensus frame codes for every method."""
+    table = {
+        "article_id": matrix.article_ids,
+        "issue": matrix.issues,
+        "n_annotators": matrix.n_annotators().astype(np.int16),
+    }
+    for method in CONSENSUS_METHODS:
+        labels = consensus_labels(matrix, method).astype(bool)
+        table[method] = [FRAME_CODES[row].tolist() for row in labels]
+    return pd.DataFrame(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inter-annotator agreement and consensus labels for MFC.")
+    parser.add_argument("paths", nargs="+", help="corpus parquet files or the combined mfc_corpus/ directory")
+    parser.add_argument("--min-overlap", type=int, default=20,
+                        help="shared articles needed before an annotator pair counts towards kappa")
+    parser.add_argument("--min-annotators", type=int, default=1,
+                        help="drop articles with fewer annotators from the consensus output")
+    args = parser.parse_args()
+
+    print("Loading annotations...")
+    matrix = AnnotationMatrix.from_corpus(args.paths)
+    print(f"  {len(matrix.masks)} articles, {len(matrix.annotators)} annotators")
+
+    report = {"all": agreement_report(matrix, args.min_overlap), "issues": {}}
+    for issue in np.unique(matrix.issues):
+        report["issues"][str(issue)] = agreement_report(matrix.subset(matrix.issues == issue), args.min_overlap)
+
+    print(f"\n{'Frame':<48} {'alpha':>7} {'kappa':>7}")
+    for name, stats in report["all"]["frames"].items():
+        alpha = stats["krippendorff_alpha"]
+        kappa = stats["cohen_kappa"]
+        print(f"{name:<48} {alpha if alpha is not None else float('nan'):>7.3f} "
+              f"{kappa if kappa is not None else float('nan'):>7.3f}")
+
+    with open(REPORT_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    consensus = consensus_table(matrix.subset(matrix.n_annotators() >= args.min_annotators))
+    consensus.to_parquet(CONSENSUS_FILE, index=False, compression="zstd")
+    print(f"\nSaved:\n  - {REPORT_FILE}\n  - {CONSENSUS_FILE} ({len(consensus)} articles)")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,10 @@
 Assemble the Media Frames Corpus dataset from downloaded DOCX files.
 
 Usage:
-    python assemble_dataset.py
+    python assemble_dataset.py                  # immigration only
+    python assemble_dataset.py --multi-issue    # immigration, smoking and samesex together
+    python assemble_dataset.py --csv            # also write a CSV copy
+    python -m frame_delta assemble --clean      # also keep a boilerplate-stripped text_clean (from the repo root)
 
 Expected structure:
     media_frames_corpus/
@@ -17,19 +20,32 @@ Expected structure:
 
 Output:
     media_frames_corpus/
-        immigration_corpus.parquet
-        immigration_corpus.csv
+        immigration_corpus.parquet      typed schema, see corpus_schema.py
+        immigration_corpus.csv          only with --csv
         assembly_report.json
+
+Multi-issue mode reads smoking.json and samesex.json as well, takes DOCX files
+from any depth under downloads/ and parses each one once into
+docx_index.parquet, which later runs reuse for files whose size and mtime have
+not changed. A title found in several issues is assigned using the DOCX
+header date. Output:
+    media_frames_corpus/
+        {immigration,smoking,samesex}_corpus.parquet
+        mfc_corpus/issue=<issue>/part-0.parquet    combined, partitioned by issue
+        assembly_report_multi.json
 """
 
+import argparse
+import importlib.util
 import json
 import os
 import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from collections import defaultdict
 
-import pandas as pd
-from docx import Document
+from mfc_json import ISSUE_FILES, build_title_index, iter_articles, normalize_title
 
 # Config
 INPUT_JSON = "immigration.json"
@@ -38,21 +54,19 @@ DOWNLOADS_DIR = "downloads"
 OUTPUT_PARQUET = "immigration_corpus.parquet"
 OUTPUT_CSV = "immigration_corpus.csv"
 REPORT_FILE = "assembly_report.json"
+DOCX_INDEX = "docx_index.parquet"
+COMBINED_DIR = "mfc_corpus"
+MULTI_REPORT_FILE = "assembly_report_multi.json"
+# all DOCX bodies come from Nexis Uni, so repeated-line detection treats them as one source
+NEXIS_DOMAIN = "nexis"
 
-
-def normalize_title(title):
-    """Normalize title for matching: lowercase, remove punctuation, collapse whitespace."""
-    title = title.lower()
-    title = re.sub(r'[^\w\s]', '', title)
-    title = re.sub(r'\s+', ' ', title).strip()
-    return title
+MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december"]
+DATE_RE = re.compile(r'\b(' + '|'.join(MONTHS) + r')\s+\d{1,2},\s+(\d{4})\b', re.IGNORECASE)
 
 
-def extract_text_from_docx(docx_path):
-    """Extract body text from DOCX, skipping metadata header."""
-    doc = Document(docx_path)
-    paragraphs = [p.text.strip() for p in doc.paragraphs]
-
+def _body_from_paragraphs(paragraphs):
+    """Body text after the "Body" marker (or after the ~10 metadata lines)."""
     # Find "Body" marker and extract text after it
     body_idx = None
     for i, para in enumerate(paragraphs):
@@ -71,26 +85,81 @@ def extract_text_from_docx(docx_path):
     return body_text
 
 
-def extract_title_from_docx(docx_path):
-    """Extract the article title from DOCX content (usually 3rd non-empty paragraph)."""
-    doc = Document(docx_path)
-    non_empty = [p.text.strip() for p in doc.paragraphs if p.text.strip()]
+def _title_from_paragraphs(paragraphs):
+    non_empty = [p for p in paragraphs if p]
     # Title is typically the first substantial text after empty lines
     if len(non_empty) >= 1:
         return non_empty[0]
     return None
 
 
-def load_nyt_articles(json_path):
-    """Load NYT articles (excluding blogs) and build title lookup."""
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+def _date_from_paragraphs(paragraphs, header_lines=15):
+    """(year, month) from the Nexis header date line, e.g. "January 5, 1990 Friday"."""
+    for para in paragraphs[:header_lines]:
+        match = DATE_RE.search(para)
+        if match:
+            return int(match.group(2)), MONTHS.index(match.group(1).lower()) + 1
+    return None, None
+
+
+def extract_text_from_docx(docx_path):
+    """Extract body text from DOCX, skipping metadata header."""
+    from docx import Document
+
+    doc = Document(docx_path)
+    return _body_from_paragraphs([p.text.strip() for p in doc.paragraphs])
+
+
+def extract_title_from_docx(docx_path):
+    """Extract the article title from DOCX content (usually 3rd non-empty paragraph)."""
+    from docx import Document
 
-    nyt_articles = {
-        k: v for k, v in data.items()
-        if v.get('source', '').lower() == 'new york times'
+    doc = Document(docx_path)
+    return _title_from_paragraphs([p.text.strip() for p in doc.paragraphs])
+
+
+def parse_docx(docx_path):
+    """Title, body and publication (year, month) from a single read of the DOCX."""
+    from docx import Document
+
+    paragraphs = [p.text.strip() for p in Document(docx_path).paragraphs]
+    year, month = _date_from_paragraphs(paragraphs)
+    return {
+        "content_title": _title_from_paragraphs(paragraphs),
+        "text": _body_from_paragraphs(paragraphs),
+        "docx_year": year,
+        "docx_month": month,
     }
 
+
+def clean_texts(texts, cached=None):
+    """
+    Boilerplate-stripped copies of texts and the cleaner version tag, using
+    frame_delta.boilerplate with lines repeated across the DOCX bodies.
+    cached: (text_clean, clean_version) per text from an earlier run; entries
+    with the current version are reused. frame_delta is importable when this
+    runs as `python -m frame_delta assemble --clean` from the repo root.
+    """
+    from frame_delta.boilerplate import BoilerplateCleaner, DomainBoilerplate
+
+    domains = DomainBoilerplate()
+    for text in texts:
+        domains.add(NEXIS_DOMAIN, text)
+    cleaner = BoilerplateCleaner(domains.finalize(), nexis=True)
+    cached = cached or [(None, None)] * len(texts)
+    cleaned = [
+        clean if version == cleaner.version else cleaner.clean(text, NEXIS_DOMAIN)
+        for text, (clean, version) in zip(texts, cached)
+    ]
+    return cleaned, cleaner.version
+
+
+def load_nyt_articles(json_path):
+    """Stream NYT articles (excluding blogs) and build title lookup."""
+    # Only metadata and frame/tone codes are kept; span offsets and
+    # non-NYT articles are dropped while parsing
+    nyt_articles = dict(iter_articles(json_path))
+
     # Build normalized title -> article mapping
     title_lookup = {}
     for article_id, article in nyt_articles.items():
@@ -161,9 +230,56 @@ def extract_tone_labels(article):
     return annotator_tones
 
 
-def main():
-    base_path = Path(__file__).parent
-    os.chdir(base_path)
+def collect_docx_files(downloads_path, recursive=False):
+    """
+    Collect DOCX files (case-insensitive, deduplicated) from the batch folders
+    under downloads/, or from any depth when recursive is set.
+    """
+    if recursive:
+        candidates = [f for f in sorted(downloads_path.rglob('*')) if f.is_file()]
+    else:
+        candidates = [f for batch_dir in sorted(downloads_path.iterdir()) if batch_dir.is_dir()
+                      for f in batch_dir.iterdir()]
+
+    docx_files = []
+    seen_paths = set()
+    for docx_file in candidates:
+        if docx_file.suffix.lower() == '.docx' and docx_file not in seen_paths:
+            docx_files.append(docx_file)
+            seen_paths.add(docx_file)
+    return docx_files
+
+
+def build_row(article_id, article, body_text, docx_file, match_method, text_clean=None, clean_version=None):
+    """One output row: JSON metadata, extracted (and optionally cleaned) text and per-annotator labels."""
+    from corpus_schema import annotations_to_list
+
+    frame_labels = extract_frame_labels(article)
+    tone_labels = extract_tone_labels(article)
+    return {
+        "article_id": article_id,
+        "title": article.get("title"),
+        "year": article.get("year"),
+        "month": article.get("month"),
+        "source": article.get("source"),
+        "byline": article.get("byline"),
+        "section": article.get("section"),
+        "length": None if article.get("length") is None else int(article["length"]),
+        "text": body_text,
+        "text_length": len(body_text),
+        "text_clean": text_clean,
+        "clean_version": clean_version,
+        "docx_file": docx_file,
+        "match_method": match_method,
+        "frame_annotations": annotations_to_list(frame_labels, "codes"),
+        "tone_annotations": annotations_to_list(tone_labels, "tones"),
+    }
+
+
+def assemble_single(base_path, write_csv_copy=False, clean=False):
+    import pandas as pd
+
+    from corpus_schema import write_corpus, write_csv
 
     # Load source data
     print("Loading source data...")
@@ -178,16 +294,7 @@ def main():
         print("Please create the downloads/ folder and add batch subfolders with DOCX files.")
         return
 
-    # Collect all DOCX files (case-insensitive, deduplicated)
-    docx_files = []
-    seen_paths = set()
-    for batch_dir in sorted(downloads_path.iterdir()):
-        if batch_dir.is_dir():
-            for docx_file in batch_dir.iterdir():
-                if docx_file.suffix.lower() == '.docx' and docx_file not in seen_paths:
-                    docx_files.append(docx_file)
-                    seen_paths.add(docx_file)
-
+    docx_files = collect_docx_files(downloads_path)
     print(f"  Found {len(docx_files)} DOCX files in downloads/")
 
     # Match and assemble
@@ -201,8 +308,9 @@ def main():
         filename_title = docx_path.stem  # filename without extension
         norm_filename = normalize_title(filename_title)
 
-        # Also try extracting title from DOCX content
-        content_title = extract_title_from_docx(docx_path)
+        # Also try extracting title from DOCX content (one read gives title and body)
+        parsed = parse_docx(docx_path)
+        content_title = parsed["content_title"]
         norm_content = normalize_title(content_title) if content_title else ""
 
         # Try to match
@@ -230,29 +338,8 @@ def main():
             article_id, article = match
             unmatched_articles.discard(article_id)
 
-            # Extract text
-            body_text = extract_text_from_docx(docx_path)
-
-            # Extract labels
-            frame_labels = extract_frame_labels(article)
-            tone_labels = extract_tone_labels(article)
-
-            matched.append({
-                "article_id": article_id,
-                "title": article.get("title"),
-                "year": article.get("year"),
-                "month": article.get("month"),
-                "source": article.get("source"),
-                "byline": article.get("byline"),
-                "section": article.get("section"),
-                "length": article.get("length"),
-                "text": body_text,
-                "text_length": len(body_text),
-                "docx_file": str(docx_path.relative_to(base_path)),
-                "match_method": match_method,
-                "frame_annotations": json.dumps(frame_labels),
-                "tone_annotations": json.dumps(tone_labels),
-            })
+            matched.append(build_row(article_id, article, parsed["text"],
+                                     str(docx_path.relative_to(base_path)), match_method))
         else:
             unmatched_files.append({
                 "file": str(docx_path.relative_to(base_path)),
@@ -264,16 +351,21 @@ def main():
     print(f"  Unmatched files: {len(unmatched_files)}")
     print(f"  Missing articles: {len(unmatched_articles)}")
 
-    # Build DataFrame
-    if matched:
-        df = pd.DataFrame(matched)
+    if clean and matched:
+        cleaned, version = clean_texts([row["text"] for row in matched])
+        for row, text_clean in zip(matched, cleaned):
+            row["text_clean"], row["clean_version"] = text_clean, version
+        saved = sum(row["text_length"] - len(row["text_clean"]) for row in matched) / len(matched)
+        print(f"  Cleaned text ({version}): {saved:.0f} characters removed per article")
 
-        # Save outputs
-        df.to_parquet(OUTPUT_PARQUET, index=False)
-        df.to_csv(OUTPUT_CSV, index=False)
-        print(f"\nSaved {len(df)} articles to:")
+    # Save outputs
+    if matched:
+        write_corpus(matched, OUTPUT_PARQUET)
+        print(f"\nSaved {len(matched)} articles to:")
         print(f"  - {OUTPUT_PARQUET}")
-        print(f"  - {OUTPUT_CSV}")
+        if write_csv_copy:
+            write_csv(pd.DataFrame(matched), OUTPUT_CSV)
+            print(f"  - {OUTPUT_CSV}")
 
     # Save report
     report = {
@@ -291,5 +383,206 @@ def main():
     print(f"  - {REPORT_FILE}")
 
 
+def build_docx_index(docx_files, base_path, index_path=DOCX_INDEX, workers=None, clean=False):
+    """
+    Parse every DOCX once into a shared index of extracted title, body and date.
+
+    Entries from a previous run are reused when the file's size and mtime are
+    unchanged, so only new or re-downloaded files are parsed. With clean, the
+    index also keeps text_clean and its clean_version, recomputed only for
+    entries cleaned by another version.
+    """
+    import pandas as pd
+
+    files = pd.DataFrame({
+        "docx_file": [str(p.relative_to(base_path)) for p in docx_files],
+        "filename_title": [p.stem for p in docx_files],
+        "size": [p.stat().st_size for p in docx_files],
+        "mtime_ns": [p.stat().st_mtime_ns for p in docx_files],
+    })
+
+    cached = None
+    if os.path.exists(index_path):
+        cached = pd.read_parquet(index_path)
+        files = files.merge(
+            cached.drop(columns=["filename_title"]), on=["docx_file", "size", "mtime_ns"], how="left"
+        )
+    stale = files["text"].isna() if "text" in files else pd.Series(True, index=files.index)
+
+    to_parse = [base_path / f for f in files.loc[stale, "docx_file"]]
+    print(f"  Parsing {len(to_parse)} DOCX files ({len(files) - len(to_parse)} reused from {index_path})")
+    if to_parse:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = pd.DataFrame(list(executor.map(parse_docx, to_parse, chunksize=16)),
+                                  index=files.index[stale])
+        for column in parsed.columns:
+            if column not in files:
+                files[column] = None
+            files[column] = files[column].astype(object)
+            files.loc[stale, column] = parsed[column]
+
+    if clean and len(files):
+        cached = None
+        if "clean_version" in files:
+            cached = list(zip(files["text_clean"], files["clean_version"]))
+        cleaned, version = clean_texts(list(files["text"].fillna("")), cached)
+        files["text_clean"], files["clean_version"] = cleaned, version
+        saved = (files["text"].fillna("").str.len() - files["text_clean"].str.len()).mean()
+        print(f"  Cleaned text ({version}): {saved:.0f} characters removed per article")
+
+    files.to_parquet(index_path, index=False)
+    return files
+
+
+def resolve_candidates(candidates, docx_year, docx_month, claimed):
+    """
+    Choose which (issue, article_id, article) a DOCX belongs to when its title
+    matched several articles, possibly in different issues.
+
+    At most one article per issue is kept. When the DOCX header has a date,
+    issues with a same-year (and month, if known) candidate win over those
+    without one; within an issue, unclaimed articles are preferred.
+    """
+    by_issue = defaultdict(list)
+    for issue, article_id, article in candidates:
+        by_issue[issue].append((article_id, article))
+
+    def dated(options):
+        return [
+            (article_id, article) for article_id, article in options
+            if article.get("year") == docx_year
+            and (docx_month is None or article.get("month") in (None, docx_month))
+        ]
+
+    if docx_year is not None and any(dated(options) for options in by_issue.values()):
+        by_issue = {issue: dated(options) for issue, options in by_issue.items() if dated(options)}
+
+    chosen = []
+    for issue, options in by_issue.items():
+        unclaimed = [o for o in options if (issue, o[0]) not in claimed]
+        article_id, article = (unclaimed or options)[0]
+        chosen.append((issue, article_id, article))
+    return chosen
+
+
+def assemble_multi(base_path, issues, workers=None, write_csv_copy=False, clean=False):
+    """Match one shared DOCX index against the title lookups of several issues together."""
+    import pandas as pd
+
+    from corpus_schema import write_corpus, write_csv
+
+    print("Loading source data...")
+    json_paths = {issue: ISSUE_FILES[issue] for issue in issues if os.path.exists(ISSUE_FILES[issue])}
+    for issue in set(issues) - set(json_paths):
+        print(f"  Skipping {issue}: {ISSUE_FILES[issue]} not found")
+    title_index, nyt_counts = build_title_index(json_paths)
+    for issue, count in nyt_counts.items():
+        print(f"  Loaded {count} NYT articles for {issue}")
+
+    downloads_path = base_path / DOWNLOADS_DIR
+    if not downloads_path.exists():
+        print(f"ERROR: Downloads directory not found: {downloads_path}")
+        return
+
+    docx_files = collect_docx_files(downloads_path, recursive=True)
+    print(f"  Found {len(docx_files)} DOCX files in downloads/")
+    docx_index = build_docx_index(docx_files, base_path, workers=workers, clean=clean)
+
+    print("\nMatching files to articles...")
+    rows = defaultdict(list)
+    claimed = set()
+    unmatched_files = []
+    collisions = 0
+
+    for entry in docx_index.itertuples(index=False):
+        norm_filename = normalize_title(entry.filename_title)
+        norm_content = normalize_title(entry.content_title) if entry.content_title else ""
+
+        if norm_filename in title_index:
+            candidates, match_method = title_index[norm_filename], "filename"
+        elif norm_content in title_index:
+            candidates, match_method = title_index[norm_content], "content"
+        else:
+            unmatched_files.append({
+                "file": entry.docx_file,
+                "filename_title": entry.filename_title,
+                "content_title": entry.content_title,
+            })
+            continue
+
+        if len({issue for issue, _, _ in candidates}) > 1:
+            collisions += 1
+        year = None if pd.isna(entry.docx_year) else int(entry.docx_year)
+        month = None if pd.isna(entry.docx_month) else int(entry.docx_month)
+
+        for issue, article_id, article in resolve_candidates(candidates, year, month, claimed):
+            claimed.add((issue, article_id))
+            rows[issue].append(build_row(article_id, article, entry.text, entry.docx_file, match_method,
+                                         getattr(entry, "text_clean", None) if clean else None,
+                                         getattr(entry, "clean_version", None) if clean else None))
+
+    report = {
+        "docx_files_found": len(docx_files),
+        "cross_issue_title_collisions": collisions,
+        "unmatched_files": unmatched_files[:50],  # truncate for readability
+        "unmatched_files_count": len(unmatched_files),
+        "issues": {},
+    }
+
+    print("\nSaved:")
+    # partitioned output is rewritten as a whole, so start clean
+    shutil.rmtree(COMBINED_DIR, ignore_errors=True)
+    combined_count = 0
+    for issue in json_paths:
+        matched = {article_id for i, article_id in claimed if i == issue}
+        report["issues"][issue] = {
+            "total_nyt_articles": nyt_counts[issue],
+            "matched": len(rows[issue]),
+            "missing_articles_count": nyt_counts[issue] - len(matched),
+        }
+        if not rows[issue]:
+            continue
+        output = f"{issue}_corpus.parquet"
+        write_corpus(rows[issue], output)
+        print(f"  - {output} ({len(rows[issue])} articles)")
+        if write_csv_copy:
+            write_csv(pd.DataFrame(rows[issue]), f"{issue}_corpus.csv")
+            print(f"  - {issue}_corpus.csv")
+        combined_count += write_corpus(rows[issue], os.path.join(COMBINED_DIR, f"issue={issue}", "part-0.parquet"))
+
+    if combined_count:
+        print(f"  - {COMBINED_DIR}/ ({combined_count} articles, partitioned by issue)")
+
+    print(f"  Unmatched files: {len(unmatched_files)}")
+    print(f"  Cross-issue title collisions: {collisions}")
+    with open(MULTI_REPORT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"  - {MULTI_REPORT_FILE}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assemble the MFC dataset from downloaded DOCX files.")
+    parser.add_argument("--multi-issue", action="store_true",
+                        help="assemble several issues in one run from a shared DOCX index")
+    parser.add_argument("--issues", nargs="+", choices=list(ISSUE_FILES), default=list(ISSUE_FILES),
+                        help="issues to assemble in --multi-issue mode")
+    parser.add_argument("--workers", type=int, default=None, help="DOCX parsing processes")
+    parser.add_argument("--csv", action="store_true", help="also write a CSV copy of each corpus")
+    parser.add_argument("--clean", action="store_true",
+                        help="also store a boilerplate-stripped text_clean (see frame_delta/boilerplate.py)")
+    args = parser.parse_args()
+    if args.clean and importlib.util.find_spec("frame_delta") is None:
+        parser.error("--clean uses frame_delta.boilerplate; run `python -m frame_delta assemble --clean` "
+                     "from the repo root")
+
+    base_path = Path(__file__).parent
+    os.chdir(base_path)
+
+    if args.multi_issue:
+        assemble_multi(base_path, args.issues, workers=args.workers, write_csv_copy=args.csv, clean=args.clean)
+    else:
+        assemble_single(base_path, write_csv_copy=args.csv, clean=args.clean)
+
+
 if __name__ == "__main__":
     main()
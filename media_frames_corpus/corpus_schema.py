@@ -0,0 +1,107 @@
+"""
+Typed Parquet schema, writer and loader for the assembled MFC corpus.
+
+Annotations are stored as native nested columns instead of json.dumps strings:
+
+    frame_annotations   list<struct<annotator: string, codes: list<int8>>>
+    tone_annotations    list<struct<annotator: string, tones: list<string>>>
+
+source, section and match_method are dictionary-encoded. Files are written
+with zstd, sorted by year with one row group per year, so a year filter only
+reads the matching row groups.
+
+Usage:
+    from corpus_schema import load_corpus
+    df = load_corpus("immigration_corpus.parquet", columns=["text", "frame_annotations"],
+                     years=range(2000, 2013))
+"""
+
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+ANNOTATOR_CODES = pa.struct([("annotator", pa.string()), ("codes", pa.list_(pa.int8()))])
+ANNOTATOR_TONES = pa.struct([("annotator", pa.string()), ("tones", pa.list_(pa.string()))])
+
+CORPUS_SCHEMA = pa.schema([
+    ("article_id", pa.string()),
+    ("title", pa.string()),
+    ("year", pa.int16()),
+    ("month", pa.int8()),
+    ("source", pa.dictionary(pa.int32(), pa.string())),
+    ("byline", pa.string()),
+    ("section", pa.dictionary(pa.int32(), pa.string())),
+    ("length", pa.int32()),
+    ("text", pa.string()),
+    ("text_length", pa.int32()),
+    ("text_clean", pa.string()),
+    ("clean_version", pa.string()),
+    ("docx_file", pa.string()),
+    ("match_method", pa.dictionary(pa.int8(), pa.string())),
+    ("frame_annotations", pa.list_(ANNOTATOR_CODES)),
+    ("tone_annotations", pa.list_(ANNOTATOR_TONES)),
+])
+ANNOTATION_COLUMNS = {"frame_annotations": "codes", "tone_annotations": "tones"}
+COMPRESSION = "zstd"
+
+
+def annotations_to_list(labels, value_key):
+    """{annotator_id: [values]} -> [{"annotator": id, value_key: [values]}, ...]"""
+    return [{"annotator": annotator, value_key: values} for annotator, values in labels.items()]
+
+
+def annotations_to_dict(entries, value_key):
+    """Inverse of annotations_to_list (accepts the numpy arrays pandas returns)."""
+    return {entry["annotator"]: list(entry[value_key]) for entry in entries}
+
+
+def write_corpus(rows, path):
+    """Write row dicts (see assemble_dataset.build_row) as one row group per year."""
+    table = pa.Table.from_pylist(rows, schema=CORPUS_SCHEMA)
+    table = table.sort_by([("year", "ascending"), ("month", "ascending")])
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with pq.ParquetWriter(path, CORPUS_SCHEMA, compression=COMPRESSION) as writer:
+        years = table.column("year").to_pylist()
+        start = 0
+        while start < len(years):
+            end = start
+            while end < len(years) and years[end] == years[start]:
+                end += 1
+            writer.write_table(table.slice(start, end - start), row_group_size=end - start)
+            start = end
+    return table.num_rows
+
+
+def write_csv(df, path):
+    """CSV copy with annotation columns flattened back to JSON dict strings."""
+    df = df.copy()
+    for column, value_key in ANNOTATION_COLUMNS.items():
+        if column in df:
+            df[column] = [json.dumps(annotations_to_dict(v, value_key)) for v in df[column]]
+    df.to_csv(path, index=False)
+
+
+def load_corpus(path, columns=None, years=None, issues=None):
+    """
+    Read only `columns` for the given `years` (and `issues`, for the combined
+    issue-partitioned directory) into a DataFrame.
+
+    Files written before the typed schema, with annotations as JSON strings,
+    are converted to the same list-of-struct form.
+    """
+    filters = []
+    if years is not None:
+        filters.append(("year", "in", [int(y) for y in years]))
+    if issues is not None:
+        filters.append(("issue", "in", list(issues)))
+
+    table = pq.read_table(path, columns=columns, filters=filters or None)
+    df = table.to_pandas()
+
+    for column, value_key in ANNOTATION_COLUMNS.items():
+        if column in df and pa.types.is_string(table.schema.field(column).type):
+            df[column] = [annotations_to_list(json.loads(v), value_key) for v in df[column]]
+    return df
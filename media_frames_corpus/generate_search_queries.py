@@ -10,6 +10,8 @@ import json
 import os
 from pathlib import Path
 
+from mfc_json import iter_articles
+
 # Config
 MAX_QUERY_CHARS = 5000
 INPUT_FILE = "immigration.json"
@@ -17,13 +19,10 @@ OUTPUT_DIR = "search_queries"
 
 def load_nyt_articles(filepath):
     """Load and filter for exact 'new york times' source (no blogs), with valid titles."""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
+    # Streams the file, keeping only NYT title/year/month (no annotations)
     nyt_articles = [
-        (k, v) for k, v in data.items()
-        if v.get('source', '').lower() == 'new york times'
-        and v.get('title', '').strip()  # Exclude empty titles
+        (k, v) for k, v in iter_articles(filepath, fields=('title', 'year', 'month'), keep_codes=False)
+        if (v.get('title') or '').strip()  # Exclude empty titles
     ]
 
     # Sort by year, month for organized batching
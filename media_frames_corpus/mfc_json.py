@@ -0,0 +1,200 @@
+"""
+Streaming reader for the MFC annotation JSON files.
+
+immigration.json, smoking.json and samesex.json map article IDs to metadata
+plus every annotator's spans for every outlet. json.load materialises all of
+it just to keep a few NYT fields. This reader walks the file as a stream of
+parse events (ijson), keeps only the projected metadata fields and the frame /
+tone codes (span offsets only on request), and drops non-NYT articles as soon as
+their source is known. Memory stays bounded by one projected article.
+
+Falls back to json.load when ijson is not installed (pip install ijson).
+"""
+
+import json
+import re
+
+try:
+    import ijson
+except ImportError:  # optional: streaming needs ijson, the fallback does not
+    ijson = None
+
+ISSUE_FILES = {
+    "immigration": "immigration.json",
+    "smoking": "smoking.json",
+    "samesex": "samesex.json",
+}
+NYT_SOURCE = "new york times"
+METADATA_FIELDS = ("title", "year", "month", "source", "byline", "section", "length")
+ANNOTATION_TYPES = ("framing", "tone")
+SPAN_FIELDS = ("start", "end")
+_CONTAINER_START = ("start_map", "start_array")
+
+
+def normalize_title(title):
+    """Normalize title for matching: lowercase, remove punctuation, collapse whitespace."""
+    title = title.lower()
+    title = re.sub(r'[^\w\s]', '', title)
+    title = re.sub(r'\s+', ' ', title).strip()
+    return title
+
+
+def is_nyt(article):
+    return (article.get('source') or '').lower() == NYT_SOURCE
+
+
+def _skip(events, event):
+    """Consume the rest of a value whose first event has just been read."""
+    if event not in _CONTAINER_START:
+        return
+    depth = 1
+    for event, _ in events:
+        if event in _CONTAINER_START:
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
+            if depth == 0:
+                return
+
+
+def _read_scalar(events):
+    event, value = next(events)
+    if event in _CONTAINER_START:
+        _skip(events, event)
+        return None
+    return value
+
+
+def _read_codes(events, keep_spans=False):
+    """{annotator_key: [{"code": c}, ...]} from one annotation type (+ start/end if keep_spans)."""
+    event, _ = next(events)
+    if event != "start_map":
+        _skip(events, event)
+        return {}
+
+    annotators = {}
+    for event, annotator_key in events:
+        if event == "end_map":
+            return annotators
+        codes = []
+        event, _ = next(events)
+        if event != "start_array":
+            _skip(events, event)
+            continue
+        for event, value in events:
+            if event == "end_array":
+                break
+            if event != "start_map":
+                _skip(events, event)
+                continue
+            annotation = {"code": None}
+            for event, key in events:
+                if event == "end_map":
+                    break
+                if key == "code" or (keep_spans and key in SPAN_FIELDS):
+                    annotation[key] = _read_scalar(events)
+                else:
+                    _skip(events, next(events)[0])
+            codes.append(annotation)
+        annotators[annotator_key] = codes
+    return annotators
+
+
+def _read_article(events, fields, keep_codes, keep_spans=False):
+    event, _ = next(events)
+    if event != "start_map":
+        _skip(events, event)
+        return None
+
+    article = {}
+    for event, key in events:
+        if event == "end_map":
+            return article
+        if key in fields:
+            article[key] = _read_scalar(events)
+        elif key == "annotations" and keep_codes:
+            article["annotations"] = _read_annotations(events, keep_spans)
+        else:
+            _skip(events, next(events)[0])
+    return article
+
+
+def _read_annotations(events, keep_spans=False):
+    event, _ = next(events)
+    if event != "start_map":
+        _skip(events, event)
+        return {}
+    annotations = {}
+    for event, key in events:
+        if event == "end_map":
+            return annotations
+        if key in ANNOTATION_TYPES:
+            annotations[key] = _read_codes(events, keep_spans)
+        else:
+            _skip(events, next(events)[0])
+    return annotations
+
+
+def _project(article, fields, keep_codes, keep_spans=False):
+    """Same projection as the streaming path, applied to a json.load-ed article."""
+    projected = {k: article.get(k) for k in fields if k in article}
+    span_fields = SPAN_FIELDS if keep_spans else ()
+    if keep_codes:
+        annotations = article.get('annotations', {})
+        projected['annotations'] = {
+            kind: {annotator: [{"code": ann.get('code'), **{k: ann[k] for k in span_fields if k in ann}}
+                               for ann in anns]
+                   for annotator, anns in annotations.get(kind, {}).items()}
+            for kind in ANNOTATION_TYPES if kind in annotations
+        }
+    return projected
+
+
+def iter_articles(json_path, fields=METADATA_FIELDS, keep_codes=True, nyt_only=True, keep_spans=False):
+    """
+    Yield (article_id, article) with only `fields` (+ frame/tone codes if keep_codes,
+    with their start/end character offsets if keep_spans).
+
+    Article IDs such as "Immigration1.0-25450" contain dots, so events are
+    walked by nesting depth rather than by ijson's dotted prefixes.
+    """
+    fields = set(fields) | ({"source"} if nyt_only else set())
+
+    if ijson is None:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for article_id, article in data.items():
+            if not nyt_only or is_nyt(article):
+                yield article_id, _project(article, fields, keep_codes, keep_spans)
+        return
+
+    with open(json_path, 'rb') as f:
+        events = iter(ijson.basic_parse(f, use_float=True))
+        event, _ = next(events)
+        if event != "start_map":
+            raise ValueError(f"{json_path}: expected a JSON object of articles")
+        for event, article_id in events:
+            if event == "end_map":
+                break
+            article = _read_article(events, fields, keep_codes, keep_spans)
+            if article is None or (nyt_only and not is_nyt(article)):
+                continue
+            yield article_id, article
+
+
+def build_title_index(json_paths, fields=METADATA_FIELDS, keep_codes=True):
+    """
+    One pass over every issue file: {normalized title: [(issue, article_id, article), ...]}.
+
+    json_paths: {issue name: path}, e.g. ISSUE_FILES. Also returns the number of
+    NYT articles kept per issue.
+    """
+    index = {}
+    counts = {}
+    for issue, path in json_paths.items():
+        counts[issue] = 0
+        for article_id, article in iter_articles(path, fields, keep_codes):
+            counts[issue] += 1
+            norm_title = normalize_title(article.get('title') or '')
+            index.setdefault(norm_title, []).append((issue, article_id, article))
+    return index, counts
@@ -0,0 +1,246 @@
+"""
+Paragraph- and sentence-level frame labels from the MFC annotation spans.
+
+extract_frame_labels keeps one set of frame codes per annotator and drops the
+start/end offsets. This script keeps the spans, maps them onto the DOCX body
+text in <issue>_corpus.parquet and labels each paragraph (or sentence) with
+the frames whose spans overlap it.
+
+The 2015 offsets index the original Lexis text, which the MFC JSON does not
+include, so only a length mapping is possible: the title line in front of
+the original body is skipped and the rest is scaled linearly to the DOCX
+body length, using the JSON word count to estimate the original length.
+Mapped offsets are snapped to word boundaries. The mapping is approximate,
+which is why labels are given per paragraph or sentence rather than per
+span. Articles whose length ratio is further than --max-scale-drift from 1
+are dropped, since their spans would land in unrelated text.
+
+Usage:
+    python spans.py                                   # immigration, paragraphs
+    python spans.py --issue smoking --unit sentence
+
+Output:
+    <issue>_spans.parquet        one row per frame span with original and DOCX offsets
+    <issue>_paragraphs.parquet   (or _sentences) one row per unit: offsets into the
+                                 corpus text, unit text, per-annotator and union codes
+"""
+
+import argparse
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from corpus_schema import ANNOTATOR_CODES, COMPRESSION, load_corpus
+from mfc_json import ISSUE_FILES, iter_articles
+
+UNITS = ("paragraph", "sentence")
+MIN_OVERLAP_CHARS = 20          # a span this long inside a unit labels it...
+MIN_OVERLAP_FRACTION = 0.5      # ...as does half of a shorter span
+MAX_SCALE_DRIFT = 0.35
+TITLE_SEPARATOR = 2             # original texts have a blank line after the title
+
+WORD_RE = re.compile(r'\S+')
+SENTENCE_RE = re.compile(r'[^.!?]+(?:[.!?]+["”’)]*|$)')
+
+UNIT_SCHEMA = pa.schema([
+    ("article_id", pa.string()),
+    ("unit_index", pa.int16()),
+    ("char_start", pa.int32()),
+    ("char_end", pa.int32()),
+    ("text", pa.string()),
+    ("frame_annotations", pa.list_(ANNOTATOR_CODES)),
+    ("codes", pa.list_(pa.int8())),
+    ("alignment", pa.dictionary(pa.int8(), pa.string())),
+])
+
+
+def collect_spans(article):
+    """Frame spans as arrays: annotator ids, base codes (1-15), start, end."""
+    annotators, codes, starts, ends = [], [], [], []
+    for annotator_key, annotations in article.get('annotations', {}).get('framing', {}).items():
+        annotator_id = annotator_key.split('_')[0]
+        for ann in annotations:
+            code, start, end = ann.get('code'), ann.get('start'), ann.get('end')
+            if not code or start is None or end is None or end <= start:
+                continue
+            base_code = int(float(code))
+            if 1 <= base_code <= 15:
+                annotators.append(annotator_id)
+                codes.append(base_code)
+                starts.append(int(start))
+                ends.append(int(end))
+    return (np.array(annotators, dtype=object), np.array(codes, dtype=np.int8),
+            np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64))
+
+
+def length_anchors(article, target, max_end):
+    """Linear map from the original offsets (title line first) onto the DOCX body."""
+    header = len(article.get('title') or '') + TITLE_SEPARATOR
+    words = len(WORD_RE.findall(target))
+    chars_per_word = len(target) / words if words else 0
+    source_body = (article.get('length') or words) * chars_per_word
+    source_body = max(source_body, max_end - header, 1)
+    return np.array([header, header + source_body]), np.array([0.0, len(target)])
+
+
+def snap(positions, boundaries):
+    """Move each position to the nearest boundary."""
+    idx = np.clip(np.searchsorted(boundaries, positions), 1, len(boundaries) - 1)
+    left, right = boundaries[idx - 1], boundaries[idx]
+    return np.where(positions - left <= right - positions, left, right)
+
+
+def split_units(text, unit="paragraph"):
+    """(start, end) offsets of non-empty paragraphs or sentences in text."""
+    bounds = []
+    offset = 0
+    for paragraph in text.split('\n'):
+        if paragraph.strip():
+            if unit == "sentence":
+                for match in SENTENCE_RE.finditer(paragraph):
+                    if match.group().strip():
+                        bounds.append((offset + match.start(), offset + match.end()))
+            else:
+                bounds.append((offset, offset + len(paragraph)))
+        offset += len(paragraph) + 1
+    return np.array(bounds, dtype=np.int64).reshape(-1, 2)
+
+
+def align_article(article, text):
+    """
+    Map one article's spans onto `text` with length_anchors. Returns a
+    DataFrame of spans with docx_start/docx_end, the alignment method and
+    its scale (DOCX/original length ratio), or None when the article has no
+    spans or no words.
+    """
+    annotators, codes, starts, ends = collect_spans(article)
+    if not len(codes) or not text:
+        return None
+
+    src, tgt = length_anchors(article, text, ends.max())
+    method = "length"
+    scale = (tgt[-1] - tgt[0]) / max(src[-1] - src[0], 1)
+
+    words = np.array([(m.start(), m.end()) for m in WORD_RE.finditer(text)]).reshape(-1, 2)
+    if not len(words):
+        return None
+    docx_start = snap(np.interp(starts, src, tgt), words[:, 0])
+    docx_end = snap(np.interp(ends, src, tgt), words[:, 1])
+    keep = docx_end > docx_start
+
+    return pd.DataFrame({
+        "annotator": annotators[keep],
+        "code": codes[keep],
+        "start": starts[keep],
+        "end": ends[keep],
+        "docx_start": docx_start[keep].astype(np.int64),
+        "docx_end": docx_end[keep].astype(np.int64),
+        "alignment": method,
+        "scale": round(float(scale), 3),
+    })
+
+
+def label_units(spans, units, annotators):
+    """
+    (units, annotators) bitmask of frame codes: a unit gets a span's code when
+    they overlap by MIN_OVERLAP_CHARS, or by MIN_OVERLAP_FRACTION of the span.
+    """
+    span_start = spans["docx_start"].to_numpy()[:, None]
+    span_end = spans["docx_end"].to_numpy()[:, None]
+    overlap = np.minimum(span_end, units[None, :, 1]) - np.maximum(span_start, units[None, :, 0])
+    span_len = span_end - span_start
+    hit = (overlap >= MIN_OVERLAP_CHARS) | ((overlap > 0) & (overlap >= MIN_OVERLAP_FRACTION * span_len))
+
+    annotator_idx = pd.Index(annotators).get_indexer(spans["annotator"])
+    bits = np.left_shift(1, spans["code"].to_numpy().astype(np.int64) - 1).astype(np.uint16)
+    masks = np.zeros((len(units), len(annotators)), dtype=np.uint16)
+    span_i, unit_i = np.nonzero(hit)
+    np.bitwise_or.at(masks, (unit_i, annotator_idx[span_i]), bits[span_i])
+    return masks
+
+
+def mask_codes(mask):
+    return [code for code in range(1, 16) if mask >> (code - 1) & 1]
+
+
+def build_units(article_id, text, spans, unit="paragraph"):
+    units = split_units(text, unit)
+    if not len(units):
+        return []
+    annotators = sorted(spans["annotator"].unique())
+    masks = label_units(spans, units, annotators)
+    union = np.bitwise_or.reduce(masks, axis=1)
+
+    return [
+        {
+            "article_id": article_id,
+            "unit_index": i,
+            "char_start": int(start),
+            "char_end": int(end),
+            "text": text[start:end],
+            "frame_annotations": [{"annotator": a, "codes": mask_codes(masks[i, j])}
+                                  for j, a in enumerate(annotators)],
+            "codes": mask_codes(union[i]),
+            "alignment": spans["alignment"].iat[0],
+        }
+        for i, (start, end) in enumerate(units)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paragraph/sentence-level frame labels from MFC spans.")
+    parser.add_argument("--issue", choices=list(ISSUE_FILES), default="immigration")
+    parser.add_argument("--corpus", help="assembled corpus parquet (default: <issue>_corpus.parquet)")
+    parser.add_argument("--unit", choices=UNITS, default="paragraph")
+    parser.add_argument("--max-scale-drift", type=float, default=MAX_SCALE_DRIFT,
+                        help="drop articles whose DOCX/original length ratio is further than this from 1")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    corpus_path = args.corpus or f"{args.issue}_corpus.parquet"
+
+    print("Loading corpus text...")
+    texts = load_corpus(corpus_path, columns=["article_id", "text"]).set_index("article_id")["text"]
+    print(f"  {len(texts)} articles in {corpus_path}")
+
+    print("Aligning spans...")
+    span_frames, unit_rows = [], []
+    drifted = 0
+    wanted = set(texts.index)
+    for article_id, article in iter_articles(ISSUE_FILES[args.issue],
+                                             fields=("title", "length"), keep_spans=True):
+        if article_id not in wanted:
+            continue
+        text = texts[article_id]
+        spans = align_article(article, text)
+        if spans is None or not len(spans):
+            continue
+        if abs(spans["scale"].iat[0] - 1) > args.max_scale_drift:
+            drifted += 1
+            continue
+        span_frames.append(spans.assign(article_id=article_id))
+        unit_rows.extend(build_units(article_id, text, spans, args.unit))
+
+    if not span_frames:
+        print("  No spans could be aligned")
+        return
+    spans = pd.concat(span_frames, ignore_index=True)
+    print(f"  {spans['article_id'].nunique()} articles, {len(spans)} spans aligned "
+          f"({drifted} articles dropped for length drift)")
+
+    span_file = f"{args.issue}_spans.parquet"
+    spans.to_parquet(span_file, index=False, compression=COMPRESSION)
+
+    unit_file = f"{args.issue}_{args.unit}s.parquet"
+    pq.write_table(pa.Table.from_pylist(unit_rows, schema=UNIT_SCHEMA), unit_file, compression=COMPRESSION)
+
+    labelled = sum(1 for row in unit_rows if row["codes"])
+    print(f"\nSaved:\n  - {span_file}\n  - {unit_file} ({len(unit_rows)} {args.unit}s, {labelled} with frames)")
+
+
+if __name__ == "__main__":
+    main()
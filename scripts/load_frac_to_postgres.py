@@ -7,69 +7,15 @@ Creates a table with both the FrAC 9-label scheme and the original 15-label MFC
 
 import os
 import sys
-import pandas as pd
-import psycopg2
-from psycopg2.extras import execute_values
+from collections import Counter
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Label mappings from original MFC numeric labels
-# FrAC collapsed: Legality+Crime, Political+Policy, removed Capacity and External Regulation
-LABEL_MAPPING = {
-    1: {
-        'frac': 'Economic',
-        'mfc': 'Economic'
-    },
-    3: {
-        'frac': 'Morality',
-        'mfc': 'Morality'
-    },
-    4: {
-        'frac': 'Fairness and Equality',
-        'mfc': 'Fairness and equality'
-    },
-    5: {
-        'frac': 'Legality and Crime',  # FrAC merged Legality + Crime
-        'mfc': 'Legality, constitutionality and jurisprudence'
-    },
-    6: {
-        'frac': 'Political and Policies',  # FrAC merged Policy + Political
-        'mfc': 'Policy prescription and evaluation'
-    },
-    7: {
-        'frac': 'Legality and Crime',  # Would map here if present
-        'mfc': 'Crime and punishment'
-    },
-    8: {
-        'frac': 'Security and Defense',
-        'mfc': 'Security and defense'
-    },
-    9: {
-        'frac': 'Health and Safety',
-        'mfc': 'Health and safety'
-    },
-    10: {
-        'frac': 'Quality of Life',  # Not in gold standard but defining for completeness
-        'mfc': 'Quality of life'
-    },
-    11: {
-        'frac': 'Cultural Identity',
-        'mfc': 'Cultural identity'
-    },
-    12: {
-        'frac': 'Public Opinion',
-        'mfc': 'Public opinion'
-    },
-    13: {
-        'frac': 'Political and Policies',  # Would map here if present
-        'mfc': 'Political'
-    },
-    15: {
-        'frac': 'Other',
-        'mfc': 'Other'
-    }
-}
+try:
+    from frame_delta.labels import FRAC_LABEL_MAPPING as LABEL_MAPPING
+except ModuleNotFoundError:
+    sys.exit("frame_delta is not importable; run `python -m frame_delta load-frac` from the repo root")
 
 
 def create_table(cursor):
@@ -98,6 +44,8 @@ def load_frac_data(csv_path: str, conn):
     conn.commit()
 
     # Read CSV
+    import pandas as pd
+
     print(f"Reading {csv_path}...")
     df = pd.read_csv(csv_path)
     print(f"Found {len(df)} rows")
@@ -127,6 +75,8 @@ def load_frac_data(csv_path: str, conn):
         print(f"Warning: Unmapped labels found: {unmapped}")
 
     # Insert data
+    from psycopg2.extras import execute_values
+
     print(f"Inserting {len(data)} rows...")
     execute_values(cursor, """
         INSERT INTO frac_gold_standard (sentence, label_numeric, label_frac, label_mfc)
@@ -139,21 +89,28 @@ def load_frac_data(csv_path: str, conn):
     count = cursor.fetchone()[0]
     print(f"Total rows in frac_gold_standard: {count}")
 
-    # Show distribution
+    # Show distribution, from the precomputed MFC counts (frame_delta.frame_stats);
+    # each MFC label maps to one FrAC label
+    from frame_delta import frame_stats
+    from frame_delta.labels import OFFICIAL_LABELS
+
+    frame_stats.sync(conn, 'frac_gold_standard')
+    counts, n_docs = frame_stats.label_counts(conn, ['frac_gold_standard'])
+    frac_counts = Counter()
+    for mapping in LABEL_MAPPING.values():
+        frac_counts[mapping['frac']] += int(counts[OFFICIAL_LABELS.index(mapping['mfc'])])
+    frac_counts['Unknown'] = n_docs - int(counts.sum())
     print("\nLabel distribution (FrAC scheme):")
-    cursor.execute("""
-        SELECT label_frac, COUNT(*) as cnt
-        FROM frac_gold_standard
-        GROUP BY label_frac
-        ORDER BY cnt DESC
-    """)
-    for row in cursor.fetchall():
-        print(f"  {row[0]}: {row[1]}")
+    for label, count in frac_counts.most_common():
+        if count:
+            print(f"  {label}: {count}")
 
     cursor.close()
 
 
 def main():
+    import psycopg2
+
     # Connect to database
     print("Connecting to PostgreSQL...")
     try:
@@ -1,42 +1,61 @@
 #!/usr/bin/env python3
 """
-Load SemEval 2023 Task 3 Subtask 2 (English) data into PostgreSQL.
-
-Subtask 2: Multi-label frame classification at article level.
-Uses the standard 14 MFC frame categories.
+Load SemEval 2023 Task 3 data into PostgreSQL.
+
+Subtask 2: Multi-label frame classification at article level, loaded into
+semeval_subtask2. Uses the standard 14 MFC frame categories.
+
+Subtask 3: the .template paragraph files (article id, paragraph index,
+paragraph text) plus their persuasion techniques where a labels file exists,
+loaded into semeval_subtask3_paragraphs keyed by (article_id, paragraph_id).
+
+Every language directory under sem_eval_23/data and every split is walked.
+Files are read, hashed and parsed on a thread pool; an article whose hash
+(file bytes plus its labels) matches the one stored by the last load is
+skipped, so reloading after a data version bump only touches what changed.
+Changed rows are written with COPY.
+
+The frame name table (frame_delta.labels) and the COPY writes
+(frame_delta.db) come from the package, so the loader runs through the CLI
+from the repo root.
+
+Usage:
+    python -m frame_delta load-semeval                            # all languages
+    python -m frame_delta load-semeval --languages en it --workers 8
+    python -m frame_delta load-semeval --dry-run                  # scan and parse only
+    python -m frame_delta load-semeval --prune                    # also drop articles no longer on disk
 """
 
+import argparse
+import hashlib
 import os
 import sys
-import psycopg2
-from psycopg2.extras import execute_values
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Frame name normalization: SemEval uses underscores, MFC uses spaces
-FRAME_NORMALIZE = {
-    'Economic': 'Economic',
-    'Capacity_and_resources': 'Capacity and resources',
-    'Morality': 'Morality',
-    'Fairness_and_equality': 'Fairness and equality',
-    'Legality_Constitutionality_and_jurisprudence': 'Legality, constitutionality and jurisprudence',
-    'Policy_prescription_and_evaluation': 'Policy prescription and evaluation',
-    'Crime_and_punishment': 'Crime and punishment',
-    'Security_and_defense': 'Security and defense',
-    'Health_and_safety': 'Health and safety',
-    'Quality_of_life': 'Quality of life',
-    'Cultural_identity': 'Cultural identity',
-    'Public_opinion': 'Public opinion',
-    'Political': 'Political',
-    'External_regulation_and_reputation': 'External regulation and reputation',
-}
-
-
-def create_table(cursor):
-    """Create the semeval_subtask2 table if it doesn't exist."""
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS semeval_subtask2 (
+try:
+    from frame_delta.labels import SEMEVAL_FRAME_NORMALIZE as FRAME_NORMALIZE
+except ModuleNotFoundError:
+    sys.exit("frame_delta is not importable; run `python -m frame_delta load-semeval` from the repo root")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DATA_DIR = os.path.join(PROJECT_ROOT, 'sem_eval_23', 'data')
+SPLITS = ('train', 'dev', 'test')
+ARTICLE_TABLE = 'semeval_subtask2'
+PARAGRAPH_TABLE = 'semeval_subtask3_paragraphs'
+ARTICLE_COLUMNS = ('article_id', 'language', 'title', 'text', 'frames_raw', 'frames_mfc',
+                   'split', 'source', 'file_hash')
+PARAGRAPH_COLUMNS = ('article_id', 'paragraph_id', 'language', 'split', 'text', 'techniques', 'file_hash')
+
+
+def create_tables(cursor):
+    """Create both tables if they don't exist (and add the columns older loads lack)."""
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ARTICLE_TABLE} (
             id SERIAL PRIMARY KEY,
             article_id TEXT UNIQUE NOT NULL,
             title TEXT,
@@ -47,16 +66,31 @@ def create_table(cursor):
             source TEXT DEFAULT 'semeval_2023_task3_subtask2_en',
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
-        CREATE INDEX IF NOT EXISTS idx_semeval_article_id ON semeval_subtask2(article_id);
-        CREATE INDEX IF NOT EXISTS idx_semeval_split ON semeval_subtask2(split);
-        CREATE INDEX IF NOT EXISTS idx_semeval_frames_mfc ON semeval_subtask2 USING GIN(frames_mfc);
+        ALTER TABLE {ARTICLE_TABLE} ADD COLUMN IF NOT EXISTS language TEXT;
+        ALTER TABLE {ARTICLE_TABLE} ADD COLUMN IF NOT EXISTS file_hash TEXT;
+        CREATE INDEX IF NOT EXISTS idx_semeval_article_id ON {ARTICLE_TABLE}(article_id);
+        CREATE INDEX IF NOT EXISTS idx_semeval_split ON {ARTICLE_TABLE}(split);
+        CREATE INDEX IF NOT EXISTS idx_semeval_language ON {ARTICLE_TABLE}(language);
+        CREATE INDEX IF NOT EXISTS idx_semeval_frames_mfc ON {ARTICLE_TABLE} USING GIN(frames_mfc);
+
+        CREATE TABLE IF NOT EXISTS {PARAGRAPH_TABLE} (
+            article_id TEXT NOT NULL,
+            paragraph_id INTEGER NOT NULL,
+            language TEXT NOT NULL,
+            split TEXT NOT NULL,
+            text TEXT NOT NULL,
+            techniques TEXT[],
+            file_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (article_id, paragraph_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_semeval_paragraphs_language ON {PARAGRAPH_TABLE}(language, split);
     """)
 
 
-def read_article(filepath: str) -> tuple:
-    """Read article file and return (title, text)."""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
+def parse_article(raw: bytes) -> tuple:
+    """Article file bytes -> (title, text)."""
+    lines = raw.decode('utf-8').splitlines(keepends=True)
 
     if not lines:
         return None, None
@@ -69,6 +103,12 @@ def read_article(filepath: str) -> tuple:
     return title, text
 
 
+def read_article(filepath: str) -> tuple:
+    """Read article file and return (title, text)."""
+    with open(filepath, 'rb') as f:
+        return parse_article(f.read())
+
+
 def read_labels(labels_file: str) -> dict:
     """Read labels file and return dict of article_id -> list of frames."""
     labels = {}
@@ -88,6 +128,19 @@ def read_labels(labels_file: str) -> dict:
     return labels
 
 
+def read_technique_labels(labels_file: str) -> dict:
+    """Read a subtask-3 labels file: dict of article_id -> {paragraph_id: [techniques]}."""
+    labels = {}
+    with open(labels_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip('\r\n').split('\t')
+            if len(parts) < 2 or not parts[0].strip():
+                continue
+            techniques = [t.strip() for t in parts[2].split(',') if t.strip()] if len(parts) > 2 else []
+            labels.setdefault(parts[0].strip(), {})[int(parts[1])] = techniques
+    return labels
+
+
 def normalize_frames(frames: list) -> list:
     """Convert SemEval frame names to MFC standard names."""
     normalized = []
@@ -100,137 +153,257 @@ def normalize_frames(frames: list) -> list:
     return normalized
 
 
-def load_split(data_dir: str, split: str, conn):
-    """Load a single split (train/dev) into the database."""
-    cursor = conn.cursor()
+def content_hash(raw: bytes, labels) -> str:
+    """Hash of a file's bytes and its labels, so a relabelled article counts as changed."""
+    digest = hashlib.sha1(raw)
+    digest.update(repr(labels).encode('utf-8'))
+    return digest.hexdigest()
 
-    articles_dir = os.path.join(data_dir, f'{split}-articles-subtask-2')
-    labels_file = os.path.join(data_dir, f'{split}-labels-subtask-2.txt')
 
-    if not os.path.exists(articles_dir):
-        print(f"  Skipping {split}: articles directory not found")
-        return 0
+def list_languages(data_dir: str) -> list:
+    return sorted(d for d in os.listdir(data_dir)
+                  if os.path.isdir(os.path.join(data_dir, d)) and not d.startswith('.'))
 
-    # Read labels if available
-    labels = {}
-    if os.path.exists(labels_file):
-        labels = read_labels(labels_file)
-        print(f"  Found {len(labels)} label entries")
-    else:
-        print(f"  No labels file found for {split}")
-
-    # Read articles
-    data = []
-    article_files = [f for f in os.listdir(articles_dir)
-                     if f.endswith('.txt') and not f.startswith('._')]
-
-    for filename in article_files:
-        article_id = filename.replace('article', '').replace('.txt', '')
-        filepath = os.path.join(articles_dir, filename)
-
-        title, text = read_article(filepath)
-        if not text:
+
+def article_jobs(data_dir: str, languages: list):
+    """(language, split, article_id, path, frames_raw or None) for every subtask-2 article file."""
+    for language in languages:
+        for split in SPLITS:
+            articles_dir = os.path.join(data_dir, language, f'{split}-articles-subtask-2')
+            labels_file = os.path.join(data_dir, language, f'{split}-labels-subtask-2.txt')
+            if not os.path.isdir(articles_dir):
+                continue
+            labels = read_labels(labels_file) if os.path.exists(labels_file) else {}
+            for entry in os.scandir(articles_dir):
+                if entry.name.endswith('.txt') and not entry.name.startswith('._'):
+                    article_id = entry.name.replace('article', '').replace('.txt', '')
+                    yield language, split, article_id, entry.path, labels.get(article_id)
+
+
+def paragraph_jobs(data_dir: str, languages: list):
+    """
+    (language, split, article_id, path or bytes, {paragraph_id: techniques})
+    for every subtask-3 article: one .template file per article, or its lines
+    of the merged {split}-labels-subtask-3.template when there is no folder.
+    """
+    for language in languages:
+        for split in SPLITS:
+            base = os.path.join(data_dir, language, f'{split}-labels-subtask-3')
+            labels = read_technique_labels(base + '.txt') if os.path.exists(base + '.txt') else {}
+            if os.path.isdir(base) and any(n.endswith('.template') for n in os.listdir(base)):
+                for entry in os.scandir(base):
+                    if entry.name.endswith('.template') and not entry.name.startswith('._'):
+                        article_id = entry.name.replace('article', '').split('.')[0].split('-')[0]
+                        yield language, split, article_id, entry.path, labels.get(article_id, {})
+            elif os.path.exists(base + '.template'):
+                grouped = {}
+                with open(base + '.template', 'rb') as f:
+                    for line in f:
+                        if line.strip():
+                            grouped.setdefault(line.split(b'\t', 1)[0].decode('utf-8').strip(), []).append(line)
+                for article_id, lines in grouped.items():
+                    yield language, split, article_id, b''.join(lines), labels.get(article_id, {})
+
+
+def _read(source) -> bytes:
+    if isinstance(source, bytes):
+        return source
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def parse_article_job(job, known_hashes):
+    """-> (article_id, row or None if unchanged since the last load)."""
+    language, split, article_id, path, frames_raw = job
+    raw = _read(path)
+    file_hash = content_hash(raw, frames_raw)
+    if known_hashes.get(article_id) == file_hash:
+        return article_id, None
+
+    title, text = parse_article(raw)
+    if not text:
+        return article_id, None
+    frames_raw = frames_raw or []
+    return article_id, (article_id, language, title, text, frames_raw, normalize_frames(frames_raw),
+                        split, f'semeval_2023_task3_subtask2_{language}', file_hash)
+
+
+def parse_template_job(job, known_hashes):
+    """-> (article_id, list of paragraph rows or None if unchanged since the last load)."""
+    language, split, article_id, source, techniques = job
+    raw = _read(source)
+    file_hash = content_hash(raw, sorted(techniques.items()))
+    if known_hashes.get(article_id) == file_hash:
+        return article_id, None
+
+    rows = []
+    for line in raw.decode('utf-8').splitlines():
+        parts = line.split('\t', 2)
+        if len(parts) < 2 or not parts[1].strip().isdigit():
             continue
+        paragraph_id = int(parts[1])
+        text = parts[2].strip() if len(parts) > 2 else ''
+        rows.append((article_id, paragraph_id, language, split, text,
+                     techniques.get(paragraph_id, []) if techniques else None, file_hash))
+    return article_id, rows
+
+
+def scan(jobs, parse, known_hashes, workers=None):
+    """Read, hash and parse files on a thread pool -> (ids seen, {article_id: changed row(s)})."""
+    seen, changed = set(), {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for article_id, rows in executor.map(lambda job: parse(job, known_hashes), jobs):
+            seen.add(article_id)
+            if rows is not None:
+                changed[article_id] = rows
+    return seen, changed
+
+
+def known_hashes(cursor, table) -> dict:
+    cursor.execute(f"SELECT DISTINCT article_id, file_hash FROM {table}")
+    return dict(cursor.fetchall())
+
+
+def upsert_articles(cursor, rows):
+    """COPY into a staging table, then one INSERT ... ON CONFLICT into semeval_subtask2."""
+    from frame_delta.db import copy_rows
+
+    columns = ', '.join(ARTICLE_COLUMNS)
+    updates = ', '.join(f"{c} = EXCLUDED.{c}" for c in ARTICLE_COLUMNS if c != 'article_id')
+    cursor.execute(f"""
+        CREATE TEMP TABLE {ARTICLE_TABLE}_stage ON COMMIT DROP AS
+        SELECT {columns} FROM {ARTICLE_TABLE} WITH NO DATA
+    """)
+    copy_rows(cursor, f'{ARTICLE_TABLE}_stage', ARTICLE_COLUMNS, rows)
+    cursor.execute(f"""
+        INSERT INTO {ARTICLE_TABLE} ({columns})
+        SELECT {columns} FROM {ARTICLE_TABLE}_stage
+        ON CONFLICT (article_id) DO UPDATE SET {updates}
+    """)
 
-        frames_raw = labels.get(article_id, [])
-        frames_mfc = normalize_frames(frames_raw)
-
-        data.append((
-            article_id,
-            title,
-            text,
-            frames_raw,
-            frames_mfc,
-            split
-        ))
-
-    # Insert data
-    if data:
-        execute_values(cursor, """
-            INSERT INTO semeval_subtask2 (article_id, title, text, frames_raw, frames_mfc, split)
-            VALUES %s
-            ON CONFLICT (article_id) DO UPDATE SET
-                title = EXCLUDED.title,
-                text = EXCLUDED.text,
-                frames_raw = EXCLUDED.frames_raw,
-                frames_mfc = EXCLUDED.frames_mfc,
-                split = EXCLUDED.split
-        """, data)
-        conn.commit()
-
-    cursor.close()
-    return len(data)
 
+def replace_paragraphs(cursor, changed):
+    """Drop the stored paragraphs of changed articles and COPY their new ones."""
+    from frame_delta.db import copy_rows
+
+    cursor.execute(f"DELETE FROM {PARAGRAPH_TABLE} WHERE article_id = ANY(%s)", (list(changed),))
+    return copy_rows(cursor, PARAGRAPH_TABLE, PARAGRAPH_COLUMNS,
+                     (row for rows in changed.values() for row in rows))
 
-def main():
-    # Connect to database
-    print("Connecting to PostgreSQL...")
-    try:
-        conn = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
-        print("Connected!")
-    except Exception as e:
-        print(f"Connection failed: {e}")
-        sys.exit(1)
 
-    # Create table
-    cursor = conn.cursor()
-    create_table(cursor)
-    conn.commit()
-    cursor.close()
+def prune(cursor, table, languages, seen):
+    """Delete rows of the walked languages whose article is no longer on disk."""
+    cursor.execute(f"DELETE FROM {table} WHERE language = ANY(%s) AND NOT (article_id = ANY(%s))",
+                   (list(languages), list(seen)))
+    return cursor.rowcount
 
-    # Path to SemEval English data
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(script_dir)
-    data_dir = os.path.join(project_root, 'sem_eval_23', 'data', 'en')
+
+def print_summary(conn, cursor):
+    cursor.execute(f"SELECT COUNT(*) FROM {ARTICLE_TABLE}")
+    db_count = cursor.fetchone()[0]
+    print(f"\nTotal in database: {db_count}")
+
+    # Language/split breakdown
+    print("\nBy language and split:")
+    cursor.execute(f"""
+        SELECT a.language, a.split, COUNT(*),
+               COUNT(*) FILTER (WHERE array_length(a.frames_mfc, 1) > 0) as labeled,
+               (SELECT COUNT(*) FROM {PARAGRAPH_TABLE} p
+                WHERE p.language = a.language AND p.split = a.split) as paragraphs
+        FROM {ARTICLE_TABLE} a
+        GROUP BY a.language, a.split ORDER BY a.language, a.split
+    """)
+    for row in cursor.fetchall():
+        print(f"  {row[0]} {row[1]}: {row[2]} articles ({row[3]} labeled), {row[4]} paragraphs")
+
+    # Frame distribution, from the precomputed summary (frame_delta.frame_stats)
+    from frame_delta import frame_stats
+    from frame_delta.labels import OFFICIAL_LABELS
+
+    frame_stats.sync(conn, ARTICLE_TABLE)
+    counts, _ = frame_stats.label_counts(conn, [ARTICLE_TABLE])
+    print("\nFrame distribution (MFC names):")
+    for i in (-counts).argsort(kind='stable'):
+        if counts[i]:
+            print(f"  {OFFICIAL_LABELS[i]}: {counts[i]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', default=DATA_DIR, help='folder with one directory per language')
+    parser.add_argument('--languages', nargs='+', help='language directories to load (default: all)')
+    parser.add_argument('--workers', type=int, default=8, help='file reading/parsing threads')
+    parser.add_argument('--force', action='store_true', help='reload every article, ignoring stored hashes')
+    parser.add_argument('--prune', action='store_true',
+                        help='delete articles of the loaded languages that are no longer on disk')
+    parser.add_argument('--dry-run', action='store_true', help='scan and parse without a database')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.data_dir):
+        print(f"Data directory not found: {args.data_dir}")
+        sys.exit(1)
+    languages = args.languages or list_languages(args.data_dir)
+    print(f"Languages: {', '.join(languages)}")
+
+    conn = None
+    if not args.dry_run:
+        import psycopg2
+
+        # Connect to database
+        print("Connecting to PostgreSQL...")
+        try:
+            conn = psycopg2.connect(
+                dbname=os.getenv("DB_NAME"),
+                user=os.getenv("DB_USER"),
+                password=os.getenv("DB_PASSWORD"),
+                host=os.getenv("DB_HOST"),
+                port=os.getenv("DB_PORT")
+            )
+            print("Connected!")
+        except Exception as e:
+            print(f"Connection failed: {e}")
+            sys.exit(1)
 
     try:
-        total = 0
-        for split in ['train', 'dev', 'test']:
-            print(f"\nLoading {split} split...")
-            count = load_split(data_dir, split, conn)
-            print(f"  Loaded {count} articles")
-            total += count
-
-        # Show summary
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM semeval_subtask2")
-        db_count = cursor.fetchone()[0]
-        print(f"\nTotal in database: {db_count}")
-
-        # Split breakdown
-        print("\nBy split:")
-        cursor.execute("""
-            SELECT split, COUNT(*),
-                   COUNT(*) FILTER (WHERE array_length(frames_mfc, 1) > 0) as labeled
-            FROM semeval_subtask2
-            GROUP BY split ORDER BY split
-        """)
-        for row in cursor.fetchall():
-            print(f"  {row[0]}: {row[1]} articles ({row[2]} labeled)")
-
-        # Frame distribution
-        print("\nFrame distribution (MFC names):")
-        cursor.execute("""
-            SELECT unnest(frames_mfc) as frame, COUNT(*) as cnt
-            FROM semeval_subtask2
-            WHERE frames_mfc IS NOT NULL AND array_length(frames_mfc, 1) > 0
-            GROUP BY frame
-            ORDER BY cnt DESC
-        """)
-        for row in cursor.fetchall():
-            print(f"  {row[0]}: {row[1]}")
-
-        cursor.close()
+        cursor = conn.cursor() if conn else None
+        if cursor:
+            create_tables(cursor)
+            conn.commit()
+
+        for table, jobs, parse in (
+            (ARTICLE_TABLE, article_jobs(args.data_dir, languages), parse_article_job),
+            (PARAGRAPH_TABLE, paragraph_jobs(args.data_dir, languages), parse_template_job),
+        ):
+            start = time.perf_counter()
+            known = known_hashes(cursor, table) if cursor and not args.force else {}
+            seen, changed = scan(jobs, parse, known, workers=args.workers)
+            scanned = time.perf_counter() - start
+            unchanged = len(seen) - len(changed)
+            print(f"\n{table}: {len(seen)} articles on disk, {unchanged} unchanged, "
+                  f"{len(changed)} new or changed (scanned in {scanned:.2f}s)")
+
+            if cursor:
+                if table == ARTICLE_TABLE:
+                    if changed:
+                        upsert_articles(cursor, changed.values())
+                    written = len(changed)
+                else:
+                    written = replace_paragraphs(cursor, changed) if changed else 0
+                pruned = prune(cursor, table, languages, seen) if args.prune else 0
+                conn.commit()
+                print(f"  Wrote {written} rows, pruned {pruned} ({time.perf_counter() - start:.2f}s)")
+            else:
+                rows = sum(len(r) for r in changed.values()) if table == PARAGRAPH_TABLE else len(changed)
+                print(f"  Dry run: {rows} rows would be written")
+
+        if cursor:
+            print_summary(conn, cursor)
+            cursor.close()
         print("\nDone!")
 
     finally:
-        conn.close()
+        if conn:
+            conn.close()
 
 
 if __name__ == "__main__":
@@ -2,7 +2,6 @@ import sys
 import logging.handlers
 import argparse
 import os
-from sklearn.metrics import f1_score
 
 """
 Scorer for SemEval 2023 task 3 subtask-1. 
@@ -149,6 +148,7 @@ if __name__ == '__main__':
   if correct_format(pred_labels, gold_labels, CLASSES):
     logger.info('Prediction file format is correct')
     if gold_labels:
+      from sklearn.metrics import f1_score
       pred_values, gold_values = _extract_matching_lists(pred_labels, gold_labels)
       macro_f1 = f1_score(gold_values, pred_values, average="macro", zero_division=0)
       micro_f1 = f1_score(gold_values, pred_values, average="micro", zero_division=0)
@@ -1,10 +1,9 @@
 import logging.handlers
 import argparse
+import json
 import sys
 import os
-from sklearn.metrics import f1_score
-from sklearn.preprocessing import MultiLabelBinarizer
-import sklearn
+import numpy as np
 
 """
 Scorer for SemEval 2023 task 3 subtask 2. 
@@ -20,6 +19,19 @@ For example:
 111111113	
 111111114	Economic
 111111115	Capacity_and_resources,Morality,Economic
+
+Instead of a prediction file, a probability matrix over the 15 MFC labels used
+by our classifiers can be scored directly (--probs_file_path): a .parquet file
+with an article_id column and either one column per MFC label or a "probs"
+list column, or a .npy (N, 15) matrix with the ids in --ids_file_path (one per
+line). Columns are mapped to the frames of --frame_file_path ("Other" has no
+SemEval counterpart and is dropped), thresholded in memory and scored once per
+--thresholds entry; each entry is a {label: threshold} JSON such as the
+class_thresholds_optimized.json the notebooks save, or a single number. 
+For example:
+
+python scorer-subtask-2.py -g dev-labels-subtask-2.txt -f frames_subtask2.txt \
+  --probs_file_path dev_probs.parquet --thresholds 0.3 0.4 0.5 class_thresholds_optimized.json
 """
 
 logger = logging.getLogger("task2_scorer")
@@ -29,6 +41,32 @@ formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 ch.setFormatter(formatter)
 logger.setLevel(logging.INFO)
 
+# column order of the probability matrices (the MultiLabelBinarizer classes of the notebooks)
+MFC_LABELS = [
+  "Economic", "Capacity and resources", "Morality", "Fairness and equality",
+  "Legality, constitutionality and jurisprudence", "Policy prescription and evaluation",
+  "Crime and punishment", "Security and defense", "Health and safety",
+  "Quality of life", "Cultural identity", "Public opinion", "Political",
+  "External regulation and reputation", "Other"
+]
+# MFC label -> SemEval frame name; MFC labels missing here ("Other") are not scored
+MFC_TO_SEMEVAL = {
+  "Economic": "Economic",
+  "Capacity and resources": "Capacity_and_resources",
+  "Morality": "Morality",
+  "Fairness and equality": "Fairness_and_equality",
+  "Legality, constitutionality and jurisprudence": "Legality_Constitutionality_and_jurisprudence",
+  "Policy prescription and evaluation": "Policy_prescription_and_evaluation",
+  "Crime and punishment": "Crime_and_punishment",
+  "Security and defense": "Security_and_defense",
+  "Health and safety": "Health_and_safety",
+  "Quality of life": "Quality_of_life",
+  "Cultural identity": "Cultural_identity",
+  "Public opinion": "Public_opinion",
+  "Political": "Political",
+  "External regulation and reputation": "External_regulation_and_reputation",
+}
+
 
 def read_frame_list_from_file(file_full_name):
   """
@@ -132,6 +170,9 @@ def evaluate(pred_labels, gold_labels, CLASSES):
     :param pred_labels: a dictionary with predictions, 
     :param gold_labels: a dictionary with gold labels.
   """
+  from sklearn.metrics import f1_score
+  from sklearn.preprocessing import MultiLabelBinarizer
+
   pred_values, gold_values = _extract_matching_lists(pred_labels, gold_labels)  
   mlb = MultiLabelBinarizer()
   mlb.fit([CLASSES])
@@ -143,11 +184,121 @@ def evaluate(pred_labels, gold_labels, CLASSES):
   return macro_f1, micro_f1
 
 
+def _read_probability_file(file_full_name, ids_file_name=None, id_column="article_id"):
+  """
+  Read a probability matrix over MFC_LABELS.
+  Returns the list of article ids (as strings) and an (N, 15) float array.
+  """
+  if file_full_name.endswith(".npy"):
+    if not ids_file_name:
+      logger.error('ERROR: a .npy probability file needs --ids_file_path')
+      sys.exit(1)
+    probs = np.load(file_full_name)
+    with open(ids_file_name, encoding='utf-8') as f:
+      ids = [ line.strip() for line in f if line.strip() ]
+  else:
+    import pandas as pd
+    df = pd.read_parquet(file_full_name)
+    ids = df[id_column].astype(str).tolist()
+    if "probs" in df.columns:
+      probs = np.vstack(df["probs"].to_numpy())
+    else:
+      missing = [ l for l in MFC_LABELS if l not in df.columns ]
+      if missing:
+        logger.error('ERROR: the probability file has no column for: ' + ", ".join(missing))
+        sys.exit(1)
+      probs = df[MFC_LABELS].to_numpy()
+  probs = np.asarray(probs, dtype=np.float64)
+  if probs.shape != (len(ids), len(MFC_LABELS)):
+    logger.error('ERROR: expected a (%d, %d) probability matrix, found %s'
+                 %(len(ids), len(MFC_LABELS), probs.shape))
+    sys.exit(1)
+  return ids, probs
+
+
+def read_thresholds(spec):
+  """
+  Per-label thresholds in MFC_LABELS order from a {label: threshold} JSON
+  (MFC or SemEval label names) or from a single number applied to every label.
+  Unknown names are an error; scored labels missing from the JSON get 0.5,
+  with a warning that lists them.
+  """
+  try:
+    return np.full(len(MFC_LABELS), float(spec))
+  except ValueError:
+    pass
+  with open(spec, encoding='utf-8') as f:
+    threshold_dict = json.load(f)
+  semeval_to_mfc = { v: k for k, v in MFC_TO_SEMEVAL.items() }
+  threshold_dict = { semeval_to_mfc.get(k, k): v for k, v in threshold_dict.items() }
+  unknown = [ k for k in threshold_dict if k not in MFC_LABELS ]
+  if unknown:
+    logger.error('ERROR: %s has thresholds for unknown labels: %s' %(spec, ", ".join(unknown)))
+    sys.exit(1)
+  # labels without a SemEval frame (Other) are never scored, so they may be left out
+  missing = [ l for l in MFC_LABELS if l not in threshold_dict and l in MFC_TO_SEMEVAL ]
+  if missing:
+    logger.warning('WARNING: %s has no threshold for %s; using 0.5' %(spec, ", ".join(missing)))
+  return np.array([ threshold_dict.get(l, 0.5) for l in MFC_LABELS ], dtype=np.float64)
+
+
+def _scored_columns(CLASSES):
+  """Indices of the MFC columns that have a frame in CLASSES, and those frame names."""
+  columns = [ i for i, l in enumerate(MFC_LABELS) if MFC_TO_SEMEVAL.get(l) in CLASSES ]
+  return columns, [ MFC_TO_SEMEVAL[MFC_LABELS[i]] for i in columns ]
+
+
+def probabilities_to_labels(ids, probs, thresholds, CLASSES):
+  """
+  Threshold a probability matrix into the same {article_id: [frames]}
+  dictionary that _read_csv_input_file returns for a prediction file.
+  """
+  columns, names = _scored_columns(CLASSES)
+  preds = probs[:, columns] > thresholds[columns]
+  return { i: [ names[j] for j in np.flatnonzero(row) ] for i, row in zip(ids, preds) }
+
+
+def evaluate_probabilities(ids, probs, gold_labels, CLASSES, threshold_sets):
+  """
+    Scores one probability matrix under several threshold sets.
+    The gold labels are binarized once; every set gives the same macro_f1 and
+    micro_f1 that evaluate() would give for its thresholded prediction file.
+    :param threshold_sets: a list of (name, thresholds in MFC_LABELS order)
+    :return: a list of (name, macro_f1, micro_f1)
+  """
+  from sklearn.metrics import f1_score
+  from sklearn.preprocessing import MultiLabelBinarizer
+
+  columns, names = _scored_columns(CLASSES)
+  mlb = MultiLabelBinarizer()
+  mlb.fit([CLASSES])
+  gold_values = mlb.transform([ gold_labels[i] for i in ids ])
+  # predicted columns in the binarizer's (sorted) class order
+  order = [ names.index(c) if c in names else -1 for c in mlb.classes_ ]
+  scores = []
+  for name, thresholds in threshold_sets:
+    preds = probs[:, columns] > thresholds[columns]
+    pred_values = np.zeros_like(gold_values)
+    for k, j in enumerate(order):
+      if j >= 0:
+        pred_values[:, k] = preds[:, j]
+    macro_f1 = f1_score(gold_values, pred_values, average="macro", zero_division=1)
+    micro_f1 = f1_score(gold_values, pred_values, average="micro", zero_division=1)
+    scores.append((name, macro_f1, micro_f1))
+  return scores
+
+
 if __name__ == '__main__':
   
   parser = argparse.ArgumentParser()
   parser.add_argument("--gold_file_path", '-g', type=str, required=False, help="Paths to the file with gold annotations.")
-  parser.add_argument("--pred_file_path", '-p', type=str, required=True, help="Path to the file with predictions")
+  parser.add_argument("--pred_file_path", '-p', type=str, required=False, help="Path to the file with predictions")
+  parser.add_argument("--probs_file_path", type=str, required=False,
+                      help="Path to a .parquet/.npy matrix of MFC label probabilities (instead of --pred_file_path)")
+  parser.add_argument("--ids_file_path", type=str, required=False, help="Article ids of the rows of a .npy probability file")
+  parser.add_argument("--id_column", type=str, default="article_id", help="Article id column of a .parquet probability file")
+  parser.add_argument("--thresholds", type=str, nargs='+', default=["0.5"],
+                      help="Threshold sets for --probs_file_path: {label: threshold} JSON files and/or numbers")
   parser.add_argument("--frame_file_path", '-f', type=str, required=True, help="Path to the file with the names of the frames")
   parser.add_argument("--log_to_file", "-l", action='store_true', default=False,
                       help="Set flag if you want to log the execution file. The log will be appended to <pred_file_path>.log")
@@ -155,13 +306,16 @@ if __name__ == '__main__':
                       default=False, help="Prints the output in a format easy to parse for a script")
   args = parser.parse_args()
 
+  if bool(args.pred_file_path) == bool(args.probs_file_path):
+    parser.error("exactly one of --pred_file_path and --probs_file_path is required")
+
   output_for_script = bool(args.output_for_script)
   if not output_for_script:
     logger.addHandler(ch)
   
   CLASSES = read_frame_list_from_file(args.frame_file_path)
 
-  pred_file = args.pred_file_path
+  pred_file = args.pred_file_path or args.probs_file_path
   if args.gold_file_path:
     gold_file = args.gold_file_path
   else:
@@ -178,7 +332,7 @@ if __name__ == '__main__':
   if args.log_to_file:
     logger.info('Reading predictions file') 
   else:
-    logger.info('Reading predictions file {}'.format(args.pred_file_path))
+    logger.info('Reading predictions file {}'.format(pred_file))
   if gold_file:
     if args.log_to_file:
       logger.info('Reading gold file')
@@ -187,8 +341,22 @@ if __name__ == '__main__':
   else:
     logger.info('No gold file provided')
 
-  pred_labels = _read_csv_input_file(pred_file)    
   gold_labels = _read_csv_input_file(gold_file) if gold_file else None
+
+  if args.probs_file_path:
+    ids, probs = _read_probability_file(args.probs_file_path, args.ids_file_path, args.id_column)
+    threshold_sets = [ (spec, read_thresholds(spec)) for spec in args.thresholds ]
+    pred_labels = probabilities_to_labels(ids, probs, threshold_sets[0][1], CLASSES)
+    if correct_format(pred_labels, gold_labels, CLASSES):
+      logger.info('Probability file format is correct')
+      if gold_labels:
+        for name, macro_f1, micro_f1 in evaluate_probabilities(ids, probs, gold_labels, CLASSES, threshold_sets):
+          logger.info("thresholds={}\tmicro-F1={:.5f}\tmacro-F1={:.5f}".format(name, micro_f1, macro_f1))
+          if output_for_script:
+            print("{}\t{}\t{}".format(name, micro_f1, macro_f1))
+    sys.exit(0)
+
+  pred_labels = _read_csv_input_file(pred_file)
     
   if correct_format(pred_labels, gold_labels, CLASSES):
     logger.info('Prediction file format is correct')
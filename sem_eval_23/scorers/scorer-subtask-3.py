@@ -2,9 +2,6 @@ import logging.handlers
 import argparse
 import sys
 import os
-from sklearn.metrics import f1_score
-from sklearn.preprocessing import MultiLabelBinarizer
-import sklearn
 
 """
 Scorer for SemEval 2023 task 3 subtask 3. 
@@ -135,6 +132,9 @@ def evaluate(pred_labels, gold_labels, CLASSES):
     :param pred_labels: a dictionary with predictions, 
     :param gold_labels: a dictionary with gold labels.
   """
+  from sklearn.metrics import f1_score
+  from sklearn.preprocessing import MultiLabelBinarizer
+
   pred_values, gold_values = _extract_matching_lists(pred_labels, gold_labels)  
   mlb = MultiLabelBinarizer()
   mlb.fit([CLASSES])